@@ -0,0 +1,55 @@
+"""
+batch_as_completed against a provider that takes a limited number of concurrent requests: fixed
+max_concurrency values against the adaptive concurrency controller.
+
+The local mock server answers requests beyond --server-limit in flight with a 429 (retry after 50 ms),
+the provider SDK retries those up to twice before the call fails.
+
+Usage:
+    python -m benchmarks.bench_adaptive_concurrency [--provider OpenAI] [--requests 100]
+        [--server-limit 4] [--fixed 2 4 16] [--latency-ms 50]
+"""
+import argparse
+import time
+
+from lctutorial import init_chat_model
+from lctutorial.adaptive_concurrency import AdaptiveConcurrency
+from lctutorial.mock_server import MockServer, MockServerConfig, fixed
+
+
+def run(provider: str, requests: int, server_limit: int, latency: float, max_concurrency: int,
+        controller: AdaptiveConcurrency = None) -> dict:
+    config = MockServerConfig(latency=fixed(latency), max_concurrent_requests=server_limit)
+    with MockServer(config) as server:
+        model = init_chat_model(provider=provider, use_model_cache=False, adaptive_concurrency=controller or False,
+                                **server.model_kwargs(provider))
+        start = time.perf_counter()
+        results = list(model.batch_as_completed([f"question {i}" for i in range(requests)],
+                                                config={"max_concurrency": max_concurrency},
+                                                return_exceptions=True))
+        elapsed = time.perf_counter() - start
+        stats = server.stats()
+    return {"seconds": elapsed, "failed": sum(isinstance(result, Exception) for _, result in results),
+            "429s": stats.rate_limited, "limit": controller.stats().limit if controller else max_concurrency}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default="OpenAI", choices=["OpenAI", "Anthropic"])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--server-limit", type=int, default=4)
+    parser.add_argument("--fixed", type=int, nargs="+", default=[2, 4, 16])
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>12} {'seconds':>8} {'req/s':>7} {'failed':>7} {'429s':>6} {'final limit':>12}")
+    runs = [(str(n), n, None) for n in args.fixed] + [("adaptive", 64, AdaptiveConcurrency(initial=16))]
+    for label, max_concurrency, controller in runs:
+        result = run(args.provider, args.requests, args.server_limit, args.latency_ms / 1000, max_concurrency,
+                     controller)
+        print(f"{label:>12} {result['seconds']:>8.2f} {args.requests / result['seconds']:>7.1f} "
+              f"{result['failed']:>7} {result['429s']:>6} {result['limit']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
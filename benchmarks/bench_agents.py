@@ -0,0 +1,145 @@
+"""
+Per-run overhead of our agents on our own CPU, with the Fake provider instead of a real model.
+
+Scenarios: invoke_weather_agent, stream_weather_agent in the "values", "updates" and "messages" stream
+modes, the HITL agent of create_hitl_agent (interrupt + approve) and an agent with the safety_guardrail
+middleware. Every run goes through the same three steps (model tool call, tool, model answer) after a
+conversation history of the given length. Reports throughput, p50/p99 latency and the peak traced
+memory per step (tracemalloc, in a separate pass so it does not skew the timings).
+
+Results are compared to benchmarks/baselines/bench_agents.json when it exists, the script exits
+non-zero when a p50 got slower than the tolerance allows. --save-baseline rewrites the baseline.
+
+Usage:
+    python -m benchmarks.bench_agents [--runs 30] [--lengths 1 10 100 1000] [--tolerance 0.25] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from lctutorial.fake_chat_model import FakeChatModel
+
+BASELINE = Path(__file__).parent / "baselines" / "bench_agents.json"
+STEPS = 3
+STREAM_MODES = ("values", "updates", "messages")
+
+
+def weather_model(arg: str = "city") -> FakeChatModel:
+    return FakeChatModel(responses=[
+        AIMessage("", tool_calls=[{"name": "get_weather", "args": {arg: "Paris"}, "id": None}]),
+        "It's always sunny in Paris!",
+    ])
+
+
+def history(length: int) -> List:
+    # length - 1 earlier messages, the question of the run is the last one
+    return [HumanMessage(f"question {i}") if i % 2 == 0 else AIMessage(f"answer {i}") for i in range(length - 1)]
+
+
+def scenarios(length: int) -> Dict[str, Callable[[], object]]:
+    from langchain.agents import create_agent
+    from langgraph.types import Command
+
+    from lctutorial.hitl_agent import create_hitl_agent
+    from lctutorial.weather_agent import create_weather_agent, get_weather, invoke_weather_agent, stream_weather_agent
+
+    # The guardrail module builds its own OpenAI model at import, it is replaced by a fake one below
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    from tests.unit import safety_guardrail
+
+    safety_guardrail.safety_model = FakeChatModel(responses=[
+        AIMessage("", tool_calls=[{"name": "ResponseSafety", "args": {"evaluation": "safe"}, "id": None}])])
+
+    messages = history(length)
+    weather = create_weather_agent(model=weather_model())
+    guarded = create_agent(model=weather_model(), tools=[get_weather], middleware=[safety_guardrail.safety_guardrail])
+    hitl = create_hitl_agent(weather_model("location"))
+
+    def run_hitl():
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        result = hitl.invoke({"messages": [*messages, {"role": "user", "content": "What is the weather in Paris?"}]},
+                             config=config)
+        assert result["__interrupt__"]
+        return hitl.invoke(Command(resume={"decisions": [{"type": "approve"}]}), config=config)
+
+    runs = {"invoke_weather_agent": lambda: invoke_weather_agent("Paris", agent=weather, history=messages)}
+    for mode in STREAM_MODES:
+        runs[f"stream_weather_agent[{mode}]"] = (
+            lambda mode=mode: list(stream_weather_agent("Paris", mode, agent=weather, history=messages)))
+    runs["hitl_agent"] = run_hitl
+    runs["safety_guardrail"] = lambda: guarded.invoke(
+        {"messages": [*messages, {"role": "user", "content": "What is the weather in Paris?"}]})
+    return runs
+
+
+def measure(run: Callable[[], object], runs: int) -> Dict[str, float]:
+    for _ in range(2):
+        run()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    times.sort()
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(3):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        run()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {"runs_per_s": len(times) / sum(times),
+            "p50_ms": statistics.median(times) * 1000,
+            "p99_ms": times[min(len(times) - 1, int(len(times) * 0.99))] * 1000,
+            "kib_per_step": statistics.median(peaks) / 1024 / STEPS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown against the baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE.read_text())["results"] if BASELINE.exists() and not args.save_baseline else {}
+    results, regressions = {}, []
+    print(f"{'scenario':<34} {'messages':>8} {'runs/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'KiB/step':>9} {'vs base':>8}")
+    for length in args.lengths:
+        for name, run in scenarios(length).items():
+            key = f"{name}@{length}"
+            result = results[key] = measure(run, args.runs)
+            reference = baseline.get(key)
+            change = result["p50_ms"] / reference["p50_ms"] - 1 if reference else None
+            print(f"{name:<34} {length:>8} {result['runs_per_s']:>8.1f} {result['p50_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['kib_per_step']:>9.1f} "
+                  f"{'' if change is None else f'{change:+.0%}':>8}")
+            if change is not None and change > args.tolerance:
+                regressions.append(f"{key}: p50 {reference['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms")
+
+    if args.save_baseline:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps({
+            "python": platform.python_version(), "machine": platform.machine(), "runs": args.runs,
+            "results": results}, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {BASELINE}")
+    if regressions:
+        print("\nSlower than the baseline:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
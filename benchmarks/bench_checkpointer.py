@@ -0,0 +1,87 @@
+"""
+Write and resume latency of checkpointers for threads of 10, 100 and 1,000 steps.
+
+Every step appends a user message and a reply (about 300 characters each) to the thread, like an agent
+turn. "write ms" is the mean wall time of one step (graph.invoke, two checkpoints). "resume ms" is the
+time to load the thread's state from a new saver on the same database file, i.e. after a restart, and
+"warm ms" from the saver that wrote it. InMemorySaver can't be resumed after a restart, its resume column
+shows the warm load.
+
+Compared: InMemorySaver, SqliteDeltaSaver with deltas (snapshot every 32 steps) and SqliteDeltaSaver
+storing every value whole (snapshot_every=0), as a plain SQLite saver would.
+
+Usage:
+    python -m benchmarks.bench_checkpointer [--steps 10 100 1000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import START, MessagesState, StateGraph
+
+from lctutorial.sqlite_checkpointer import SqliteDeltaSaver
+
+TEXT = "It's always sunny in Boston, with a light breeze from the west and no rain in the forecast. " * 3
+CONFIG = {"configurable": {"thread_id": "bench"}}
+
+
+def chat_graph(checkpointer):
+    def reply(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(f"{len(state['messages'])}: {TEXT}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run(steps: int, make_saver, directory: str):
+    path = os.path.join(directory, f"{steps}-{time.monotonic_ns()}.db")
+    saver = make_saver(path)
+    graph = chat_graph(saver)
+    write = sum(timed(lambda: graph.invoke({"messages": [HumanMessage(TEXT)]}, CONFIG)) for _ in range(steps))
+    warm = timed(lambda: graph.get_state(CONFIG))
+    size = None
+    if isinstance(saver, SqliteDeltaSaver):
+        size = saver.storage_stats().bytes
+        saver.close()
+        resumed = make_saver(path)
+        resume = timed(lambda: chat_graph(resumed).get_state(CONFIG))
+        assert len(chat_graph(resumed).get_state(CONFIG).values["messages"]) == 2 * steps
+        resumed.close()
+    else:
+        resume = warm
+    return write / steps, resume, warm, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    savers = {
+        "InMemorySaver": lambda path: InMemorySaver(),
+        "SqliteDeltaSaver": lambda path: SqliteDeltaSaver(path),
+        "SqliteDeltaSaver full": lambda path: SqliteDeltaSaver(path, snapshot_every=0),
+    }
+    print(f"{'saver':<22} {'steps':>6} {'write ms':>9} {'resume ms':>10} {'warm ms':>8} {'stored KB':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for steps in args.steps:
+            for name, make_saver in savers.items():
+                write, resume, warm, size = run(steps, make_saver, directory)
+                stored = f"{size / 1024:>10.0f}" if size is not None else f"{'-':>10}"
+                print(f"{name:<22} {steps:>6} {write * 1000:>9.2f} {resume * 1000:>10.2f} {warm * 1000:>8.2f} "
+                      f"{stored}")
+
+
+if __name__ == "__main__":
+    main()
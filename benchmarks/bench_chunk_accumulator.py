@@ -0,0 +1,76 @@
+"""
+Merging a streamed response: repeated `full + chunk` against ChunkAccumulator, for 10k token streams.
+
+Streams: plain text (OpenAI chat completions), text content blocks (Anthropic) and a single tool call
+whose args arrive in 10k fragments.
+
+Usage:
+    python -m benchmarks.bench_chunk_accumulator [--tokens 10000] [--runs 3]
+"""
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from langchain_core.messages import AIMessageChunk
+from langchain_core.messages.tool import tool_call_chunk
+
+from lctutorial.chunk_accumulator import ChunkAccumulator
+
+
+def streams(tokens: int) -> Dict[str, List[AIMessageChunk]]:
+    usage = {"input_tokens": 10, "output_tokens": tokens, "total_tokens": 10 + tokens}
+    last = AIMessageChunk(content="", usage_metadata=usage, response_metadata={"finish_reason": "stop"},
+                          chunk_position="last")
+    return {
+        "text": [AIMessageChunk(content=f"word{i} ", id="chatcmpl-1") for i in range(tokens)] + [last],
+        "content blocks": [AIMessageChunk(content=[{"type": "text", "text": f"word{i} ", "index": 0}], id="msg_1")
+                           for i in range(tokens)] + [last],
+        "tool call args": [AIMessageChunk(content="", tool_call_chunks=[tool_call_chunk(
+            name="get_weather" if i == 0 else None, id="call_1" if i == 0 else None,
+            args='{"city": "' if i == 0 else "x", index=0)]) for i in range(tokens)]
+        + [AIMessageChunk(content="", tool_call_chunks=[tool_call_chunk(args='"}', index=0)])],
+    }
+
+
+def with_plus(chunks: List[AIMessageChunk]) -> AIMessageChunk:
+    full = None
+    for chunk in chunks:
+        full = chunk if full is None else full + chunk
+    return full
+
+
+def with_accumulator(chunks: List[AIMessageChunk]) -> AIMessageChunk:
+    accumulator = ChunkAccumulator()
+    for chunk in chunks:
+        accumulator.add(chunk)
+    return accumulator.to_chunk()
+
+
+def timed(merge: Callable[[List[AIMessageChunk]], AIMessageChunk], chunks: List[AIMessageChunk],
+          runs: int) -> tuple[float, AIMessageChunk]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = merge(chunks)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'stream':<16} {'chunks':>7} {'+ ms':>10} {'accumulator ms':>15} {'speedup':>8}")
+    for name, chunks in streams(args.tokens).items():
+        plus, expected = timed(with_plus, chunks, args.runs)
+        accumulator, result = timed(with_accumulator, chunks, args.runs)
+        assert result == expected, f"{name}: accumulator result differs from +"
+        print(f"{name:<16} {len(chunks):>7} {plus * 1000:>10.1f} {accumulator * 1000:>15.1f} "
+              f"{plus / accumulator:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
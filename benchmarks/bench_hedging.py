@@ -0,0 +1,63 @@
+"""
+Tail latency of sequential chat model calls with and without hedging, against the local mock server.
+
+A share of the requests (--slow-share) stalls for --slow-ms before the server answers, all others take
+--fast-ms. Hedging sends a duplicate after the --percentile of the recent latencies, within --budget.
+For streams the latency is the time to the first chunk.
+
+Usage:
+    python -m benchmarks.bench_hedging [--provider OpenAI] [--calls 300] [--slow-share 0.05]
+        [--fast-ms 20] [--slow-ms 1000] [--percentile 90] [--budget 0.1]
+"""
+import argparse
+import time
+
+from lctutorial import init_chat_model
+from lctutorial.hedging import HedgePolicy
+from lctutorial.mock_server import MockServer, MockServerConfig
+
+
+def percentile(ordered: list, share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default="OpenAI", choices=["OpenAI", "Anthropic"])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--slow-share", type=float, default=0.05)
+    parser.add_argument("--fast-ms", type=float, default=20)
+    parser.add_argument("--slow-ms", type=float, default=1000)
+    parser.add_argument("--percentile", type=float, default=90)
+    parser.add_argument("--budget", type=float, default=0.1)
+    args = parser.parse_args()
+
+    def latency(rng):
+        return (args.slow_ms if rng.random() < args.slow_share else args.fast_ms) / 1000
+
+    print(f"{'mode':>7} {'hedging':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'requests':>9} "
+          f"{'hedge rate':>11} {'win rate':>9}")
+    for mode in ("invoke", "stream"):
+        for hedging in (False, True):
+            policy = HedgePolicy(percentile=args.percentile, budget=args.budget)
+            with MockServer(MockServerConfig(latency=latency, seed=1)) as server:
+                model = init_chat_model(provider=args.provider, use_model_cache=False, hedging=hedging and policy,
+                                        **server.model_kwargs(args.provider))
+                latencies = []
+                for i in range(args.calls):
+                    start = time.perf_counter()
+                    if mode == "invoke":
+                        model.invoke(f"question {i}")
+                    else:
+                        next(iter(model.stream(f"question {i}")))
+                    latencies.append(time.perf_counter() - start)
+                requests = server.stats().requests
+            latencies.sort()
+            stats = policy.stats()
+            print(f"{mode:>7} {'on' if hedging else 'off':>8} " + " ".join(
+                f"{percentile(latencies, share) * 1000:>8.0f}" for share in (0.5, 0.95, 0.99, 1.0))
+                + f" {requests:>9} {stats.hedge_rate:>11.1%} {stats.win_rate:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
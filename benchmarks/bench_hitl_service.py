@@ -0,0 +1,81 @@
+"""
+Load test of HITLService: threads paused at a get_weather review, then all approved in one submission.
+
+Every thread asks for the weather, the fake model calls get_weather (the HITL middleware interrupts it)
+and answers once the tool ran, each model call taking `--latency` seconds. Reported per checkpointer
+and worker count:
+    paused KB:  memory allocated per paused thread (tracemalloc, while starting the threads),
+    stored KB:  serialized checkpoint bytes per paused thread (BoundedMemorySaver only, in memory),
+    resume/s:   resumed threads per second of the bulk approval.
+
+Usage:
+    python -m benchmarks.bench_hitl_service [--threads 1000 10000] [--workers 1 64] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from lctutorial.bounded_checkpointer import BoundedMemorySaver
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.hitl_agent import create_hitl_agent
+from lctutorial.hitl_service import HITLService
+
+
+def weather(messages):
+    if isinstance(messages[-1], HumanMessage):
+        city = messages[-1].text.rsplit(" ", 1)[-1].rstrip("?")
+        return AIMessage("", tool_calls=[{"name": "get_weather", "args": {"location": city}, "id": "call_1"}])
+    return f"The weather: {messages[-1].text}"
+
+
+async def run(threads: int, workers: int, latency: float, checkpointer) -> tuple:
+    model = FakeChatModel(responses=[weather], time_to_first_token=latency)
+    service = HITLService(create_hitl_agent(model, checkpointer=checkpointer), workers=workers)
+    inputs = {f"some_id_{i}": {"messages": [{"role": "user", "content": f"What's the weather in City{i}?"}]}
+              for i in range(threads)}
+
+    tracemalloc.start()
+    gc.collect()
+    before, _ = tracemalloc.get_traced_memory()
+    await service.start_many(inputs)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(service.pending("get_weather")) == threads
+    stored = checkpointer.storage_stats().bytes if isinstance(checkpointer, BoundedMemorySaver) else None
+
+    start = time.perf_counter()
+    outcomes = await service.submit(service.approve_all("get_weather"))
+    elapsed = time.perf_counter() - start
+    assert all(outcome.error is None and not outcome.interrupted for outcome in outcomes.values())
+    return (after - before) / threads, stored / threads if stored is not None else None, threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 64])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--max-mb", type=float, default=16, help="Budget of BoundedMemorySaver")
+    args = parser.parse_args()
+
+    checkpointers = {
+        "InMemorySaver": InMemorySaver,
+        "BoundedMemorySaver": lambda: BoundedMemorySaver(max_bytes=int(args.max_mb * 1024 * 1024), keep_last=2),
+    }
+    print(f"{'checkpointer':<20} {'threads':>8} {'workers':>8} {'paused KB':>10} {'stored KB':>10} {'resume/s':>10}")
+    for threads in args.threads:
+        for workers in args.workers:
+            for name, checkpointer in checkpointers.items():
+                paused, stored, throughput = asyncio.run(run(threads, workers, args.latency, checkpointer()))
+                stored = f"{stored / 1024:>10.2f}" if stored is not None else f"{'-':>10}"
+                print(f"{name:<20} {threads:>8} {workers:>8} {paused / 1024:>10.2f} {stored} {throughput:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
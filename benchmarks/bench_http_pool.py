@@ -0,0 +1,119 @@
+"""
+Requests per second and connection handshakes with and without the shared http pool.
+
+A local keep-alive HTTP/1.1 endpoint answers OpenAI chat completion requests and counts every accepted
+TCP connection (a TLS handshake per connection against the real APIs). Several differently configured
+models, as created by different test modules / workers, send requests concurrently.
+
+Usage:
+    python -m benchmarks.bench_http_pool [--requests 400] [--concurrency 8] [--models 8]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+import httpx
+
+from lctutorial import init_chat_model
+
+_COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4.1",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "pong"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}).encode()
+
+
+class _CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _CompletionHandler)
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-alive
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_COMPLETION)))
+        self.end_headers()
+        self.wfile.write(_COMPLETION)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _run(name: str, server: _CountingServer, requests: int, concurrency: int,
+         model_for_request: Callable[[int], object]) -> None:
+    server.connections = 0
+
+    def call(i: int):
+        model_for_request(i).invoke("ping")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:<28} {requests:>8} {elapsed:>9.2f} {requests / elapsed:>9.1f} {server.connections:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--models", type=int, default=8, help="Number of differently configured models")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    server = _CountingServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    def fresh_model(i: int):
+        # Worst case: a new model and client per request
+        return init_chat_model(provider="OpenAI", base_url=base_url, temperature=i % args.models,
+                               use_model_cache=False, http_client=httpx.Client())
+
+    own_client_models: List[object] = [
+        init_chat_model(provider="OpenAI", base_url=base_url, temperature=i, use_model_cache=False,
+                        http_client=httpx.Client())
+        for i in range(args.models)
+    ]
+    pooled_models: List[object] = [
+        init_chat_model(provider="OpenAI", base_url=base_url, temperature=i, use_model_cache=False)
+        for i in range(args.models)
+    ]
+
+    print(f"{'scenario':<28} {'requests':>8} {'seconds':>9} {'req/s':>9} {'connections':>12}")
+    _run("client per request", server, args.requests, args.concurrency, fresh_model)
+    _run("client per model", server, args.requests, args.concurrency,
+         lambda i: own_client_models[i % args.models])
+    _run("shared pool", server, args.requests, args.concurrency,
+         lambda i: pooled_models[i % args.models])
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cold start cost of importing the lctutorial package and its agent modules.
+
+Every sample runs in a fresh interpreter and reports the wall time of the import statement and the
+number of modules it added to sys.modules. With --max-ms / --max-modules the script exits non-zero
+when the median of any import exceeds the budget, so it can guard cold start in CI.
+
+Usage:
+    python -m benchmarks.bench_import [--runs 10] [--max-ms 50] [--max-modules 200]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+TARGETS = {
+    "import lctutorial": "import lctutorial",
+    "import lctutorial.weather_agent": "import lctutorial.weather_agent",
+    "import lctutorial.summarize_agent": "import lctutorial.summarize_agent",
+}
+
+# Not guarded, shows where the deferred cost went
+REFERENCE = {
+    "first init_chat_model(OpenAI)": (
+        "import os; os.environ.setdefault('OPENAI_API_KEY', 'sk-bench'); "
+        "from lctutorial import init_chat_model; init_chat_model(provider='OpenAI')"
+    ),
+}
+
+_PROBE = """
+import json, sys, time
+before = len(sys.modules)
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "modules": len(sys.modules) - before}}))
+"""
+
+
+def _sample(statement: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", _PROBE.format(statement=statement)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(statement: str, runs: int) -> tuple[float, float, int]:
+    samples = [_sample(statement) for _ in range(runs)]
+    times = [sample["ms"] for sample in samples]
+    return statistics.median(times), min(times), max(sample["modules"] for sample in samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None, help="Budget for the median import time")
+    parser.add_argument("--max-modules", type=int, default=None, help="Budget for newly loaded modules")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'import':<36} {'median ms':>10} {'min ms':>8} {'modules':>8}")
+    for name, statement in {**TARGETS, **REFERENCE}.items():
+        median, minimum, modules = measure(statement, args.runs)
+        print(f"{name:<36} {median:>10.1f} {minimum:>8.1f} {modules:>8}")
+
+        if name not in TARGETS:
+            continue
+        if args.max_ms is not None and median > args.max_ms:
+            failures.append(f"{name}: {median:.1f} ms > {args.max_ms} ms")
+        if args.max_modules is not None and modules > args.max_modules:
+            failures.append(f"{name}: {modules} modules > {args.max_modules}")
+
+    if failures:
+        print("\nCold start budget exceeded:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Latency of safety guardrails on a streamed agent answer: the post-hoc after_agent hook against
+StreamingSafetyGuardrail (with and without the local SafetyPrefilter in front of the safety model),
+with fake models for the agent and for the safety evaluation. The prefilter allows the sentence the
+answer repeats, and a partial one at the end of the streamed text.
+
+The agent calls get_weather, then streams an answer of `--words` words at `--tps` tokens per second.
+Each ResponseSafety evaluation takes `--check` seconds. Reported per guardrail (means of `--runs` runs):
+    first token:     seconds until the first token of the answer reaches the caller,
+    first checked:   seconds until the first token that passed a safety check (the post-hoc hook
+                     checks after the whole stream, its tokens reach the caller unchecked),
+    total:           seconds until the agent finished,
+    added:           total minus the total without a guardrail.
+
+Usage:
+    python -m benchmarks.bench_safety_guardrail [--words 150] [--tps 100] [--check 0.3] [--window 200 400]
+"""
+import argparse
+import re
+import statistics
+import time
+
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.tools import tool
+
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.safety_guardrail import LLMSafetyClassifier, StreamingSafetyGuardrail, post_hoc_safety_guardrail
+from lctutorial.safety_prefilter import PrefilteredSafetyClassifier, SafetyPrefilter
+
+
+@tool
+def get_weather(city: str) -> str:
+    """Get weather for a given city."""
+    return f"It's always sunny in {city}!"
+
+
+SENTENCE = "It's always sunny in Boston, with a light breeze and no rain."
+
+
+def agent_model(words: int, tps: float) -> FakeChatModel:
+    answer = " ".join([SENTENCE] * (words // 12 + 1))
+    return FakeChatModel(responses=[
+        AIMessage("", tool_calls=[{"name": "get_weather", "args": {"city": "Boston"}, "id": "call_1"}]),
+        " ".join(answer.split()[:words]),
+    ], tokens_per_second=tps, time_to_first_token=0.2)
+
+
+def safety_classifier(latency: float) -> LLMSafetyClassifier:
+    return LLMSafetyClassifier(FakeChatModel(responses=[AIMessage("", tool_calls=[
+        {"name": "ResponseSafety", "args": {"evaluation": "safe"}, "id": "call_1"}])], time_to_first_token=latency))
+
+
+def run(agent, checked_while_streaming: bool) -> tuple:
+    start = time.perf_counter()
+    first = None
+    for token, metadata in agent.stream({"messages": [{"role": "user", "content": "What is the weather in Boston?"}]},
+                                        stream_mode="messages"):
+        if first is None and isinstance(token, AIMessageChunk) and token.text:
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return first, first if checked_while_streaming else total, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=150)
+    parser.add_argument("--tps", type=float, default=100)
+    parser.add_argument("--check", type=float, default=0.3, help="Seconds per safety evaluation")
+    parser.add_argument("--window", type=int, nargs="+", default=[200, 400])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    guardrails = {"none": (lambda: [], True),
+                  "after_agent hook": (lambda: [post_hoc_safety_guardrail(safety_classifier(args.check))], False)}
+    for window in args.window:
+        guardrails[f"streaming, window {window}"] = (
+            lambda window=window: [StreamingSafetyGuardrail(safety_classifier(args.check), window=window)], True)
+    guardrails[f"prefilter, window {args.window[0]}"] = (lambda: [StreamingSafetyGuardrail(
+        PrefilteredSafetyClassifier(SafetyPrefilter(allow=[re.escape(SENTENCE)], max_safe_length=len(SENTENCE)),
+                                    safety_classifier(args.check)), window=args.window[0])], True)
+
+    print(f"{'guardrail':<24} {'first token':>12} {'first checked':>14} {'total':>8} {'added':>8}")
+    baseline = None
+    for name, (middleware, checked_while_streaming) in guardrails.items():
+        results = [run(create_agent(model=agent_model(args.words, args.tps), tools=[get_weather],
+                                    middleware=middleware()), checked_while_streaming) for _ in range(args.runs)]
+        first, checked, total = (statistics.mean(values) for values in zip(*results))
+        baseline = total if baseline is None else baseline
+        checked = f"{checked:>14.3f}" if name != "none" else f"{'-':>14}"
+        print(f"{name:<24} {first:>12.3f} {checked} {total:>8.3f} {total - baseline:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Lookup latency of the semantic cache with 10k, 100k and 1M cached entries.
+
+Each size is measured in memory and after a flush/reopen, where the vectors are memory mapped. The
+cache is filled directly with perturbed copies of vectorized weather questions: filling it through
+update() would mostly time the vectorizer and the duplicate check of each insert.
+
+Usage:
+    python -m benchmarks.bench_semantic_cache [--sizes 10000 100000 1000000] [--lookups 200] [--dim 256]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+from langchain_core.load import dumps
+
+from lctutorial.semantic_cache import SemanticCache
+
+CITIES = ["Paris", "Tokyo", "Boston", "San Francisco", "Berlin", "Sydney", "Lagos", "Lima", "Oslo", "Seoul"]
+TEMPLATES = ["what is the weather in {city}", "weather {city} {day}", "will it rain in {city} {day}",
+             "how warm is it in {city} {day}", "forecast for {city} on {day}"]
+DAYS = ["today", "tomorrow", "monday", "friday", "this weekend"]
+LLM_STRING = "bench"
+
+
+def questions() -> list[str]:
+    return [template.format(city=city, day=day) for template in TEMPLATES for city in CITIES for day in DAYS]
+
+
+def fill(cache: SemanticCache, size: int, rng: np.random.Generator) -> None:
+    base = cache.vectorizer.transform_many(questions())
+    context = cache.context_key("", LLM_STRING)
+    entry = dumps([ChatGeneration(message=AIMessage("It's always sunny!"))])
+    for start in range(0, size, 100_000):
+        stop = min(start + 100_000, size)
+        vectors = base[np.arange(start, stop) % len(base)]
+        vectors = vectors + rng.normal(0, 0.01, vectors.shape).astype(np.float32)
+        cache._vectors[start:stop] = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    cache._contexts[:size] = context
+    cache._last_used[:size] = np.arange(1, size + 1)
+    cache._entries[:size] = [entry] * size
+    cache._size = cache._clock = size
+
+
+def measure(cache: SemanticCache, prompts: list[str]) -> tuple[float, float, float]:
+    times = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        cache.lookup(prompt, LLM_STRING)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99) - 1], cache.stats().hit_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Half rephrasings of cached questions, half unrelated ones
+    prompts = [f"What's the weather like in {CITIES[i % len(CITIES)]} today?" if i % 2 else
+               f"Translate sentence number {i} into French" for i in range(args.lookups)]
+
+    print(f"{'entries':>10} {'storage':>8} {'MiB':>7} {'median ms':>10} {'p99 ms':>8} {'hit rate':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as path:
+            cache = SemanticCache(capacity=size, dim=args.dim, path=path)
+            fill(cache, size, rng)
+            mib = cache._vectors.nbytes / 2 ** 20
+            median, p99, hit_rate = measure(cache, prompts)
+            print(f"{size:>10} {'memory':>8} {mib:>7.0f} {median:>10.2f} {p99:>8.2f} {hit_rate:>9.0%}")
+
+            cache.flush()
+            del cache
+            cache = SemanticCache(capacity=size, dim=args.dim, path=path)
+            median, p99, hit_rate = measure(cache, prompts)
+            print(f"{size:>10} {'mmap':>8} {mib:>7.0f} {median:>10.2f} {p99:>8.2f} {hit_rate:>9.0%}")
+            del cache
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Bytes and CPU per streamed step of stream_weather_agent, "values" against "deltas", at long histories.
+
+Each streamed item is serialized as it would be forwarded to a client. The deltas consumer additionally
+rebuilds the full state with DeltaState. The Fake provider stands in for the model.
+
+Usage:
+    python -m benchmarks.bench_stream_deltas [--lengths 100 1000 5000] [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, HumanMessage
+
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.stream_deltas import DeltaState
+from lctutorial.weather_agent import create_weather_agent, stream_weather_agent
+
+
+def history(length: int) -> list:
+    return [HumanMessage(f"question {i} about the weather somewhere") if i % 2 == 0 else
+            AIMessage(f"answer {i}: it's always sunny there!") for i in range(length - 1)]
+
+
+def consume(agent, mode: str, messages: list) -> list[int]:
+    """Bytes sent per streamed item."""
+    sent = []
+    state = DeltaState()
+    for _, chunk in stream_weather_agent("Paris", mode, agent=agent, history=messages):
+        if mode == "deltas":
+            state.apply(chunk)
+            sent.append(len(json.dumps(chunk.to_dict())))
+        else:
+            sent.append(len(dumps(chunk)))
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    agent = create_weather_agent(model=FakeChatModel(responses=[
+        AIMessage("", tool_calls=[{"name": "get_weather", "args": {"city": "Paris"}, "id": None}]),
+        "It's always sunny in Paris!",
+    ]))
+
+    # The first item carries the history in both modes, the later ones show the per step difference
+    print(f"{'messages':>8} {'mode':>7} {'items':>6} {'first KiB':>10} {'KiB/step':>10} {'CPU ms/item':>12}")
+    for length in args.lengths:
+        messages = history(length)
+        for mode in ("values", "deltas"):
+            cpu = []
+            for _ in range(args.runs):
+                start = time.process_time()
+                sent = consume(agent, mode, messages)
+                cpu.append(time.process_time() - start)
+            cpu_per_item = statistics.median(cpu) / len(sent) * 1000
+            per_step = sum(sent[1:]) / (len(sent) - 1) / 1024
+            print(f"{length:>8} {mode:>7} {len(sent):>6} {sent[0] / 1024:>10.1f} {per_step:>10.1f} "
+                  f"{cpu_per_item:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
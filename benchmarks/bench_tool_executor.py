@@ -0,0 +1,78 @@
+"""
+Wall time of executing the tool calls of one AIMessage: the sequential `tool.invoke(tool_call)` loop
+against ToolExecutor.run (thread pool) and ToolExecutor.arun (asyncio.gather).
+
+The tools sleep for an injected latency, like a weather API would take to answer. `--limit` caps the
+concurrently running calls per tool.
+
+Usage:
+    python -m benchmarks.bench_tool_executor [--calls 1 4 16 64] [--latency 0.05] [--limit 8]
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+from lctutorial.tool_executor import ToolExecutor
+
+
+def latency_tools(latency: float) -> list:
+    def get_weather(city: str) -> str:
+        """Get weather for a given city."""
+        time.sleep(latency)
+        return f"It's always sunny in {city}!"
+
+    async def aget_population(city: str) -> str:
+        """Get the population of a given city."""
+        await asyncio.sleep(latency)
+        return f"{city} has 1,000,000 inhabitants."
+
+    return [StructuredTool.from_function(get_weather),
+            StructuredTool.from_function(coroutine=aget_population, name="get_population")]
+
+
+def tool_calls(count: int) -> list:
+    return AIMessage("", tool_calls=[{"name": "get_weather" if i % 2 == 0 else "get_population",
+                                      "args": {"city": f"City {i}"}, "id": f"call_{i}"}
+                                     for i in range(count)]).tool_calls
+
+
+def sequential(tools: dict, calls: list) -> list:
+    results = []
+    for tool_call in calls:
+        tool = tools[tool_call["name"]]
+        results.append(tool.invoke(tool_call) if tool.func else asyncio.run(tool.ainvoke(tool_call)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--limit", type=int, default=8, help="Concurrent calls per tool")
+    args = parser.parse_args()
+
+    tools = {tool.name: tool for tool in latency_tools(args.latency)}
+    executor = ToolExecutor(tools, max_workers=2 * args.limit,
+                            concurrency={name: args.limit for name in tools})
+
+    print(f"{'calls':>6} {'sequential ms':>14} {'run ms':>9} {'arun ms':>9} {'speedup':>8}")
+    with executor:
+        for count in args.calls:
+            calls = tool_calls(count)
+            timings = {}
+            for name, execute in (("sequential", lambda: sequential(tools, calls)),
+                                  ("run", lambda: executor.run(calls)),
+                                  ("arun", lambda: asyncio.run(executor.arun(calls)))):
+                start = time.perf_counter()
+                results = execute()
+                timings[name] = time.perf_counter() - start
+                assert [m.tool_call_id for m in results] == [call["id"] for call in calls], name
+            print(f"{count:>6} {timings['sequential'] * 1000:>14.0f} {timings['run'] * 1000:>9.0f} "
+                  f"{timings['arun'] * 1000:>9.0f} {timings['sequential'] / timings['run']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,55 @@
-from dotenv import load_dotenv
+from __future__ import annotations
 
-import langchain.chat_models
+import os
+from functools import cache
+from typing import Optional, TYPE_CHECKING, Union
 
-from langchain_core.language_models import BaseChatModel
-from typing import Optional
+from lctutorial.model_cache import CacheInfo, ModelCache
 
-load_dotenv()
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.caches import BaseCache
+    from lctutorial.adaptive_concurrency import AdaptiveConcurrency
+    from lctutorial.hedging import HedgePolicy
+    from lctutorial.rate_limiter import ProviderRateLimiter
 
+# Importing the package has no side effects and does not pull in langchain or any provider SDK,
+# those imports (and loading .env) are deferred to the first init_chat_model call for a provider.
+
+_model_cache = ModelCache(maxsize=32)
+
+# The setting (and environment variable) that routes a provider's requests through a proxy
+_PROXY_SETTINGS = {"OpenAI": "openai_proxy", "Anthropic": "anthropic_proxy"}
+
+
+@cache
+def load_env() -> None:
+    """Load the .env file once per process."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def _build_chat_model(provider: str, tokens: Optional[int] = None, model_name: Optional[str] = None,
+                      use_http_pool: bool = True, response_cache: Optional[BaseCache] = None,
+                      adaptive_concurrency: Union[bool, AdaptiveConcurrency] = False,
+                      rate_limiter: Optional[ProviderRateLimiter] = None,
+                      hedging: Union[bool, HedgePolicy] = False, **kwargs) -> BaseChatModel:
+    load_env()
 
-def init_chat_model(provider: str, tokens: Optional[int] = None, model_name: Optional[str] = None, **kwargs) -> BaseChatModel:
     model = None
+    proxy_setting = _PROXY_SETTINGS.get(provider)
+    proxy = kwargs[proxy_setting] if proxy_setting in kwargs else os.environ.get(str(proxy_setting).upper())
+    # The pooled clients don't go through a proxy, a model with one builds its own clients
+    if use_http_pool and proxy_setting and not proxy:
+        from lctutorial import http_pool
+
+        # An explicitly passed client wins over the shared pool
+        kwargs.setdefault("http_client", http_pool.get_http_client())
+        kwargs.setdefault("http_async_client", http_pool.get_async_http_client())
+
     if provider == "OpenAI":
+        import langchain.chat_models
+
         if not model_name:
             model_name = "gpt-4.1"
         init_kwargs = {
@@ -21,9 +60,16 @@ def init_chat_model(provider: str, tokens: Optional[int] = None, model_name: Opt
         if tokens is not None and "max_tokens" not in init_kwargs:
             init_kwargs["max_tokens"] = tokens
 
-        model = langchain.chat_models.init_chat_model(model_name, **init_kwargs)
+        if init_kwargs.pop("prompt_caching", False):
+            from lctutorial.chat_openai import ChatOpenAI
+
+            model = ChatOpenAI(model=model_name, prompt_caching=True, **init_kwargs)
+        else:
+            model = langchain.chat_models.init_chat_model(model_name, **init_kwargs)
 
     elif provider == "Anthropic":
+        from lctutorial.chat_anthropic import ChatAnthropic
+
         if not model_name:
             model_name = "claude-sonnet-4-5-20250929"
         init_kwargs = {
@@ -33,5 +79,107 @@ def init_chat_model(provider: str, tokens: Optional[int] = None, model_name: Opt
         if tokens is not None and "max_tokens" not in init_kwargs:
             init_kwargs["max_tokens"] = tokens
 
-        model = langchain.chat_models.init_chat_model(model_name, **init_kwargs)
+        # Own ChatAnthropic subclass, the langchain_anthropic one cannot be handed an http client
+        model = ChatAnthropic(model=model_name, **init_kwargs)
+
+    elif provider == "Fake":
+        from lctutorial.fake_chat_model import FakeChatModel
+
+        init_kwargs = dict(kwargs)
+        if model_name:
+            init_kwargs["model_name"] = model_name
+        if tokens is not None and "max_tokens" not in init_kwargs:
+            init_kwargs["max_tokens"] = tokens
+
+        # Scripted, offline model for benchmarks and load tests, see lctutorial.fake_chat_model
+        model = FakeChatModel(**init_kwargs)
+        model_name = model.model_name
+
+    if model is not None and adaptive_concurrency:
+        from lctutorial.adaptive_concurrency import AdaptiveConcurrency, AdaptiveConcurrencyChatModel
+
+        controller = adaptive_concurrency if isinstance(adaptive_concurrency, AdaptiveConcurrency) else None
+        model = AdaptiveConcurrencyChatModel(inner=model, controller=controller or AdaptiveConcurrency())
+
+    # Waiting for rate limit budget happens outside of the concurrency permits
+    if model is not None and rate_limiter is not None:
+        from lctutorial.rate_limiter import RateLimitedChatModel
+
+        model = RateLimitedChatModel(inner=model, provider_rate_limiter=rate_limiter,
+                                     rate_limiter_key=f"{provider}:{model_name}")
+
+    # Duplicates go through the rate limiter and the concurrency limit like any other request
+    if model is not None and hedging:
+        from lctutorial.hedging import HedgedChatModel, HedgePolicy
+
+        model = HedgedChatModel(inner=model, policy=hedging if isinstance(hedging, HedgePolicy) else HedgePolicy())
+
+    # Outermost, cache hits never wait for a concurrency permit or rate limit
+    if model is not None and response_cache is not None:
+        from lctutorial.response_cache import CachedChatModel
+
+        model = CachedChatModel(inner=model, response_cache=response_cache)
     return model
+
+
+def init_chat_model(provider: str, tokens: Optional[int] = None, model_name: Optional[str] = None,
+                    use_model_cache: bool = True, use_http_pool: bool = True,
+                    response_cache: Optional[BaseCache] = None,
+                    adaptive_concurrency: Union[bool, AdaptiveConcurrency] = False,
+                    rate_limiter: Optional[ProviderRateLimiter] = None,
+                    hedging: Union[bool, HedgePolicy] = False, **kwargs) -> BaseChatModel:
+    """Create a chat model for the given provider ("OpenAI", "Anthropic" or "Fake").
+
+    Models built from identical arguments are shared through a process-wide LRU cache, so the
+    provider client (and its connections) is only set up once. Pass use_model_cache=False to
+    always get a fresh instance, e.g. when the model is going to be mutated. "Fake" models are never
+    cached, each one plays its script from the first response.
+
+    All models send their requests through the shared connection pool of lctutorial.http_pool
+    unless use_http_pool=False, an own http_client / http_async_client is passed or the model uses a
+    proxy (openai_proxy / anthropic_proxy, or the OPENAI_PROXY / ANTHROPIC_PROXY environment variable).
+
+    With a response_cache (see lctutorial.response_cache.ResponseCache) identical requests are answered
+    from the cache, for invoke/batch as well as for stream. A lctutorial.semantic_cache.SemanticCache
+    also answers requests that are worded differently.
+
+    With adaptive_concurrency (True or a lctutorial.adaptive_concurrency.AdaptiveConcurrency) the number of
+    requests in flight adapts to latency, 429s and rate-limit headers instead of a fixed max_concurrency.
+
+    A rate_limiter (lctutorial.rate_limiter.ProviderRateLimiter) shares request and token budgets per
+    provider and model with all other models, threads and processes using it.
+
+    With hedging (True or a lctutorial.hedging.HedgePolicy) calls slower than a percentile of the recent
+    latencies are sent a second time, the first answer wins.
+
+    With prompt_caching=True Anthropic models mark the stable prefix of every request (tools, system
+    prompt, earlier turns) for Anthropic's prompt cache, OpenAI models send it in a canonical order with
+    a prompt_cache_key per agent. lctutorial.prompt_cache.PromptCacheUsage reports the cache reads and
+    writes per thread.
+    """
+    # A shared FakeChatModel would share its position in the script between callers
+    if not use_model_cache or provider == "Fake":
+        return _build_chat_model(provider, tokens, model_name, use_http_pool, response_cache, adaptive_concurrency,
+                                 rate_limiter, hedging, **kwargs)
+
+    key = ModelCache.make_key(provider, model_name, {"tokens": tokens, "use_http_pool": use_http_pool,
+                                                     "response_cache": response_cache,
+                                                     "adaptive_concurrency": adaptive_concurrency,
+                                                     "rate_limiter": rate_limiter, "hedging": hedging, **kwargs})
+    return _model_cache.get_or_create(
+        key, lambda: _build_chat_model(provider, tokens, model_name, use_http_pool, response_cache,
+                                       adaptive_concurrency, rate_limiter, hedging, **kwargs))
+
+
+def model_cache_info() -> CacheInfo:
+    """Hit/miss counters and size of the model instance cache."""
+    return _model_cache.info()
+
+
+def model_cache_clear() -> None:
+    _model_cache.clear()
+
+
+def set_model_cache_maxsize(maxsize: int) -> None:
+    """Resize the model instance cache, a maxsize of 0 disables caching."""
+    _model_cache.set_maxsize(maxsize)
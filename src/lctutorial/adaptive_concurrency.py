@@ -0,0 +1,353 @@
+"""
+Adaptive concurrency for chat models: the number of requests in flight follows what the provider takes.
+
+A fixed `max_concurrency` is either too low (wasted throughput) or too high (429 storms). The
+AdaptiveConcurrency controller instead adjusts a concurrency limit per completed request (AIMD):
+    - a success raises the limit additively, by about one per round trip while the limit is used up,
+    - a 429 (or a 529 overload) halves it, at most once per round trip,
+    - a latency well above the best observed one lowers it by the latency gradient,
+    - a provider rate-limit header announcing fewer remaining requests than the limit caps it.
+Calls beyond the limit wait in a FIFO queue, stats() reports the limit, requests in flight and queue depth.
+
+Example:
+    >>> model = init_chat_model(provider="OpenAI", adaptive_concurrency=True)
+    >>> for index, result in model.batch_as_completed(questions):
+    ...     print(index, result.text, model.controller.stats())
+
+Response heads (status, rate-limit headers) are observed on lctutorial.http_pool's clients, which also
+catches the 429s the provider SDK retries on its own. Models on other clients only learn from latency
+and from the rate-limit errors that reach them.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Iterator, List, Mapping, Optional, Sequence, Union
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig
+from pydantic import ConfigDict
+
+from lctutorial.chat_model_wrapper import DelegatingChatModel
+
+_RATE_LIMIT_STATUSES = (429, 529)
+# Remaining requests of the current rate-limit window, OpenAI and Anthropic style
+_REMAINING_HEADERS = ("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining")
+
+
+@dataclass
+class ConcurrencyStats:
+    limit: float
+    in_flight: int
+    queue_depth: int
+    max_in_flight: int = 0
+    completed: int = 0
+    errors: int = 0
+    rate_limited: int = 0       # 429/529 responses, including the ones retried by the SDK
+    min_latency: Optional[float] = None
+
+
+class _ThreadWaiter:
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wake(self) -> None:
+        self.event.set()
+
+
+class _TaskWaiter:
+    __slots__ = ("loop", "future")
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def wake(self) -> None:
+        self.loop.call_soon_threadsafe(self._set)
+
+    def _set(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit shared by all threads and event loops using it.
+
+    Args:
+        initial: Starting limit.
+        min_limit / max_limit: Bounds of the limit.
+        increase: Additive increase per round trip in which the limit was used up.
+        decrease: Factor applied to the limit on a rate-limit response.
+        latency_tolerance: Latencies up to this multiple of the best observed latency count as healthy.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64, increase: float = 1.0,
+                 decrease: float = 0.5, latency_tolerance: float = 2.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters: Deque[Union[_ThreadWaiter, _TaskWaiter]] = deque()
+        self._lock = threading.Lock()
+        self._stats = ConcurrencyStats(limit=self._limit, in_flight=0, queue_depth=0)
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, math.floor(self._limit))
+
+    def stats(self) -> ConcurrencyStats:
+        with self._lock:
+            return ConcurrencyStats(**{**self._stats.__dict__, "limit": self._limit, "in_flight": self._in_flight,
+                                       "queue_depth": len(self._waiters)})
+
+    # Permits
+
+    def _try_acquire(self) -> bool:
+        if not self._waiters and self._in_flight < self.limit:
+            self._take()
+            return True
+        return False
+
+    def _take(self) -> None:
+        self._in_flight += 1
+        self._stats.max_in_flight = max(self._stats.max_in_flight, self._in_flight)
+
+    def _wake_waiters(self) -> None:
+        # Hands the free permits to the longest waiting callers
+        while self._waiters and self._in_flight < self.limit:
+            self._take()
+            self._waiters.popleft().wake()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = _ThreadWaiter()
+            self._waiters.append(waiter)
+        waiter.event.wait()
+
+    async def aacquire(self) -> None:
+        with self._lock:
+            if self._try_acquire():
+                return
+            waiter = _TaskWaiter()
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The permit was handed over already
+            self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_waiters()
+
+    # Feedback
+
+    def on_response(self, status: int, headers: Mapping[str, str]) -> None:
+        """Feedback from a response head, called for every attempt of a request."""
+        with self._lock:
+            if status in _RATE_LIMIT_STATUSES:
+                self._stats.rate_limited += 1
+                self._on_rate_limited(time.monotonic())
+                return
+            for name in _REMAINING_HEADERS:
+                remaining = headers.get(name)
+                if remaining is not None and remaining.isdigit() and int(remaining) < self._limit:
+                    self._limit = float(max(self.min_limit, int(remaining)))
+
+    def on_rate_limited(self) -> None:
+        """A rate-limit error the response observer did not see."""
+        with self._lock:
+            self._stats.rate_limited += 1
+            self._on_rate_limited(time.monotonic())
+
+    def _on_rate_limited(self, now: float) -> None:
+        # One burst of 429s is one signal: decrease at most once per (best) round trip
+        if now - self._last_decrease >= (self._stats.min_latency or 0.0):
+            self._limit = max(float(self.min_limit), self._limit * self.decrease)
+            self._last_decrease = now
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            stats = self._stats
+            stats.completed += 1
+            stats.min_latency = latency if stats.min_latency is None else min(stats.min_latency, latency)
+            gradient = self.latency_tolerance * stats.min_latency / latency if latency > 0 else 1.0
+            if gradient < 1.0:
+                self._limit = max(float(self.min_limit), self._limit * max(gradient, self.decrease))
+            elif self._in_flight + len(self._waiters) >= self.limit:
+                # Additive increase only while the limit is what holds calls back
+                self._limit = min(float(self.max_limit), self._limit + self.increase / self._limit)
+            self._wake_waiters()
+
+    def on_error(self) -> None:
+        with self._lock:
+            self._stats.errors += 1
+
+
+def _is_rate_limit_error(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) in _RATE_LIMIT_STATUSES
+
+
+class _Attempt:
+    """Feedback of one model call, forwarded from the pooled HTTP clients."""
+
+    def __init__(self, controller: AdaptiveConcurrency):
+        self.controller = controller
+        self.saw_rate_limit = False
+        self.start = time.monotonic()
+
+    def __call__(self, response) -> None:
+        self.saw_rate_limit = self.saw_rate_limit or response.status_code in _RATE_LIMIT_STATUSES
+        self.controller.on_response(response.status_code, response.headers)
+
+    def failed(self, error: BaseException) -> None:
+        if _is_rate_limit_error(error) and not self.saw_rate_limit:
+            self.controller.on_rate_limited()
+        self.controller.on_error()
+
+
+def _with_max_concurrency(config: Optional[Union[RunnableConfig, Sequence[RunnableConfig]]],
+                          max_concurrency: int) -> Union[RunnableConfig, List[RunnableConfig]]:
+    if config is None or isinstance(config, Mapping):
+        return {"max_concurrency": max_concurrency, **(config or {})}
+    return [{"max_concurrency": max_concurrency, **c} for c in config]
+
+
+class AdaptiveConcurrencyChatModel(DelegatingChatModel):
+    """Runs every call of the inner model under the concurrency limit of `controller`.
+
+    batch/batch_as_completed default max_concurrency to the controller's max_limit, so that the limit
+    and not the thread pool size decides how many requests are in flight.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    controller: AdaptiveConcurrency
+
+    def batch(self, inputs, config=None, *, return_exceptions: bool = False, **kwargs: Any):
+        return super().batch(inputs, _with_max_concurrency(config, self.controller.max_limit),
+                             return_exceptions=return_exceptions, **kwargs)
+
+    def batch_as_completed(self, inputs, config=None, *, return_exceptions: bool = False, **kwargs: Any):
+        return super().batch_as_completed(inputs, _with_max_concurrency(config, self.controller.max_limit),
+                                          return_exceptions=return_exceptions, **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        from lctutorial.http_pool import observe_responses
+
+        self.controller.acquire()
+        attempt = _Attempt(self.controller)
+        try:
+            with observe_responses(attempt):
+                result = super()._generate(messages, stop, run_manager, **kwargs)
+        except BaseException as error:
+            attempt.failed(error)
+            raise
+        finally:
+            self.controller.release()
+        self.controller.on_success(time.monotonic() - attempt.start)
+        return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        from lctutorial.http_pool import observe_responses
+
+        await self.controller.aacquire()
+        attempt = _Attempt(self.controller)
+        try:
+            with observe_responses(attempt):
+                result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+        except BaseException as error:
+            attempt.failed(error)
+            raise
+        finally:
+            self.controller.release()
+        self.controller.on_success(time.monotonic() - attempt.start)
+        return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        from lctutorial.http_pool import observe_responses
+
+        # Streams hold their permit until the last chunk, the latency signal is the time to first chunk
+        self.controller.acquire()
+        attempt = _Attempt(self.controller)
+        latency = None
+        try:
+            chunks = super()._stream(messages, stop, run_manager, **kwargs)
+            with observe_responses(attempt):
+                first = next(chunks, None)
+            latency = time.monotonic() - attempt.start
+            if first is not None:
+                yield first
+                yield from chunks
+        except BaseException as error:
+            if not isinstance(error, GeneratorExit):
+                attempt.failed(error)
+            raise
+        finally:
+            self.controller.release()
+        self.controller.on_success(latency)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        from lctutorial.http_pool import observe_responses
+
+        await self.controller.aacquire()
+        attempt = _Attempt(self.controller)
+        latency = None
+        try:
+            chunks = super()._astream(messages, stop, run_manager, **kwargs)
+            with observe_responses(attempt):
+                first = await anext(chunks, None)
+            latency = time.monotonic() - attempt.start
+            if first is not None:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+        except BaseException as error:
+            if not isinstance(error, GeneratorExit):
+                attempt.failed(error)
+            raise
+        finally:
+            self.controller.release()
+        self.controller.on_success(latency)
@@ -0,0 +1,332 @@
+"""
+In-memory LangGraph checkpointer with a memory budget: short histories, idle threads spilled to disk.
+
+InMemorySaver keeps every checkpoint of every thread for the life of the process, with thousands of
+threads (one per conversation, most of them idle or paused at a human in the loop interrupt) it grows
+without limit. BoundedMemorySaver keeps the last `keep_last` checkpoints per thread (and namespace),
+with their pending writes and the channel values they reference, and once the serialized size of all
+threads in memory exceeds `max_bytes` it moves the least recently used threads to a spill file.
+A spilled thread is loaded back on its next access, e.g. `invoke(Command(resume=...), config)`.
+
+Example:
+    >>> checkpointer = BoundedMemorySaver(max_bytes=64 * 1024 * 1024, keep_last=4)
+    >>> agent = create_hitl_agent(model, checkpointer=checkpointer)
+    >>> agent.invoke({"messages": [...]}, {"configurable": {"thread_id": "some_id"}})
+    ... # Thousands of other threads later
+    >>> agent.invoke(Command(resume={"decisions": [{"type": "approve"}]}), {"configurable": {"thread_id": "some_id"}})
+    >>> checkpointer.storage_stats(), checkpointer.bytes_by_thread()["some_id"]
+
+Byte counts are the sizes of the serialized checkpoints, channel values and writes, not of the Python
+objects holding them. The thread being written is never spilled, so a single thread larger than the
+budget stays in memory. Checkpoints older than the last `keep_last` are gone, time travel (and
+get_state_history) only reaches back that far. The spill file is scratch space of the saver: a
+temporary file by default, cleared when opened and not meant to survive a restart (see
+SqliteDeltaSaver for a persistent checkpointer).
+"""
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, bytes INTEGER NOT NULL, data BLOB)"
+
+
+@dataclass
+class MemoryStats:
+    threads: int                # Threads in memory
+    bytes: int                  # Serialized bytes of the threads in memory
+    spilled_threads: int
+    spilled_bytes: int          # Serialized bytes of the spilled threads (before compression)
+    evictions: int = 0
+    reloads: int = 0
+
+
+@dataclass
+class _Thread:
+    bytes: int = 0
+    # (checkpoint_ns, checkpoint_id) -> channel versions of the checkpoint
+    versions: Dict[Tuple[str, str], ChannelVersions] = field(default_factory=dict)
+    # checkpoint_ns -> (channel, version) of the stored channel values
+    blobs: Dict[str, Set[Tuple[str, Any]]] = field(default_factory=lambda: defaultdict(set))
+    # (checkpoint_ns, checkpoint_id) of the stored pending writes
+    writes: Set[Tuple[str, str]] = field(default_factory=set)
+
+
+def _checkpoint_size(entry: tuple) -> int:
+    checkpoint, metadata, _ = entry
+    return len(checkpoint[1]) + len(metadata[1])
+
+
+def _writes_size(writes: Dict[Any, tuple]) -> int:
+    return sum(len(value[1]) for _, _, value, _ in writes.values())
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """InMemorySaver keeping the last `keep_last` checkpoints per thread, and at most `max_bytes` in memory.
+
+    Args:
+        max_bytes: Budget of the threads in memory, least recently used threads beyond it are spilled.
+        keep_last: Checkpoints kept per thread and checkpoint namespace, at least 1.
+        spill_path: Spill file, a temporary file (deleted on close) by default.
+        compression_level: zlib level of the spilled threads.
+    """
+
+    def __init__(self, *, serde: Optional[SerializerProtocol] = None, max_bytes: int = 64 * 1024 * 1024,
+                 keep_last: Optional[int] = 8, spill_path: Optional[str] = None, compression_level: int = 1):
+        if keep_last is not None and keep_last < 1:
+            raise ValueError(f"keep_last must be at least 1, got {keep_last}")
+        super().__init__(serde=serde)
+        self.max_bytes = max_bytes
+        self.keep_last = keep_last
+        self.spill_path = spill_path
+        self.compression_level = compression_level
+        self._lock = threading.RLock()
+        self._threads: OrderedDict[str, _Thread] = OrderedDict()       # In memory, least recently used first
+        self._spilled: Dict[str, int] = {}                              # thread_id -> bytes
+        self._bytes = 0
+        self._evictions = 0
+        self._reloads = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._temporary = spill_path is None
+        self.stack.callback(self.close)
+
+    def __enter__(self) -> "BoundedMemorySaver":
+        self.stack.__enter__()
+        return self
+
+    async def __aenter__(self) -> "BoundedMemorySaver":
+        self.stack.__enter__()
+        return self
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is None:
+                return
+            self._connection.close()
+            self._connection = None
+            if self._temporary:
+                os.remove(self.spill_path)
+                self.spill_path = None
+
+    # Accounting
+
+    def _add(self, thread: _Thread, size: int) -> None:
+        thread.bytes += size
+        self._bytes += size
+
+    def _resident(self, thread_id: str, create: bool = False) -> Optional[_Thread]:
+        """The thread in memory, loaded from the spill file if needed, marked as most recently used."""
+        thread = self._threads.get(thread_id)
+        if thread is not None:
+            self._threads.move_to_end(thread_id)
+            return thread
+        if thread_id in self._spilled:
+            thread = self._reload(thread_id)
+        elif create:
+            thread = _Thread()
+        else:
+            return None
+        self._threads[thread_id] = thread
+        return thread
+
+    def _enforce_budget(self, active: str) -> None:
+        while self._bytes > self.max_bytes:
+            victim = next((thread_id for thread_id in self._threads if thread_id != active), None)
+            if victim is None:
+                break
+            self._spill(victim)
+
+    def _compact(self, thread_id: str, checkpoint_ns: str, thread: _Thread) -> None:
+        """Drop checkpoints beyond the last keep_last, their writes and the values only they referenced."""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if self.keep_last is None or len(checkpoints) <= self.keep_last:
+            return
+        ids = sorted(checkpoints)
+        oldest = ids[-self.keep_last]
+        for checkpoint_id in ids[:-self.keep_last]:
+            self._add(thread, -_checkpoint_size(checkpoints.pop(checkpoint_id)))
+            thread.versions.pop((checkpoint_ns, checkpoint_id), None)
+        for key in [key for key in thread.writes if key[0] == checkpoint_ns and key[1] < oldest]:
+            thread.writes.discard(key)
+            self._add(thread, -_writes_size(self.writes.pop((thread_id, *key), {})))
+        referenced = {(channel, version) for (ns, _), versions in thread.versions.items() if ns == checkpoint_ns
+                      for channel, version in versions.items()}
+        for channel, version in thread.blobs[checkpoint_ns] - referenced:
+            self._add(thread, -len(self.blobs.pop((thread_id, checkpoint_ns, channel, version))[1]))
+        thread.blobs[checkpoint_ns] &= referenced
+
+    # Spill file
+
+    def _spill_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.spill_path is None:
+                descriptor, self.spill_path = tempfile.mkstemp(prefix="lctutorial-spill-", suffix=".db")
+                os.close(descriptor)
+            self._connection = sqlite3.connect(self.spill_path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA synchronous=OFF")
+            self._connection.execute(_SCHEMA)
+            self._connection.execute("DELETE FROM threads")
+        return self._connection
+
+    def _pop_thread(self, thread_id: str) -> Dict[str, Any]:
+        """Remove a thread in memory from the dicts of InMemorySaver, returning its entries."""
+        thread = self._threads.pop(thread_id)
+        self._bytes -= thread.bytes
+        return {
+            "storage": dict(self.storage.pop(thread_id, {})),
+            "writes": {key: self.writes.pop((thread_id, *key)) for key in thread.writes
+                       if (thread_id, *key) in self.writes},
+            "blobs": {(ns, *key): self.blobs.pop((thread_id, ns, *key))
+                      for ns, keys in thread.blobs.items() for key in keys},
+            "versions": thread.versions,
+            "bytes": thread.bytes,
+        }
+
+    def _spill(self, thread_id: str) -> None:
+        data = self._pop_thread(thread_id)
+        payload = zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL), self.compression_level)
+        self._spill_connection().execute("INSERT OR REPLACE INTO threads VALUES (?, ?, ?)",
+                                         (thread_id, data["bytes"], payload))
+        self._spilled[thread_id] = data["bytes"]
+        self._evictions += 1
+
+    def _read_spilled(self, thread_id: str) -> Dict[str, Any]:
+        row = self._spill_connection().execute("SELECT data FROM threads WHERE thread_id = ?",
+                                               (thread_id,)).fetchone()
+        return pickle.loads(zlib.decompress(row[0]))
+
+    @staticmethod
+    def _restore(saver: InMemorySaver, thread_id: str, data: Dict[str, Any]) -> None:
+        saver.storage[thread_id] = defaultdict(dict, data["storage"])
+        for key, writes in data["writes"].items():
+            saver.writes[(thread_id, *key)] = writes
+        for key, blob in data["blobs"].items():
+            saver.blobs[(thread_id, *key)] = blob
+
+    def _reload(self, thread_id: str) -> _Thread:
+        data = self._read_spilled(thread_id)
+        self._connection.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+        del self._spilled[thread_id]
+        self._restore(self, thread_id, data)
+        thread = _Thread(bytes=data["bytes"], versions=data["versions"], writes=set(data["writes"]))
+        for ns, channel, version in data["blobs"]:
+            thread.blobs[ns].add((channel, version))
+        self._bytes += thread.bytes
+        self._reloads += 1
+        return thread
+
+    # BaseCheckpointSaver
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if self._resident(thread_id) is None:
+                return None
+            result = super().get_tuple(config)
+            self._enforce_budget(thread_id)
+            return result
+
+    def _list_thread(self, thread_id: str, config: RunnableConfig, **kwargs) -> List[CheckpointTuple]:
+        with self._lock:
+            if thread_id in self._threads:
+                return list(super().list(config, **kwargs))
+            if thread_id in self._spilled:
+                # Listed from a copy, without loading the thread back
+                view = InMemorySaver(serde=self.serde)
+                self._restore(view, thread_id, self._read_spilled(thread_id))
+                return list(view.list(config, **kwargs))
+            return []
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        if config is not None:
+            thread_id = config["configurable"]["thread_id"]
+            with self._lock:
+                if self._resident(thread_id) is None:
+                    return
+                items = list(super().list(config, filter=filter, before=before, limit=limit))
+                self._enforce_budget(thread_id)
+            yield from items
+            return
+
+        with self._lock:
+            thread_ids = [*self._threads, *self._spilled]
+        for thread_id in thread_ids:
+            if limit is not None and limit <= 0:
+                return
+            items = self._list_thread(thread_id, {"configurable": {"thread_id": thread_id}}, filter=filter,
+                                      before=before, limit=limit)
+            if limit is not None:
+                limit -= len(items)
+            yield from items
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            thread = self._resident(thread_id, create=True)
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            if checkpoint["id"] in checkpoints:
+                self._add(thread, -_checkpoint_size(checkpoints[checkpoint["id"]]))
+            for channel, version in new_versions.items():
+                if (blob := self.blobs.get((thread_id, checkpoint_ns, channel, version))) is not None:
+                    self._add(thread, -len(blob[1]))
+
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+
+            self._add(thread, _checkpoint_size(checkpoints[checkpoint["id"]]))
+            for channel, version in new_versions.items():
+                self._add(thread, len(self.blobs[(thread_id, checkpoint_ns, channel, version)][1]))
+                thread.blobs[checkpoint_ns].add((channel, version))
+            thread.versions[(checkpoint_ns, checkpoint["id"])] = dict(checkpoint["channel_versions"])
+            self._compact(thread_id, checkpoint_ns, thread)
+            self._enforce_budget(thread_id)
+            return next_config
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        key = (config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+        with self._lock:
+            thread = self._resident(thread_id, create=True)
+            before = _writes_size(self.writes.get((thread_id, *key), {}))
+            super().put_writes(config, writes, task_id, task_path)
+            thread.writes.add(key)
+            self._add(thread, _writes_size(self.writes[(thread_id, *key)]) - before)
+            self._enforce_budget(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            if thread_id in self._threads:
+                self._pop_thread(thread_id)
+            elif self._spilled.pop(thread_id, None) is not None:
+                self._connection.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    # Statistics
+
+    def bytes_by_thread(self) -> Dict[str, int]:
+        """Serialized bytes per thread, whether in memory or spilled."""
+        with self._lock:
+            return {**{thread_id: thread.bytes for thread_id, thread in self._threads.items()}, **self._spilled}
+
+    def storage_stats(self) -> MemoryStats:
+        with self._lock:
+            return MemoryStats(threads=len(self._threads), bytes=self._bytes, spilled_threads=len(self._spilled),
+                               spilled_bytes=sum(self._spilled.values()), evictions=self._evictions,
+                               reloads=self._reloads)
@@ -0,0 +1,51 @@
+from functools import cached_property
+from typing import Any, Literal, Optional
+
+import anthropic
+from langchain_anthropic import ChatAnthropic as _ChatAnthropic
+from pydantic import Field, model_validator
+from typing_extensions import Self
+
+
+class ChatAnthropic(_ChatAnthropic):
+    """ChatAnthropic that can run on caller supplied httpx clients, like ChatOpenAI already does.
+
+    langchain_anthropic always builds its own httpx client per base URL and timeout, which keeps the
+    Anthropic models out of the shared pool in lctutorial.http_pool.
+
+    With prompt_caching=True every request gets cache breakpoints on its stable prefix (tools, system
+    prompt and the conversation so far), see lctutorial.prompt_cache.
+    """
+
+    http_client: Any | None = Field(default=None, exclude=True)
+    http_async_client: Any | None = Field(default=None, exclude=True)
+    prompt_caching: bool = False
+    prompt_cache_ttl: Optional[Literal["5m", "1h"]] = None
+
+    @model_validator(mode="after")
+    def _check_proxy(self) -> Self:
+        # Like ChatOpenAI, a proxy has to be configured on the caller's clients
+        if self.anthropic_proxy and (self.http_client or self.http_async_client):
+            raise ValueError("Cannot specify 'anthropic_proxy' if one of 'http_client'/'http_async_client' is "
+                             "specified, configure the proxy on the clients instead.")
+        return self
+
+    def _get_request_payload(self, input_: Any, *, stop: Optional[list[str]] = None, **kwargs: Any) -> dict:
+        payload = super()._get_request_payload(input_, stop=stop, **kwargs)
+        if not self.prompt_caching:
+            return payload
+        from lctutorial.prompt_cache import add_anthropic_cache_breakpoints
+
+        return add_anthropic_cache_breakpoints(payload, self.prompt_cache_ttl)
+
+    @cached_property
+    def _client(self) -> anthropic.Client:
+        if self.http_client is None:
+            return super()._client
+        return anthropic.Client(**self._client_params, http_client=self.http_client)
+
+    @cached_property
+    def _async_client(self) -> anthropic.AsyncClient:
+        if self.http_async_client is None:
+            return super()._async_client
+        return anthropic.AsyncClient(**self._client_params, http_client=self.http_async_client)
@@ -0,0 +1,87 @@
+"""
+Base class for chat models that add behaviour around another chat model.
+
+The wrapper is a BaseChatModel itself, so it can be used anywhere a model from init_chat_model can
+(create_agent, bind_tools, stream, batch, ...). Calls are forwarded to the inner model, whose own
+callbacks, rate limiter and cache keep working.
+"""
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding
+from langchain_core.runnables.config import RunnableConfig
+
+# The wrapper run already reports start/tokens/end to the caller's callbacks. Calling the inner model
+# without them prevents e.g. duplicated tokens in LangGraph's "messages" stream mode.
+_INNER_CONFIG: RunnableConfig = {"callbacks": []}
+
+
+class DelegatingChatModel(BaseChatModel):
+    """Forwards every call to `inner`, subclasses override _generate / _stream to add behaviour."""
+
+    inner: BaseChatModel
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        # Cache keys and tracing params are those of the wrapped model
+        return self.inner._identifying_params
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        # Let the inner model format the tools for its provider, then bind the result to the wrapper
+        bound = self.inner.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+        if not isinstance(bound, RunnableBinding):
+            raise NotImplementedError(f"{type(self.inner).__name__}.bind_tools did not return a RunnableBinding")
+        return self.bind(**bound.kwargs)
+
+    def _invoke_inner(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> AIMessage:
+        return self.inner.invoke(messages, config=_INNER_CONFIG, stop=stop, **kwargs)
+
+    async def _ainvoke_inner(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> AIMessage:
+        return await self.inner.ainvoke(messages, config=_INNER_CONFIG, stop=stop, **kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._invoke_inner(messages, stop, **kwargs))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = await self._ainvoke_inner(messages, stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        # BaseChatModel reports the yielded chunks to run_manager
+        for chunk in self.inner.stream(messages, config=_INNER_CONFIG, stop=stop, **kwargs):
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in self.inner.astream(messages, config=_INNER_CONFIG, stop=stop, **kwargs):
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,23 @@
+from typing import Any, Optional
+
+from langchain_openai import ChatOpenAI as _ChatOpenAI
+
+
+class ChatOpenAI(_ChatOpenAI):
+    """ChatOpenAI that can canonicalize its requests for OpenAI's automatic prompt caching.
+
+    With prompt_caching=True tools, schemas and system messages are put into a stable order and every
+    request gets a prompt_cache_key per agent (unless one is passed), see lctutorial.prompt_cache.
+    """
+
+    prompt_caching: bool = False
+
+    def _get_request_payload(self, input_: Any, *, stop: Optional[list[str]] = None, **kwargs: Any) -> dict:
+        payload = super()._get_request_payload(input_, stop=stop, **kwargs)
+        if not self.prompt_caching:
+            return payload
+        from lctutorial.prompt_cache import canonicalize_openai_payload, openai_prompt_cache_key
+
+        payload = canonicalize_openai_payload(payload)
+        payload.setdefault("prompt_cache_key", openai_prompt_cache_key(payload))
+        return payload
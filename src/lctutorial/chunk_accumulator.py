@@ -0,0 +1,225 @@
+"""
+Linear time accumulation of streamed AIMessageChunks.
+
+`full = chunk if full is None else full + chunk` builds a new message per token and re-merges the whole
+content, tool call args and metadata every time, which is quadratic in the response length. The
+accumulator keeps every string as a list of pieces (per content block and per tool call index) and
+only joins them when the message is asked for. The result equals the `+` result.
+
+Example:
+    >>> accumulator = ChunkAccumulator()
+    >>> for chunk in model.stream("What color is the sky?"):
+    ...     accumulator.add(chunk)
+    >>> message = accumulator.to_message()
+"""
+from typing import Any, Dict, List, Optional, Union
+
+from langchain_core.messages import AIMessage, AIMessageChunk, message_chunk_to_message
+from langchain_core.messages.ai import add_usage
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.utils._merge import merge_lists
+from langchain_core.utils.utils import LC_AUTO_PREFIX, LC_ID_PREFIX
+
+# String values merge_dicts does not concatenate when they are equal
+_KEEP_EQUAL = ("id", "output_version", "model_provider")
+
+
+class _Pieces(list):
+    """A string value under construction."""
+
+    def equals(self, value: str) -> bool:
+        return (len(self) == 1 and self[0] == value) or "".join(self) == value
+
+
+class _MergeBuffer:
+    """langchain_core's merge_dicts, with string values buffered instead of concatenated."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, first: Optional[Dict[str, Any]] = None):
+        self._values: Dict[str, Any] = {}
+        if first:
+            self.merge(first)
+
+    def merge(self, right: Dict[str, Any]) -> None:
+        values = self._values
+        for key, value in right.items():
+            if key not in values or (value is not None and values[key] is None):
+                values[key] = _wrap(value)
+                continue
+            if value is None:
+                continue
+            current = values[key]
+            if isinstance(current, _Pieces) and isinstance(value, str):
+                if (key == "index" and current[0].startswith("lc_")) or (key in _KEEP_EQUAL and current.equals(value)):
+                    continue
+                current.append(value)
+            elif isinstance(current, _MergeBuffer) and isinstance(value, dict):
+                current.merge(value)
+            elif isinstance(current, list) and not isinstance(current, _Pieces) and isinstance(value, list):
+                values[key] = merge_lists(current, value)
+            elif isinstance(current, (_Pieces, _MergeBuffer, list)) or type(current) is not type(value):
+                raise TypeError(f'additional_kwargs["{key}"] already exists in this message, but with a different type.')
+            elif current == value:
+                continue
+            elif isinstance(current, int):
+                values[key] = current + value
+            else:
+                raise TypeError(f"Additional kwargs key {key} already exists in left dict and value has unsupported "
+                                f"type {type(current)}.")
+
+    def get(self, key: str) -> Any:
+        return _unwrap(self._values.get(key))
+
+    def value(self) -> Dict[str, Any]:
+        return {key: _unwrap(value) for key, value in self._values.items()}
+
+
+def _wrap(value: Any) -> Any:
+    if isinstance(value, str):
+        return _Pieces([value])
+    if isinstance(value, dict):
+        return _MergeBuffer(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _unwrap(value: Any) -> Any:
+    if isinstance(value, _Pieces):
+        return "".join(value)
+    if isinstance(value, _MergeBuffer):
+        return value.value()
+    return value
+
+
+def _mergeable_index(element: Any) -> bool:
+    # Same condition as merge_lists
+    if not isinstance(element, dict) or "index" not in element:
+        return False
+    index = element["index"]
+    return isinstance(index, int) or (isinstance(index, str) and index.startswith("lc_"))
+
+
+class _IndexedList:
+    """merge_lists over a growing list, elements with the same index merge into one _MergeBuffer."""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self._positions: Dict[Any, int] = {}
+
+    def append(self, element: Any) -> None:
+        if _mergeable_index(element):
+            self._positions.setdefault(element["index"], len(self.items))
+            self.items.append(_MergeBuffer(element))
+        elif isinstance(element, str):
+            self.items.append(_Pieces([element]))
+        else:
+            self.items.append(element)
+
+    def merge(self, elements: List[Any]) -> None:
+        for element in elements:
+            position = self._positions.get(element["index"]) if _mergeable_index(element) else None
+            if position is None:
+                self.append(element)
+                continue
+            target = self.items[position]
+            if element.get("type") == "non_standard" and "value" in element and target.get("type"):
+                # Rare special case of merge_lists, delegated as is
+                self.items[position] = _MergeBuffer(merge_lists([target.value()], [element])[0])
+            else:
+                target.merge({k: v for k, v in element.items() if k != "type"})
+
+    def value(self) -> List[Any]:
+        return [_unwrap(item) for item in self.items]
+
+
+class ChunkAccumulator:
+    """Collects AIMessageChunks in amortized O(1) per chunk and builds the merged message on request."""
+
+    def __init__(self):
+        self.chunks = 0
+        self._text: List[str] = []                      # Content while it is a plain string
+        self._content: Optional[_IndexedList] = None    # Content once a chunk had content blocks
+        self._tool_call_chunks = _IndexedList()
+        self._additional_kwargs = _MergeBuffer()
+        self._response_metadata = _MergeBuffer()
+        self._usage_metadata = None
+        self._ids: Dict[str, str] = {}                  # First id of each kind, see _id
+        self._last = False
+
+    def add(self, chunk: AIMessageChunk) -> "ChunkAccumulator":
+        self.chunks += 1
+        self._add_content(chunk.content)
+        if chunk.tool_call_chunks:
+            self._tool_call_chunks.merge(chunk.tool_call_chunks)
+        if chunk.additional_kwargs:
+            self._additional_kwargs.merge(chunk.additional_kwargs)
+        if chunk.response_metadata:
+            self._response_metadata.merge(chunk.response_metadata)
+        if chunk.usage_metadata is not None:
+            self._usage_metadata = add_usage(self._usage_metadata, chunk.usage_metadata)
+        if chunk.id:
+            kind = ("lc_run" if chunk.id.startswith(LC_ID_PREFIX) else
+                    "lc" if chunk.id.startswith(LC_AUTO_PREFIX) else "provider")
+            self._ids.setdefault(kind, chunk.id)
+        self._last = self._last or chunk.chunk_position == "last"
+        return self
+
+    __iadd__ = add
+
+    def _add_content(self, content: Union[str, List[Any]]) -> None:
+        # Same cases as merge_content
+        if self._content is None:
+            if isinstance(content, str):
+                self._text.append(content)
+                return
+            self._content = _IndexedList()
+            if self.chunks > 1:
+                self._content.items.append(_Pieces(self._text))
+            for element in content:
+                self._content.append(element)
+        elif isinstance(content, list):
+            self._content.merge(content)
+        elif self._content.items and isinstance(self._content.items[-1], _Pieces):
+            self._content.items[-1].append(content)
+        elif content and self._content.items:
+            self._content.items.append(_Pieces([content]))
+
+    @property
+    def text(self) -> str:
+        """Text received so far."""
+        if self._content is None:
+            if len(self._text) > 1:
+                self._text[:] = ["".join(self._text)]
+            return self._text[0] if self._text else ""
+        parts = []
+        for item in self._content.items:
+            if isinstance(item, _Pieces):
+                parts.append("".join(item))
+            elif isinstance(item, _MergeBuffer) and item.get("type") == "text":
+                parts.append(item.get("text") or "")
+        return "".join(parts)
+
+    def _id(self) -> Optional[str]:
+        # Provider ids win over lc_run-* ids, which win over other lc_* ids, like in AIMessageChunk.__add__
+        return self._ids.get("provider") or self._ids.get("lc_run") or self._ids.get("lc")
+
+    def to_chunk(self) -> AIMessageChunk:
+        """The merged chunk, equal to adding all chunks with +."""
+        tool_call_chunks = [tool_call_chunk(name=tc.get("name"), args=tc.get("args"), index=tc.get("index"),
+                                            id=tc.get("id"))
+                            for tc in self._tool_call_chunks.value()]
+        return AIMessageChunk(
+            content="".join(self._text) if self._content is None else self._content.value(),
+            additional_kwargs=self._additional_kwargs.value(),
+            tool_call_chunks=tool_call_chunks,
+            response_metadata=self._response_metadata.value(),
+            usage_metadata=self._usage_metadata,
+            id=self._id(),
+            chunk_position="last" if self._last else None,
+        )
+
+    def to_message(self) -> AIMessage:
+        """The final message, tool call args parsed."""
+        return message_chunk_to_message(self.to_chunk())
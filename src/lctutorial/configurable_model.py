@@ -0,0 +1,136 @@
+"""
+Configurable chat models that resolve each configuration only once.
+
+langchain's configurable model (`init_chat_model(temperature=0)` without a model) builds the concrete
+model, its client, and re-applies bind_tools / with_structured_output on every single call. The models
+returned by init_configurable_chat_model memoize both steps by the effective configurable values, in
+LRU caches shared by a configurable model and everything derived from it (bind_tools,
+with_structured_output, with_config):
+    - the concrete models, so tools bound later reuse the warm clients,
+    - the models with the declarative operations applied, keyed by the operations (bound tools by their
+      schema), and the derived configurable models themselves. An agent calling bind_tools with the same
+      tools on every step gets the same derived model and the same bound model each time.
+
+Example:
+    >>> model = init_configurable_chat_model(temperature=0).bind_tools([GetWeather, GetPopulation])
+    >>> model.invoke("what's bigger in 2024 LA or NYC", config={"configurable": {"model": "gpt-4.1-mini"}})
+    >>> model.cache_info()
+
+Configurations that contain unhashable values (e.g. clients) are keyed by the identity of those values.
+
+This subclasses langchain's private _ConfigurableModel and uses _DECLARATIVE_METHODS and
+_init_chat_model_helper, check it when upgrading langchain. The concrete models are built by langchain's
+init_chat_model: they don't use lctutorial.http_pool or any of the wrappers of lctutorial.init_chat_model
+(response cache, rate limiter, ...). Pass http_client / http_async_client as default config to share a pool.
+"""
+from __future__ import annotations
+
+from typing import Any, Hashable, Literal, Optional, Union
+
+from langchain.chat_models.base import _DECLARATIVE_METHODS, _ConfigurableModel, _init_chat_model_helper
+from langchain.chat_models.base import init_chat_model as _langchain_init_chat_model
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from lctutorial.model_cache import CacheInfo, ModelCache, normalize_kwargs
+
+
+def _tool_key(tool: Any) -> Hashable:
+    # The bound model only carries the schema, tools with the same schema bind the same way
+    try:
+        return normalize_kwargs(convert_to_openai_tool(tool))
+    except Exception:
+        return normalize_kwargs(tool)
+
+
+def _operations_key(operations: list) -> Hashable:
+    """The queued declarative operations as a cache key."""
+    key = []
+    for name, args, kwargs in operations:
+        if name == "bind_tools" and args:
+            args = (tuple(_tool_key(tool) for tool in args[0]), *args[1:])
+        key.append((name, normalize_kwargs(args), normalize_kwargs(kwargs)))
+    return tuple(key)
+
+
+class CachedConfigurableModel(_ConfigurableModel):
+    """A langchain configurable model with LRU caches for the resolved models.
+
+    Args:
+        maxsize: Number of concrete models (distinct configurations) kept.
+        bound_maxsize: Number of models with declarative operations applied kept, and of derived models.
+    """
+
+    def __init__(self, *, maxsize: int = 16, bound_maxsize: int = 16, models: Optional[ModelCache] = None,
+                 bound: Optional[ModelCache] = None, derived: Optional[ModelCache] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._models = models if models is not None else ModelCache(maxsize)
+        self._bound = bound if bound is not None else ModelCache(bound_maxsize)
+        self._derived = derived if derived is not None else ModelCache(bound_maxsize)
+        self._operations = _operations_key(self._queued_declarative_operations)
+
+    def _derive(self, configurable: _ConfigurableModel) -> CachedConfigurableModel:
+        key = (normalize_kwargs(configurable._default_config), normalize_kwargs(configurable._configurable_fields),
+               configurable._config_prefix, _operations_key(configurable._queued_declarative_operations))
+        # Shares all caches, the declarative operations (and the default config) differ
+        return self._derived.get_or_create(key, lambda: CachedConfigurableModel(
+            models=self._models, bound=self._bound, derived=self._derived,
+            default_config=configurable._default_config,
+            configurable_fields=configurable._configurable_fields,
+            config_prefix=configurable._config_prefix,
+            queued_declarative_operations=configurable._queued_declarative_operations,
+        ))
+
+    def __getattr__(self, name: str) -> Any:
+        if name in _DECLARATIVE_METHODS:
+            queue = super().__getattr__(name)
+            return lambda *args, **kwargs: self._derive(queue(*args, **kwargs))
+        return super().__getattr__(name)
+
+    def with_config(self, config: Optional[RunnableConfig] = None, **kwargs: Any) -> CachedConfigurableModel:
+        return self._derive(super().with_config(config, **kwargs))
+
+    def _model(self, config: Optional[RunnableConfig] = None) -> Runnable:
+        params = {**self._default_config, **self._model_params(config)}
+        key: Hashable = normalize_kwargs(params)
+        return self._bound.get_or_create((key, self._operations), lambda: self._apply_operations(
+            self._models.get_or_create(key, lambda: _init_chat_model_helper(**params))))
+
+    def _apply_operations(self, model: Runnable) -> Runnable:
+        for name, args, kwargs in self._queued_declarative_operations:
+            model = getattr(model, name)(*args, **kwargs)
+        return model
+
+    def cache_info(self) -> CacheInfo:
+        """Hit/miss counters of the concrete models, shared with the models derived from the same one."""
+        return self._models.info()
+
+    def bound_cache_info(self) -> CacheInfo:
+        """Hit/miss counters of the models with declarative operations applied, shared like cache_info."""
+        return self._bound.info()
+
+    def cache_clear(self) -> None:
+        self._models.clear()
+        self._bound.clear()
+        self._derived.clear()
+
+
+def init_configurable_chat_model(model: Optional[str] = None, *, model_provider: Optional[str] = None,
+                                 configurable_fields: Optional[Union[Literal["any"], list[str], tuple[str, ...]]] = None,
+                                 config_prefix: Optional[str] = None, maxsize: int = 16, bound_maxsize: int = 16,
+                                 **kwargs: Any) -> Union[Runnable, CachedConfigurableModel]:
+    """Drop-in for langchain.chat_models.init_chat_model whose configurable models memoize what they resolve.
+
+    Fixed models (a model and no configurable_fields) are returned by langchain as they are.
+    """
+    if model and not configurable_fields:
+        return _langchain_init_chat_model(model, model_provider=model_provider, config_prefix=config_prefix,
+                                          **kwargs)
+    if not configurable_fields:
+        configurable_fields = ("model", "model_provider")
+    if model:
+        kwargs["model"] = model
+    if model_provider:
+        kwargs["model_provider"] = model_provider
+    return CachedConfigurableModel(maxsize=maxsize, bound_maxsize=bound_maxsize, default_config=kwargs,
+                                   configurable_fields=configurable_fields, config_prefix=config_prefix or "")
@@ -0,0 +1,309 @@
+"""
+Early tool execution: run a tool call as soon as its arguments are complete in the model stream.
+
+Without it, an agent waits for the whole model response before the tools node runs any tool call. With
+EarlyToolExecutionMiddleware the model is streamed, each tool call is dispatched the moment its JSON
+arguments are complete, and the tools node picks up the finished (or still running) result. Slow I/O
+tools thereby overlap with the rest of the generation.
+
+Example:
+    >>> agent = create_agent(model=model, tools=[get_weather], middleware=[EarlyToolExecutionMiddleware()])
+    >>> agent.invoke({"messages": [{"role": "user", "content": "What's the weather in Boston and Tokyo?"}]})
+
+A dispatched call is cancelled (or its result discarded, if it is already running) when the final model
+message does not contain it with the same name and arguments. Only tools without injected arguments
+(ToolRuntime, InjectedState, ...) are run early, the others run in the tools node as usual. Tools run
+before middleware running after the model (e.g. HumanInTheLoopMiddleware) sees the call, so restrict
+`tools` to side effect free tools when combining them.
+
+Early results are kept per thread (the thread_id of the run), model message and tool call id, so
+concurrent runs never see each other's results even when their tool call ids are the same. A call that
+failed early is answered with an error ToolMessage, it is not run a second time. Results the tools node
+doesn't pick up (a call rejected by a human, a run that was interrupted or failed) are dropped by the
+next model call that has the call in its history, and after `max_age` seconds at the latest. close()
+shuts the thread pool down.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Collection, Dict, Iterable, Iterator, List, Optional, Union
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.messages.tool import ToolCall
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import BaseTool
+from langgraph.config import get_config
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
+from pydantic import ConfigDict
+
+from lctutorial.chat_model_wrapper import DelegatingChatModel
+from lctutorial.chunk_accumulator import ChunkAccumulator
+from lctutorial.partial_json import ToolCallStreamParser
+
+_Pending = Union[Future, asyncio.Future]
+# (thread id, id of the model message, tool call id)
+_Key = tuple[Optional[str], Optional[str], str]
+
+
+def _thread_id() -> Optional[str]:
+    try:
+        return get_config().get("configurable", {}).get("thread_id")
+    except RuntimeError:
+        # Called outside of a graph run
+        return None
+
+
+def _message_id(request: Any, call_id: str) -> Optional[str]:
+    """Id of the message with the tool call in the state of a tool call request."""
+    state = getattr(request, "state", None)
+    messages = state.get("messages", []) if isinstance(state, dict) else getattr(state, "messages", [])
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and any(tool_call["id"] == call_id for tool_call in message.tool_calls):
+            return message.id
+    return None
+
+
+class _Dispatch:
+    """The tool calls dispatched during one model call."""
+
+    def __init__(self, tools: Dict[str, BaseTool], submit: Callable[[BaseTool, ToolCall], _Pending]):
+        self.tools = tools
+        self.pending: Dict[str, tuple[ToolCall, _Pending]] = {}
+        self._submit = submit
+        self._parser = ToolCallStreamParser()
+        self._broken = False
+
+    def observe(self, chunk: AIMessageChunk) -> None:
+        if self._broken or not chunk.tool_call_chunks:
+            return
+        try:
+            changed = self._parser.add(chunk)
+        except ValueError:
+            # Unparseable args, leave every call of this response to the tools node
+            self._broken = True
+            return
+        for call in changed:
+            if call.complete and call.id and call.id not in self.pending and call.name in self.tools:
+                tool_call = call.to_tool_call()
+                self.pending[call.id] = tool_call, self._submit(self.tools[call.name], tool_call)
+
+    def settle(self, message: Optional[AIMessage]) -> Dict[str, tuple[ToolCall, _Pending]]:
+        """Cancels the calls the final message does not confirm, returns the confirmed ones."""
+        final = {call["id"]: call for call in message.tool_calls} if message is not None else {}
+        confirmed = {}
+        for call_id, (tool_call, pending) in self.pending.items():
+            call = final.get(call_id)
+            if call is not None and call["name"] == tool_call["name"] and call["args"] == tool_call["args"]:
+                confirmed[call_id] = tool_call, pending
+            else:
+                pending.cancel()
+        return confirmed
+
+
+class EarlyToolChatModel(DelegatingChatModel):
+    """Streams the inner model and hands every chunk to `dispatch`, also for invoke()."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    dispatch: _Dispatch
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        accumulator = ChunkAccumulator()
+        for generation_chunk in self._stream(messages, stop, run_manager, **kwargs):
+            accumulator.add(generation_chunk.message)
+        return ChatResult(generations=[ChatGeneration(message=accumulator.to_message())])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        accumulator = ChunkAccumulator()
+        async for generation_chunk in self._astream(messages, stop, run_manager, **kwargs):
+            accumulator.add(generation_chunk.message)
+        return ChatResult(generations=[ChatGeneration(message=accumulator.to_message())])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for generation_chunk in super()._stream(messages, stop, run_manager, **kwargs):
+            self.dispatch.observe(generation_chunk.message)
+            yield generation_chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async for generation_chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            self.dispatch.observe(generation_chunk.message)
+            yield generation_chunk
+
+
+def _final_message(response: Union[ModelResponse, AIMessage]) -> Optional[AIMessage]:
+    if isinstance(response, AIMessage):
+        return response
+    return next((message for message in response.result if isinstance(message, AIMessage)), None)
+
+
+class EarlyToolExecutionMiddleware(AgentMiddleware):
+    """Dispatches tool calls while the model is still streaming, the tools node uses their results.
+
+    Args:
+        tools: Names of the tools that may run early, None allows every tool without injected arguments.
+        max_workers: Threads running tools early for sync agents (invoke/stream), async agents use tasks.
+        max_age: Seconds an early result waits for the tools node before it is dropped.
+    """
+
+    def __init__(self, tools: Optional[Collection[str]] = None, max_workers: int = 8, max_age: float = 300.0):
+        super().__init__()
+        self.allowed_tools = None if tools is None else frozenset(tools)
+        self.max_workers = max_workers
+        self.max_age = max_age
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # (thread, message, tool call id) -> (dispatched call, its result, when it was published)
+        self._results: Dict[_Key, tuple[ToolCall, _Pending, float]] = {}
+        self._lock = threading.Lock()
+
+    def _early_tools(self, request: ModelRequest) -> Dict[str, BaseTool]:
+        return {tool.name: tool for tool in request.tools
+                if isinstance(tool, BaseTool) and not tool._injected_args_keys
+                and (self.allowed_tools is None or tool.name in self.allowed_tools)}
+
+    def _submit(self, tool: BaseTool, tool_call: ToolCall) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="early-tools")
+        # The copied context keeps LangGraph's config (get_config, get_stream_writer) available to the tool
+        return self._executor.submit(contextvars.copy_context().run, tool.invoke, tool_call)
+
+    @staticmethod
+    def _asubmit(tool: BaseTool, tool_call: ToolCall) -> asyncio.Future:
+        return asyncio.ensure_future(tool.ainvoke(tool_call))
+
+    def _publish(self, dispatch: _Dispatch, response: Optional[Union[ModelResponse, AIMessage]]) -> None:
+        message = _final_message(response) if response is not None else None
+        confirmed = dispatch.settle(message)
+        thread_id, message_id = _thread_id(), message.id if message is not None else None
+        now = time.monotonic()
+        with self._lock:
+            for call_id, (tool_call, pending) in confirmed.items():
+                self._results[thread_id, message_id, call_id] = tool_call, pending, now
+
+    def _drop(self, keys: Iterable[_Key]) -> None:
+        with self._lock:
+            dropped = [self._results.pop(key) for key in keys if key in self._results]
+        for _, pending, _ in dropped:
+            pending.cancel()
+
+    def _drop_unused(self, messages: List[BaseMessage]) -> None:
+        """Drops the results of calls a tools step already went past, and the ones older than max_age."""
+        deadline = time.monotonic() - self.max_age
+        with self._lock:
+            if not self._results:
+                return
+            expired = [key for key, (_, _, published) in self._results.items() if published < deadline]
+        thread_id = _thread_id()
+        answered = [(thread_id, message.id, tool_call["id"]) for message in messages if isinstance(message, AIMessage)
+                    for tool_call in message.tool_calls]
+        self._drop(expired + answered)
+
+    def _take(self, request: Any) -> Optional[_Pending]:
+        tool_call = request.tool_call
+        key = _thread_id(), _message_id(request, tool_call["id"]), tool_call["id"]
+        with self._lock:
+            entry = self._results.pop(key, None)
+        if entry is None:
+            return None
+        dispatched, pending, _ = entry
+        if dispatched["name"] != tool_call["name"] or dispatched["args"] != tool_call["args"]:
+            # Changed after the model call (e.g. edited by a human), run the new call instead
+            pending.cancel()
+            return None
+        return pending
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]):
+        self._drop_unused(request.messages)
+        tools = self._early_tools(request)
+        if not tools:
+            return handler(request)
+        dispatch = _Dispatch(tools, self._submit)
+        response = None
+        try:
+            response = handler(request.override(model=EarlyToolChatModel(inner=request.model, dispatch=dispatch)))
+        finally:
+            self._publish(dispatch, response)
+        return response
+
+    async def awrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], Any]):
+        self._drop_unused(request.messages)
+        tools = self._early_tools(request)
+        if not tools:
+            return await handler(request)
+        dispatch = _Dispatch(tools, self._asubmit)
+        response = None
+        try:
+            response = await handler(request.override(model=EarlyToolChatModel(inner=request.model,
+                                                                              dispatch=dispatch)))
+        finally:
+            self._publish(dispatch, response)
+        return response
+
+    @staticmethod
+    def _failed(tool_call: ToolCall, error: Exception) -> ToolMessage:
+        # Running the call again would repeat its side effects
+        return ToolMessage(TOOL_CALL_ERROR_TEMPLATE.format(error=repr(error)), name=tool_call["name"],
+                           tool_call_id=tool_call["id"], status="error")
+
+    def wrap_tool_call(self, request, handler):
+        pending = self._take(request)
+        if not isinstance(pending, Future):
+            if pending is not None:
+                # Dispatched by an async run, there is no loop here to wait for it
+                pending.cancel()
+            return handler(request)
+        try:
+            return pending.result()
+        except Exception as error:
+            return self._failed(request.tool_call, error)
+
+    async def awrap_tool_call(self, request, handler):
+        pending = self._take(request)
+        if pending is None:
+            return await handler(request)
+        try:
+            return await (asyncio.wrap_future(pending) if isinstance(pending, Future) else pending)
+        except Exception as error:
+            return self._failed(request.tool_call, error)
+
+    def dispatched(self) -> List[str]:
+        """Ids of the tool calls with an early result the tools node has not picked up yet."""
+        with self._lock:
+            return [call_id for _, _, call_id in self._results]
+
+    def close(self) -> None:
+        """Drops every early result and shuts the thread pool down, a later call starts a new one."""
+        with self._lock:
+            keys = list(self._results)
+            executor, self._executor = self._executor, None
+        self._drop(keys)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,187 @@
+"""
+Deterministic in-process chat model for benchmarks and load tests without API keys or network.
+
+Example:
+    >>> model = init_chat_model(provider="Fake", responses=[
+    ...     AIMessage("", tool_calls=[{"name": "get_weather", "args": {"city": "Paris"}, "id": "call_1"}]),
+    ...     "It's always sunny in {input}!",
+    ... ], tokens_per_second=50, time_to_first_token=0.3)
+
+Responses are used in turn and start over after the last one. A response is either
+    - a str, a template formatted with {input} (text of the last user message) and {turn},
+    - an AIMessage, returned as is (tool calls without an id get a deterministic one),
+    - a callable taking the messages and returning one of the above.
+
+Streaming emits about one token per word at tokens_per_second after time_to_first_token, invoke waits
+for the whole duration. Usage metadata estimates the input tokens from the characters (4 per token).
+"""
+import asyncio
+import itertools
+import json
+import math
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field, PrivateAttr
+
+from lctutorial.response_cache import replay_chunks
+from lctutorial.text_pieces import split_words
+
+DEFAULT_RESPONSE = "This is a fake response to: {input}"
+
+
+class _TemplateFields(dict):
+    # Unknown placeholders stay as they are instead of raising KeyError
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering from a script, paced like a real provider."""
+
+    model_name: str = "fake-model"
+    responses: List[Any] = Field(default_factory=lambda: [DEFAULT_RESPONSE])
+    tokens_per_second: Optional[float] = None
+    time_to_first_token: float = 0.0
+    max_tokens: Optional[int] = None
+
+    _turns: Iterator[int] = PrivateAttr(default_factory=itertools.count)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name, "max_tokens": self.max_tokens}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        # Same format as ChatOpenAI, the tools only end up in the cache key / trace
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        if tool_choice is not None:
+            kwargs["tool_choice"] = tool_choice
+        return self.bind(tools=formatted, **kwargs)
+
+    def reset(self) -> None:
+        """Start the script over from the first response."""
+        with self._lock:
+            self._turns = itertools.count()
+
+    def next_message(self, messages: List[BaseMessage], stop: Optional[List[str]] = None) -> AIMessage:
+        """The next scripted response for messages, with usage metadata."""
+        with self._lock:
+            turn = next(self._turns)
+        response = self.responses[turn % len(self.responses)]
+        if callable(response):
+            response = response(messages)
+        if isinstance(response, str):
+            last_input = next((m.text for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+            message = AIMessage(response.format_map(_TemplateFields(input=last_input, turn=turn)))
+        else:
+            message = response.model_copy(deep=True)
+
+        finish_reason = "tool_calls" if message.tool_calls else "stop"
+        text_tokens = self._tokens(message.content) if isinstance(message.content, str) else None
+        if text_tokens is not None:
+            text_tokens, finish_reason = self._truncate(text_tokens, stop, finish_reason)
+            message.content = "".join(text_tokens)
+        for index, tool_call in enumerate(message.tool_calls):
+            if not tool_call.get("id"):
+                tool_call["id"] = f"call_{turn}_{index}"
+
+        output_tokens = len(text_tokens) if text_tokens is not None else len(message.text) // 4
+        output_tokens += sum(math.ceil(len(json.dumps(tc["args"])) / 4) + 1 for tc in message.tool_calls)
+        input_tokens = count_tokens_approximately(messages)
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        message.response_metadata = {"model_name": self.model_name, "finish_reason": finish_reason,
+                                     "model_provider": "fake"}
+        return message
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        return split_words(text)
+
+    def _truncate(self, tokens: List[str], stop: Optional[List[str]], finish_reason: str) -> tuple[List[str], str]:
+        if stop:
+            text = "".join(tokens)
+            cut = min((text.find(s) for s in stop if s in text), default=-1)
+            if cut >= 0:
+                tokens, finish_reason = self._tokens(text[:cut]), "stop"
+        if self.max_tokens is not None and len(tokens) > self.max_tokens:
+            tokens, finish_reason = tokens[:self.max_tokens], "length"
+        return tokens, finish_reason
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _duration(self, message: AIMessage) -> float:
+        return self.time_to_first_token + message.usage_metadata["output_tokens"] * self._token_delay()
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self.next_message(messages, stop)
+        _sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self.next_message(messages, stop)
+        await _asleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self.next_message(messages, stop)
+        _sleep(self.time_to_first_token)
+        for index, chunk in enumerate(replay_chunks(message)):
+            if index:
+                _sleep(self._token_delay())
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        message = self.next_message(messages, stop)
+        await _asleep(self.time_to_first_token)
+        for index, chunk in enumerate(replay_chunks(message)):
+            if index:
+                await _asleep(self._token_delay())
+            yield ChatGenerationChunk(message=chunk)
+
+
+def _sleep(seconds: float) -> None:
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+async def _asleep(seconds: float) -> None:
+    if seconds > 0:
+        await asyncio.sleep(seconds)
@@ -0,0 +1,403 @@
+"""
+Hedged requests: when a call is slower than most recent calls, send a duplicate and take the first answer.
+
+One slow upstream request dominates the p99 of a whole workflow. With a HedgePolicy, a call that has no
+response (or, when streaming, no first chunk) after the `percentile` of the recent latencies is sent a
+second time. Whichever attempt answers first wins, the other one is cancelled. The budget caps the
+duplicates at a share of all calls, so that an overloaded provider is not hit twice as hard.
+
+Example:
+    >>> policy = HedgePolicy(percentile=95, budget=0.05)
+    >>> model = init_chat_model(provider="Anthropic", hedging=policy)
+    >>> model.invoke("what is the weather in Paris")
+    >>> policy.stats().hedge_rate, policy.stats().win_rate
+
+Async calls cancel the losing attempt. Sync calls can't interrupt the thread of the losing attempt: a
+sync invoke drops its response when it arrives, a sync stream is closed at its next chunk, so a loser
+still waiting for its first token keeps its request and its worker until that token arrives. Sync
+attempts run on a worker pool: their latency counts from when a worker picked them up, and at most
+`max_hedges_in_flight` hedged calls hold workers, each until its last attempt actually ended (losers
+included), so that a saturated pool doesn't hedge its own queueing delay.
+"""
+import asyncio
+import contextvars
+import math
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+from lctutorial.chat_model_wrapper import DelegatingChatModel
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    hedges: int = 0             # Duplicates sent
+    hedge_wins: int = 0         # Calls answered by the duplicate
+    over_budget: int = 0        # Slow calls that were not hedged because of the budget
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedges / self.calls if self.calls else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        return self.hedge_wins / self.hedges if self.hedges else 0.0
+
+
+class HedgePolicy:
+    """When to hedge: after the `percentile` of the last `window` latencies, within a budget.
+
+    Args:
+        percentile: Latency percentile after which a duplicate is sent.
+        budget: Maximum share of duplicates among all calls.
+        min_samples: Calls observed before hedging starts.
+        min_delay / max_delay: Bounds of the hedge delay in seconds.
+        window: Number of recent latencies the percentile is computed from.
+
+    Invoke latencies (whole response) and stream latencies (first chunk) are tracked separately.
+    """
+
+    def __init__(self, percentile: float = 95, budget: float = 0.05, min_samples: int = 20,
+                 min_delay: float = 0.01, max_delay: Optional[float] = None, window: int = 200):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._latencies: Dict[str, Deque[float]] = {"invoke": deque(maxlen=window), "stream": deque(maxlen=window)}
+        self._stats = HedgeStats()
+        self._lock = threading.Lock()
+
+    def stats(self) -> HedgeStats:
+        with self._lock:
+            return HedgeStats(**self._stats.__dict__)
+
+    def delay(self, kind: str) -> Optional[float]:
+        """Seconds after which a call of this kind ("invoke" or "stream") is hedged, None while learning."""
+        with self._lock:
+            self._stats.calls += 1
+            latencies = self._latencies[kind]
+            if len(latencies) < self.min_samples:
+                return None
+            ordered = sorted(latencies)
+        delay = ordered[min(len(ordered) - 1, math.ceil(self.percentile / 100 * len(ordered)) - 1)]
+        delay = max(self.min_delay, delay)
+        return delay if self.max_delay is None else min(delay, self.max_delay)
+
+    def try_hedge(self) -> bool:
+        """Take one duplicate from the budget."""
+        with self._lock:
+            if self._stats.hedges + 1 > self.budget * self._stats.calls:
+                self._stats.over_budget += 1
+                return False
+            self._stats.hedges += 1
+            return True
+
+    def record(self, kind: str, latency: float, hedge_won: bool = False) -> None:
+        with self._lock:
+            self._latencies[kind].append(latency)
+            self._stats.hedge_wins += hedge_won
+
+
+_DONE = object()
+
+
+class _Attempt:
+    """A sync call run by a worker thread, `start` is when the worker picked it up."""
+
+    def __init__(self, submit: Callable[..., Future], function: Callable[..., Any], *args: Any, **kwargs: Any):
+        self.start = 0.0
+        self.started = threading.Event()
+        self.future = submit(self._run, function, *args, **kwargs)
+
+    def _run(self, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        self.start = time.monotonic()
+        self.started.set()
+        return function(*args, **kwargs)
+
+
+class _StreamAttempt:
+    """A sync stream pumped by a worker thread, announced on `arrivals` with its first item."""
+
+    def __init__(self, chunks: Iterator[ChatGenerationChunk], arrivals: "queue.Queue[_StreamAttempt]"):
+        self.start = 0.0
+        self.started = threading.Event()
+        self.future: Optional[Future] = None
+        self.items: "queue.Queue[Any]" = queue.Queue()
+        self.first: Any = None
+        self._chunks = chunks
+        self._arrivals = arrivals
+        self._closed = threading.Event()
+
+    def _put(self, item: Any) -> None:
+        if self.first is None:
+            self.first = item
+            self._arrivals.put(self)
+        else:
+            self.items.put(item)
+
+    def pump(self) -> None:
+        self.start = time.monotonic()
+        self.started.set()
+        try:
+            for chunk in self._chunks:
+                if self._closed.is_set():
+                    break
+                self._put(chunk)
+        except BaseException as error:
+            self._put(error)
+        finally:
+            self._chunks.close()
+        self._put(_DONE)
+
+    def close(self) -> None:
+        """Stop at the next chunk, the worker may still be blocked waiting for it."""
+        self._closed.set()
+
+
+class HedgedChatModel(DelegatingChatModel):
+    """Hedges the calls of the inner model according to `policy`."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    policy: HedgePolicy
+    max_workers: int = 32
+    max_hedges_in_flight: int = 4
+
+    _executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+    _executor_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _hedges_in_flight: int = PrivateAttr(default=0)
+
+    def _submit(self, function, *args, **kwargs) -> Future:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="hedged-calls")
+        return self._executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
+
+    def _try_hedge(self) -> bool:
+        """Take a hedge slot and one duplicate from the policy's budget."""
+        with self._executor_lock:
+            if self._hedges_in_flight >= self.max_hedges_in_flight or not self.policy.try_hedge():
+                return False
+            self._hedges_in_flight += 1
+            return True
+
+    def _release_hedge(self) -> None:
+        with self._executor_lock:
+            self._hedges_in_flight -= 1
+
+    def _release_hedge_after(self, futures: List[Future]) -> None:
+        """Release the hedge slot once every attempt finished, a losing sync attempt keeps its worker busy."""
+        remaining = len(futures)
+        lock = threading.Lock()
+
+        def finished(_: Future) -> None:
+            nonlocal remaining
+            with lock:
+                remaining -= 1
+                last = remaining == 0
+            if last:
+                self._release_hedge()
+
+        for future in futures:
+            future.add_done_callback(finished)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        delay = self.policy.delay("invoke")
+        if delay is None:
+            start = time.monotonic()
+            result = super()._generate(messages, stop, run_manager, **kwargs)
+            self.policy.record("invoke", time.monotonic() - start)
+            return result
+
+        primary = _Attempt(self._submit, super()._generate, messages, stop, **kwargs)
+        # Waiting for a worker is not latency of the model
+        primary.started.wait()
+        done, _ = wait([primary.future], timeout=max(0.0, primary.start + delay - time.monotonic()))
+        attempts = {primary.future: primary}
+        if not done and self._try_hedge():
+            hedge = _Attempt(self._submit, super()._generate, messages, stop, **kwargs)
+            attempts[hedge.future] = hedge
+            self._release_hedge_after(list(attempts))
+        pending = set(attempts)
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # Prefer a successful attempt, an error only counts once no attempt is left
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is not None or not pending:
+                break
+        for future in pending:
+            future.cancel()
+        winner = winner or next(iter(done))
+        won = attempts[winner]
+        self.policy.record("invoke", time.monotonic() - won.start, hedge_won=won is not primary)
+        return winner.result()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        delay = self.policy.delay("invoke")
+        if delay is None:
+            start = time.monotonic()
+            result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+            self.policy.record("invoke", time.monotonic() - start)
+            return result
+
+        primary = asyncio.ensure_future(super()._agenerate(messages, stop, **kwargs))
+        attempts = {primary: time.monotonic()}
+        hedged = False
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and self._try_hedge():
+                hedged = True
+                attempts[asyncio.ensure_future(super()._agenerate(messages, stop, **kwargs))] = time.monotonic()
+            pending = set(attempts)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+        finally:
+            for task in attempts:
+                task.cancel()
+            if hedged:
+                self._release_hedge()
+        winner = winner or next(iter(done))
+        self.policy.record("invoke", time.monotonic() - attempts[winner], hedge_won=winner is not primary)
+        return winner.result()
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        delay = self.policy.delay("stream")
+        if delay is None:
+            start = time.monotonic()
+            first = True
+            for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+                if first:
+                    self.policy.record("stream", time.monotonic() - start)
+                    first = False
+                yield chunk
+            return
+
+        arrivals: "queue.Queue[_StreamAttempt]" = queue.Queue()
+        attempts: List[_StreamAttempt] = []
+
+        def start_attempt() -> None:
+            attempt = _StreamAttempt(super(HedgedChatModel, self)._stream(messages, stop, **kwargs), arrivals)
+            attempts.append(attempt)
+            attempt.future = self._submit(attempt.pump)
+
+        start_attempt()
+        attempts[0].started.wait()
+        try:
+            winner = arrivals.get(timeout=max(0.0, attempts[0].start + delay - time.monotonic()))
+        except queue.Empty:
+            if self._try_hedge():
+                start_attempt()
+                self._release_hedge_after([attempt.future for attempt in attempts])
+            winner = arrivals.get()
+        # The first attempt with a chunk wins, a failed one only if no other attempt is left
+        for _ in attempts[1:]:
+            if not isinstance(winner.first, BaseException):
+                break
+            winner = arrivals.get()
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.close()
+        self.policy.record("stream", time.monotonic() - winner.start, hedge_won=winner is not attempts[0])
+        try:
+            item = winner.first
+            while item is not _DONE:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+                item = winner.items.get()
+        finally:
+            winner.close()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        delay = self.policy.delay("stream")
+        if delay is None:
+            start = time.monotonic()
+            first = True
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                if first:
+                    self.policy.record("stream", time.monotonic() - start)
+                    first = False
+                yield chunk
+            return
+
+        streams = []
+        first_chunks: Dict[asyncio.Future, tuple] = {}
+
+        def start_attempt() -> None:
+            stream = super(HedgedChatModel, self)._astream(messages, stop, **kwargs)
+            streams.append(stream)
+            first_chunks[asyncio.ensure_future(anext(stream, None))] = stream, time.monotonic()
+
+        start_attempt()
+        hedged = False
+        try:
+            done, _ = await asyncio.wait(first_chunks, timeout=delay)
+            if not done and self._try_hedge():
+                hedged = True
+                start_attempt()
+            pending = set(first_chunks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+            winner = winner or next(iter(done))
+        finally:
+            for task in first_chunks:
+                task.cancel()
+            if hedged:
+                self._release_hedge()
+        stream, start = first_chunks[winner]
+        losers = [task for task in first_chunks if task is not winner]
+        # A cancelled anext has to finish before its stream can be closed
+        await asyncio.gather(*losers, return_exceptions=True)
+        for other in streams:
+            if other is not stream:
+                await other.aclose()
+        self.policy.record("stream", time.monotonic() - start, hedge_won=stream is not streams[0])
+        try:
+            first = winner.result()
+            if first is not None:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+        finally:
+            await stream.aclose()
@@ -0,0 +1,60 @@
+"""
+Weather agent with a human in the loop, every get_weather call has to be approved, edited or rejected.
+
+From https://docs.langchain.com/oss/python/langchain/human-in-the-loop
+"""
+import json
+from functools import cache
+from typing import Any, Optional
+
+
+@cache
+def get_weather_tool():
+    """The get_weather tool, built on first use so that importing this module stays cheap."""
+    from langchain.tools import tool
+
+    @tool
+    def get_weather(location: str) -> str:
+        """Get the weather at a location."""
+        return f"It's sunny in {location}."
+
+    return get_weather
+
+
+def __getattr__(name: str) -> Any:
+    if name == "get_weather":
+        return get_weather_tool()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def format_tool_description(tool_call, state, runtime) -> str:
+    # Dynamic callable description
+    return (
+        f"Tool: {tool_call['name']}\\n"
+        f"Arguments:\\n{json.dumps(tool_call['args'], indent=2)}"
+    )
+
+
+def create_hitl_agent(model, checkpointer: Optional[Any] = None):
+    from langchain.agents import create_agent
+    from langchain.agents.middleware import HumanInTheLoopMiddleware, InterruptOnConfig
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    config = InterruptOnConfig(
+        allowed_decisions=["approve", "edit", "reject"],
+        description=format_tool_description
+    )
+
+    agent = create_agent(
+        model=model,
+        tools=[get_weather_tool()],
+        middleware=[
+            HumanInTheLoopMiddleware(
+                interrupt_on={"get_weather": config}
+            ),
+        ],
+        # Human-in-the-loop requires checkpointing to handle interrupts.
+        # In production, use a persistent checkpointer like AsyncPostgresSaver.
+        checkpointer=checkpointer if checkpointer is not None else InMemorySaver(),
+    )
+    return agent
@@ -0,0 +1,167 @@
+"""
+Asyncio service driving many human in the loop threads: runs them up to their interrupt, keeps the
+pending reviews, and resumes them concurrently once decisions are submitted, in bulk.
+
+Example:
+    >>> service = HITLService(create_hitl_agent(model, checkpointer=BoundedMemorySaver()), workers=64)
+    >>> await service.start_many({f"thread_{i}": {"messages": [...]} for i in range(10_000)})
+    >>> len(service.pending())
+    10000
+    >>> outcomes = await service.submit(service.approve_all("get_weather"))
+    >>> outcomes["thread_0"].result["messages"][-1].text
+
+instead of `agent.invoke(...)` followed by `agent.invoke(Command(resume={"decisions": [...]}), config)`,
+one thread at a time. Runs (starts and resumes) go through a pool of `workers` tasks, so ten thousand
+submitted decisions don't become ten thousand concurrent model calls.
+
+A paused thread costs its PendingReview here (the action requests of its interrupt) plus its state in
+the agent's checkpointer: with tens of thousands of threads, use a BoundedMemorySaver.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set
+
+from langgraph.types import Command
+
+
+@dataclass
+class PendingReview:
+    thread_id: str
+    action_requests: List[Dict[str, Any]]       # {"name", "args", "description"} per tool call to review
+    review_configs: List[Dict[str, Any]] = field(default_factory=list)
+
+    def tool_names(self) -> List[str]:
+        return [request["name"] for request in self.action_requests]
+
+
+@dataclass
+class RunOutcome:
+    thread_id: str
+    result: Optional[Dict[str, Any]] = None     # The state returned by the agent
+    pending: Optional[PendingReview] = None     # Set if the thread was interrupted (again)
+    error: Optional[BaseException] = None
+
+    @property
+    def interrupted(self) -> bool:
+        return self.pending is not None
+
+
+def _config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+class HITLService:
+    """Starts and resumes threads of a human in the loop agent (see create_hitl_agent) concurrently.
+
+    Args:
+        agent: Compiled agent with HumanInTheLoopMiddleware and a checkpointer.
+        workers: Maximum number of concurrently running starts and resumes.
+    """
+
+    def __init__(self, agent: Any, workers: int = 32):
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        self.agent = agent
+        self.workers = workers
+        self._pending: Dict[str, PendingReview] = {}
+        # Threads with a queued or running start / resume, their review (if any) is taken when it runs
+        self._running: Set[str] = set()
+
+    def _review(self, thread_id: str, interrupts: Sequence[Any]) -> Optional[PendingReview]:
+        if not interrupts:
+            return None
+        action_requests, review_configs = [], []
+        for interrupt in interrupts:
+            action_requests.extend(interrupt.value.get("action_requests", []))
+            review_configs.extend(interrupt.value.get("review_configs", []))
+        return PendingReview(thread_id, action_requests, review_configs)
+
+    async def _interrupted(self, thread_id: str) -> Optional[PendingReview]:
+        """The review the thread waits for according to the checkpointer, if any."""
+        try:
+            snapshot = await self.agent.aget_state(_config(thread_id))
+        except Exception:
+            return None
+        return self._review(thread_id, snapshot.interrupts)
+
+    async def _run(self, thread_id: str, input: Any) -> RunOutcome:
+        self._pending.pop(thread_id, None)
+        try:
+            result = await self.agent.ainvoke(input, _config(thread_id))
+        except (Exception, asyncio.CancelledError) as error:
+            # A run failing or cancelled before it got past the interrupt still waits for it
+            pending = await self._interrupted(thread_id)
+            if pending is not None:
+                self._pending[thread_id] = pending
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            return RunOutcome(thread_id, pending=pending, error=error)
+        pending = self._review(thread_id, result.get("__interrupt__") or ())
+        if pending is not None:
+            self._pending[thread_id] = pending
+        return RunOutcome(thread_id, result=result, pending=pending)
+
+    async def _run_all(self, inputs: Mapping[str, Any]) -> Dict[str, RunOutcome]:
+        """Run the agent on the input of each thread, at most `workers` runs at a time."""
+        outcomes: Dict[str, RunOutcome] = {}
+        queued = iter(inputs.items())
+        self._running.update(inputs)
+
+        async def worker() -> None:
+            # Workers share the iterator, each takes the next thread once it's done with one
+            for thread_id, input in queued:
+                try:
+                    outcomes[thread_id] = await self._run(thread_id, input)
+                finally:
+                    self._running.discard(thread_id)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.workers, len(inputs)))))
+        finally:
+            # Cancelled: the threads that didn't run yet keep their review
+            self._running.difference_update(thread_id for thread_id, _ in queued)
+        return outcomes
+
+    async def start(self, thread_id: str, input: Any) -> RunOutcome:
+        """Run a new thread (or a new turn of a finished one) until it finishes or is interrupted."""
+        return (await self.start_many({thread_id: input}))[thread_id]
+
+    async def start_many(self, inputs: Mapping[str, Any]) -> Dict[str, RunOutcome]:
+        busy = [thread_id for thread_id in inputs if thread_id in self._pending or thread_id in self._running]
+        if busy:
+            raise ValueError(f"Threads running or waiting for a review can't be started: {busy[:10]}")
+        return await self._run_all(inputs)
+
+    def pending(self, tool_name: Optional[str] = None) -> List[PendingReview]:
+        """Pending reviews not submitted yet, only those whose tool calls all call tool_name if given."""
+        return [review for thread_id, review in self._pending.items() if thread_id not in self._running and
+                (tool_name is None or all(name == tool_name for name in review.tool_names()))]
+
+    def approve_all(self, tool_name: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Decisions approving every tool call of the pending reviews (see pending), to pass to submit."""
+        return {review.thread_id: [{"type": "approve"} for _ in review.action_requests]
+                for review in self.pending(tool_name)}
+
+    async def submit(self, decisions: Mapping[str, Sequence[Dict[str, Any]]]) -> Dict[str, RunOutcome]:
+        """Resume the pending threads with their decisions, one per tool call of the review, in order.
+
+        All decisions are checked (count, and type against the review's allowed decisions) before any
+        thread is resumed: the interrupt keeps the decisions it read even if its run fails, so they can't be
+        corrected afterwards. A thread failing while resumed has an outcome with its error, the others
+        aren't affected. If the thread is still interrupted in the checkpointer (it failed, or the submit
+        was cancelled, before getting past the interrupt) its review is pending again.
+        """
+        for thread_id, thread_decisions in decisions.items():
+            review = self._pending.get(thread_id)
+            if review is None or thread_id in self._running:
+                raise KeyError(f"No review pending for thread {thread_id!r}")
+            if len(thread_decisions) != len(review.action_requests):
+                raise ValueError(f"Thread {thread_id!r} needs {len(review.action_requests)} decisions, "
+                                 f"got {len(thread_decisions)}")
+            allowed = {config["action_name"]: config.get("allowed_decisions", ()) for config in review.review_configs}
+            for request, decision in zip(review.action_requests, thread_decisions):
+                if decision.get("type") not in allowed.get(request["name"], ("approve", "edit", "reject")):
+                    raise ValueError(f"Thread {thread_id!r}: decision {decision.get('type')!r} is not allowed for "
+                                     f"{request['name']!r}")
+        return await self._run_all({thread_id: Command(resume={"decisions": list(thread_decisions)})
+                                    for thread_id, thread_decisions in decisions.items()})
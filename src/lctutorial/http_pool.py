@@ -0,0 +1,106 @@
+"""
+Shared, pooled HTTP transport for all models created by lctutorial.init_chat_model.
+
+Without this every provider SDK client owns its own httpx connection pool, so each model instance pays
+its own TCP/TLS handshakes and keeps its own idle sockets. Handing the same httpx.Client (and
+httpx.AsyncClient) to all of them lets requests to the same provider reuse warm connections.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Callable, Iterator, Optional
+
+import httpx
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False     # Needs the h2 package (pip install "httpx[http2]")
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+ResponseObserver = Callable[[httpx.Response], None]
+
+_lock = threading.Lock()
+_config = PoolConfig()
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def configure_http_pool(**settings) -> PoolConfig:
+    """Change the pool settings (see PoolConfig) used for clients created from now on.
+
+    Models that were already built (and cached) keep the clients they were created with, call
+    lctutorial.model_cache_clear() if they should pick up the new settings.
+    """
+    global _config, _sync_client, _async_client
+    with _lock:
+        _config = replace(_config, **settings)
+        _sync_client = None
+        _async_client = None
+        return _config
+
+
+def get_pool_config() -> PoolConfig:
+    return _config
+
+
+_response_observer: ContextVar[Optional[ResponseObserver]] = ContextVar("response_observer", default=None)
+
+
+@contextmanager
+def observe_responses(observer: ResponseObserver) -> Iterator[None]:
+    """Hand every response the pooled clients receive in this context (thread or task) to observer.
+
+    The observer sees the response head (status and headers) of every attempt, including the ones the
+    provider SDK retries on its own, e.g. 429s.
+    """
+    token = _response_observer.set(observer)
+    try:
+        yield
+    finally:
+        _response_observer.reset(token)
+
+
+def _notify(response: httpx.Response) -> None:
+    observer = _response_observer.get()
+    if observer is not None:
+        observer(response)
+
+
+async def _anotify(response: httpx.Response) -> None:
+    _notify(response)
+
+
+def get_http_client() -> httpx.Client:
+    """The process-wide pooled sync client."""
+    global _sync_client
+    with _lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(limits=_config.limits(), http2=_config.http2,
+                                        event_hooks={"response": [_notify]})
+        return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """The process-wide pooled async client.
+
+    Connections of an httpx.AsyncClient belong to the event loop they were opened on, so a process should
+    drive async calls from a single long-lived loop.
+    """
+    global _async_client
+    with _lock:
+        if _async_client is None or _async_client.is_closed:
+            _async_client = httpx.AsyncClient(limits=_config.limits(), http2=_config.http2,
+                                              event_hooks={"response": [_anotify]})
+        return _async_client
@@ -0,0 +1,754 @@
+"""
+Local stand-in for the OpenAI and Anthropic HTTP APIs, for load tests of the full client stack.
+
+Speaks the OpenAI chat completions (/v1/chat/completions) and responses (/v1/responses) endpoints and
+the Anthropic messages endpoint (/v1/messages), as JSON or as SSE stream. Replies are synthesized from
+the request: a call of the (forced or first) tool while there are tools and no tool results yet, a JSON
+document matching the requested output schema, or else an echo of the last user message.
+
+Example:
+    >>> with MockServer(MockServerConfig(latency=lognormal(0.4, 0.5), tokens_per_second=80,
+    ...                                  errors={429: 0.05, 500: 0.01}, requests_per_minute=500)) as server:
+    ...     model = init_chat_model(provider="OpenAI", **server.model_kwargs("OpenAI"))
+    ...     model.invoke("what is the weather in Boston")
+
+Or standalone: python -m lctutorial.mock_server --port 8080 --latency-ms 300 --tokens-per-second 80
+and OPENAI_BASE_URL=http://127.0.0.1:8080/v1 ANTHROPIC_BASE_URL=http://127.0.0.1:8080
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from lctutorial.text_pieces import split_words
+
+Distribution = Callable[[random.Random], float]
+
+def fixed(seconds: float) -> Distribution:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Distribution:
+    return lambda rng: rng.uniform(low, high)
+
+
+def normal(mean: float, stddev: float) -> Distribution:
+    return lambda rng: max(0.0, rng.gauss(mean, stddev))
+
+
+def lognormal(median: float, sigma: float) -> Distribution:
+    """Long tailed latency with the given median, sigma 0.5 puts the p99 at about 3.2 x median."""
+    return lambda rng: median * rng.lognormvariate(0.0, sigma)
+
+
+@dataclass
+class Reply:
+    text: str = ""
+    tool_calls: List[Dict[str, Any]] = field(default_factory=list)  # {"name": ..., "args": {...}}
+
+
+@dataclass
+class MockRequest:
+    """Provider independent view of a request, handed to MockServerConfig.responder."""
+    api: str                            # "chat.completions", "responses" or "messages"
+    model: str
+    stream: bool
+    user_text: str
+    tools: List[Dict[str, Any]]         # {"name": ..., "parameters": json schema}
+    forced_tool: Optional[str]
+    tools_disabled: bool
+    has_tool_results: bool
+    output_schema: Optional[Dict[str, Any]]
+    input_tokens: int
+    body: Dict[str, Any]
+    cache_read_tokens: int = 0          # Prompt cache, see MockServerConfig.prompt_cache_ttl
+    cache_creation_tokens: int = 0
+
+
+@dataclass
+class MockServerConfig:
+    """
+    Args:
+        latency: Delay before the response head, i.e. the time to first token.
+        tokens_per_second: Pace of streamed tokens (about one per word), None streams without delay.
+        errors: Share of requests answered with an injected error, by status code or "timeout".
+        timeout_seconds: How long an injected timeout hangs before the connection is dropped.
+        requests_per_minute / tokens_per_minute: Rate limits, reported in the provider's rate-limit headers
+            and enforced with 429 responses.
+        max_concurrent_requests: Requests served at the same time, more get a 429 that asks the client to
+            retry after `concurrency_retry_after` seconds.
+        prompt_cache_ttl: Lifetime of the emulated prompt cache entries. Anthropic requests cache the prefix
+            up to every cache_control breakpoint, OpenAI requests every prefix of whole messages (byte
+            exact, per model and prompt_cache_key). Repeated prefixes are reported as cached tokens.
+        seed: Seed of latencies and error injection, None for a random one.
+        responder: Replaces the synthesized reply.
+    """
+    latency: Distribution = fixed(0.0)
+    tokens_per_second: Optional[float] = None
+    errors: Dict[Union[int, str], float] = field(default_factory=dict)
+    timeout_seconds: float = 30.0
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    max_concurrent_requests: Optional[int] = None
+    concurrency_retry_after: float = 0.05
+    prompt_cache_ttl: float = 300.0
+    seed: Optional[int] = 0
+    responder: Optional[Callable[[MockRequest], Reply]] = None
+
+
+@dataclass
+class ServerStats:
+    requests: int = 0
+    streamed: int = 0
+    statuses: Counter = field(default_factory=Counter)
+    injected: Counter = field(default_factory=Counter)
+    rate_limited: int = 0
+    max_in_flight: int = 0              # Most requests served at the same time
+
+
+def example_from_schema(schema: Dict[str, Any], defs: Optional[Dict[str, Any]] = None) -> Any:
+    """A value that validates against a JSON schema, all optional properties included."""
+    defs = {**(defs or {}), **schema.get("$defs", {}), **schema.get("definitions", {})}
+    if "$ref" in schema:
+        return example_from_schema(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    if "const" in schema:
+        return schema["const"]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [option for option in schema[key] if option.get("type") != "null"] or schema[key]
+            return example_from_schema(options[0], defs)
+
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {name: example_from_schema(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_from_schema(schema.get("items", {}), defs)]
+    return {"integer": 1, "number": 1.0, "boolean": True, "null": None}.get(kind, "example")
+
+
+def default_reply(request: MockRequest) -> Reply:
+    tools = {tool["name"]: tool for tool in request.tools}
+    tool = None
+    if request.forced_tool in tools:
+        tool = tools[request.forced_tool]
+    elif tools and not request.tools_disabled and not request.has_tool_results and request.output_schema is None:
+        tool = request.tools[0]
+    if tool is not None:
+        return Reply(tool_calls=[{"name": tool["name"], "args": example_from_schema(tool["parameters"] or {})}])
+    if request.output_schema is not None:
+        return Reply(text=json.dumps(example_from_schema(request.output_schema)))
+    return Reply(text=f"This is a mock response to: {request.user_text}")
+
+
+def _text_of(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def _parse_chat_completions(body: dict) -> dict:
+    messages = body.get("messages", [])
+    tools = [{"name": t["function"]["name"], "parameters": t["function"].get("parameters")}
+             for t in body.get("tools", []) if t.get("type") == "function"]
+    choice = body.get("tool_choice")
+    forced = None
+    if isinstance(choice, dict) and choice.get("type") == "function":
+        forced = choice["function"]["name"]
+    elif isinstance(choice, dict) and choice.get("type") == "allowed_tools":
+        allowed = {t["function"]["name"] for t in choice["allowed_tools"]["tools"]}
+        tools = [tool for tool in tools if tool["name"] in allowed]
+        if choice["allowed_tools"].get("mode") == "required" and tools:
+            forced = tools[0]["name"]
+    elif choice == "required" and tools:
+        forced = tools[0]["name"]
+    response_format = body.get("response_format") or {}
+    schema = None
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"].get("schema", {})
+    elif response_format.get("type") == "json_object":
+        schema = {"type": "object"}
+    return dict(
+        user_text=next((_text_of(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), ""),
+        tools=tools, forced_tool=forced, tools_disabled=choice == "none",
+        has_tool_results=bool(messages) and messages[-1].get("role") == "tool", output_schema=schema)
+
+
+def _parse_responses(body: dict) -> dict:
+    items = body.get("input", [])
+    if isinstance(items, str):
+        items = [{"role": "user", "content": items}]
+    tools = [{"name": t["name"], "parameters": t.get("parameters")}
+             for t in body.get("tools", []) if t.get("type") == "function"]
+    choice = body.get("tool_choice")
+    forced = None
+    if isinstance(choice, dict) and choice.get("type") == "function":
+        forced = choice["name"]
+    elif isinstance(choice, dict) and choice.get("type") == "allowed_tools":
+        allowed = {t["name"] for t in choice.get("tools", [])}
+        tools = [tool for tool in tools if tool["name"] in allowed]
+        if choice.get("mode") == "required" and tools:
+            forced = tools[0]["name"]
+    elif choice == "required" and tools:
+        forced = tools[0]["name"]
+    text_format = (body.get("text") or {}).get("format") or {}
+    return dict(
+        user_text=next((_text_of(item.get("content")) for item in reversed(items)
+                        if isinstance(item, dict) and item.get("role") == "user"), ""),
+        tools=tools, forced_tool=forced, tools_disabled=choice == "none",
+        has_tool_results=bool(items) and isinstance(items[-1], dict)
+        and items[-1].get("type") == "function_call_output",
+        output_schema=text_format.get("schema", {}) if text_format.get("type") == "json_schema" else None)
+
+
+def _parse_messages(body: dict) -> dict:
+    messages = body.get("messages", [])
+    tools = [{"name": t["name"], "parameters": t["input_schema"]} for t in body.get("tools", []) if "input_schema" in t]
+    choice = body.get("tool_choice") or {}
+    forced = None
+    if choice.get("type") == "tool":
+        forced = choice["name"]
+    elif choice.get("type") == "any" and tools:
+        forced = tools[0]["name"]
+    last = messages[-1] if messages else {}
+    has_tool_results = isinstance(last.get("content"), list) and any(
+        isinstance(block, dict) and block.get("type") == "tool_result" for block in last["content"])
+    output_format = body.get("output_format") or {}
+    return dict(
+        user_text=next((_text_of(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), ""),
+        tools=tools, forced_tool=forced, tools_disabled=choice.get("type") == "none",
+        has_tool_results=has_tool_results,
+        output_schema=output_format.get("schema", {}) if output_format.get("type") == "json_schema" else None)
+
+
+def _openai_cache_prefixes(api: str, body: dict) -> List[Tuple[str, int]]:
+    """(hash, tokens) of the prompt prefix up to each message of an OpenAI request, tools included."""
+    messages = body.get("messages", body.get("input", []))
+    if isinstance(messages, str):
+        messages = [messages]
+    digest = hashlib.sha256(f"{body.get('model')}/{body.get('prompt_cache_key')}".encode())
+    digest.update(json.dumps(body.get("tools", [])).encode())
+    digest.update(json.dumps(body.get("instructions")).encode())
+    prefixes, chars = [], 0
+    for message in messages:
+        serialized = json.dumps(message)        # Key order as sent, OpenAI matches bytes
+        digest.update(serialized.encode())
+        chars += len(serialized)
+        prefixes.append((digest.hexdigest(), chars // 4))
+    return prefixes
+
+
+def _anthropic_cache_prefixes(body: dict) -> Tuple[List[Tuple[str, int]], int]:
+    """(hash, tokens) of the prompt prefix up to each cache breakpoint of a messages request, and the
+    tokens of the whole prompt, in the order Anthropic caches: tools, system, messages."""
+    system = body.get("system") or []
+    blocks = list(body.get("tools") or []) + ([{"type": "text", "text": system}] if isinstance(system, str) else system)
+    for message in body.get("messages", []):
+        content = message.get("content")
+        blocks.extend([{"type": "text", "text": content}] if isinstance(content, str) else content or [])
+    digest = hashlib.sha256(str(body.get("model")).encode())
+    prefixes, chars = [], 0
+    for block in blocks:
+        stripped = json.dumps({k: v for k, v in block.items() if k != "cache_control"}, sort_keys=True)
+        digest.update(stripped.encode())
+        chars += len(stripped)
+        if "cache_control" in block:
+            prefixes.append((digest.hexdigest(), chars // 4))
+    return prefixes, chars // 4 + 1
+
+
+_ROUTES = {
+    "/v1/chat/completions": ("chat.completions", _parse_chat_completions),
+    "/chat/completions": ("chat.completions", _parse_chat_completions),
+    "/v1/responses": ("responses", _parse_responses),
+    "/responses": ("responses", _parse_responses),
+    "/v1/messages": ("messages", _parse_messages),
+}
+
+
+def _arg_pieces(arguments: str) -> List[str]:
+    return [arguments[i:i + 16] for i in range(0, len(arguments), 16)] or [""]
+
+
+def _output_tokens(reply: Reply) -> int:
+    return len(split_words(reply.text)) + sum(len(json.dumps(call["args"])) // 4 + 1 for call in reply.tool_calls)
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}{uuid.uuid4().hex[:24]}"
+
+
+class _RateLimiter:
+    """Sliding one minute window over requests and tokens."""
+
+    def __init__(self, requests_per_minute: Optional[int], tokens_per_minute: Optional[int]):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window: deque[Tuple[float, int]] = deque()
+
+    def acquire(self, tokens: int, now: float) -> Tuple[bool, Dict[str, float]]:
+        while self._window and self._window[0][0] <= now - 60:
+            self._window.popleft()
+        used_tokens = sum(t for _, t in self._window)
+        reset = self._window[0][0] + 60 - now if self._window else 0.0
+        allowed = ((self.requests_per_minute is None or len(self._window) < self.requests_per_minute)
+                   and (self.tokens_per_minute is None or used_tokens + tokens <= self.tokens_per_minute))
+        if allowed:
+            self._window.append((now, tokens))
+            used_tokens += tokens
+        state = {"reset": reset,
+                 "remaining_requests": (self.requests_per_minute - len(self._window))
+                 if self.requests_per_minute is not None else None,
+                 "remaining_tokens": (self.tokens_per_minute - used_tokens)
+                 if self.tokens_per_minute is not None else None}
+        return allowed, state
+
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded HTTP/1.1 server on localhost, use as context manager or call start() / stop()."""
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[MockServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _MockHandler)
+        self.config = config or MockServerConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._stats = ServerStats()
+        self._in_flight = 0
+        self._prompt_cache: Dict[str, float] = {}      # prefix hash -> expiry
+        self._rate_limiter = _RateLimiter(self.config.requests_per_minute, self.config.tokens_per_minute)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def model_kwargs(self, provider: str) -> Dict[str, Any]:
+        """init_chat_model arguments that point a model of the provider at this server."""
+        if provider == "OpenAI":
+            return {"base_url": f"{self.base_url}/v1", "api_key": "sk-mock"}
+        if provider == "Anthropic":
+            return {"base_url": self.base_url, "api_key": "sk-ant-mock"}
+        raise ValueError(f"The mock server does not emulate provider {provider!r}")
+
+    def stats(self) -> ServerStats:
+        with self._lock:
+            return replace(self._stats, statuses=Counter(self._stats.statuses),
+                           injected=Counter(self._stats.injected))
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients closing the connection early (cancelled or hedged calls) are normal, not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def _draw(self) -> Tuple[float, Optional[Union[int, str]]]:
+        """Latency and injected error (if any) of the next request."""
+        with self._lock:
+            latency = self.config.latency(self._rng)
+            roll = self._rng.random()
+            for error, rate in self.config.errors.items():
+                if roll < rate:
+                    return latency, error
+                roll -= rate
+            return latency, None
+
+    def _record(self, status: Union[int, str], streamed: bool = False, injected: bool = False,
+                rate_limited: bool = False) -> None:
+        with self._lock:
+            self._stats.requests += 1
+            self._stats.streamed += streamed
+            self._stats.statuses[status] += 1
+            if injected:
+                self._stats.injected[status] += 1
+            self._stats.rate_limited += rate_limited
+
+    def _enter(self) -> bool:
+        with self._lock:
+            limit = self.config.max_concurrent_requests
+            if limit is not None and self._in_flight >= limit:
+                return False
+            self._in_flight += 1
+            self._stats.max_in_flight = max(self._stats.max_in_flight, self._in_flight)
+            return True
+
+    def _leave(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _cache_lookup(self, prefixes: List[Tuple[str, int]]) -> int:
+        """Tokens of the longest cached prefix, caches all prefixes."""
+        with self._lock:
+            now = time.monotonic()
+            read = max((tokens for key, tokens in prefixes if self._prompt_cache.get(key, 0.0) > now), default=0)
+            for key, _ in prefixes:
+                self._prompt_cache[key] = now + self.config.prompt_cache_ttl
+        return read
+
+    def _use_prompt_cache(self, api: str, request: MockRequest) -> None:
+        if api != "messages":
+            # Automatic, input_tokens includes the cached tokens
+            request.cache_read_tokens = self._cache_lookup(_openai_cache_prefixes(api, request.body))
+            return
+        prefixes, prompt_tokens = _anthropic_cache_prefixes(request.body)
+        if not prefixes:
+            return
+        read = self._cache_lookup(prefixes)
+        request.cache_read_tokens = read
+        request.cache_creation_tokens = max(0, prefixes[-1][1] - read)
+        request.input_tokens = max(1, prompt_tokens - read - request.cache_creation_tokens)
+
+    def _acquire(self, tokens: int) -> Tuple[bool, Dict[str, float]]:
+        with self._lock:
+            return self._rate_limiter.acquire(tokens, time.monotonic())
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-alive, streams use chunked transfer encoding
+    server: MockServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        route = _ROUTES.get(self.path.split("?", 1)[0])
+        if route is None:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+            self.server._record(404)
+            return
+        api, parse = route
+        config = self.server.config
+        request = MockRequest(api=api, model=body.get("model", ""), stream=bool(body.get("stream")),
+                              input_tokens=len(json.dumps(body.get("messages", body.get("input", "")))) // 4 + 1,
+                              body=body, **parse(body))
+
+        latency, error = self.server._draw()
+        if error == "timeout":
+            self.server._record("timeout", injected=True)
+            time.sleep(config.timeout_seconds)
+            self.close_connection = True
+            return
+        if error is not None:
+            self._send_error(api, int(error), "Injected error", {"retry-after": "1"})
+            self.server._record(int(error), injected=True)
+            return
+
+        if not self.server._enter():
+            retry_after = config.concurrency_retry_after
+            self._send_error(api, 429, "Too many concurrent requests",
+                             {"retry-after-ms": str(round(retry_after * 1000)), "retry-after": str(retry_after)})
+            self.server._record(429, rate_limited=True)
+            return
+        try:
+            self._respond(api, request, latency)
+        finally:
+            self.server._leave()
+
+    def _respond(self, api: str, request: MockRequest, latency: float) -> None:
+        config = self.server.config
+        allowed, limits = self.server._acquire(request.input_tokens)
+        headers = self._rate_limit_headers(api, limits)
+        if not allowed:
+            headers["retry-after"] = str(max(1, round(limits["reset"])))
+            self._send_error(api, 429, "Rate limit exceeded", headers)
+            self.server._record(429, rate_limited=True)
+            return
+
+        self.server._use_prompt_cache(api, request)
+        reply = (config.responder or default_reply)(request)
+        time.sleep(latency)
+        render = {"chat.completions": _ChatCompletions, "responses": _Responses, "messages": _Messages}[api]
+        rendered = render(request, reply)
+        if request.stream:
+            self._send_stream(rendered.events(), headers)
+        else:
+            self._send_json(200, rendered.response(), headers)
+        self.server._record(200, streamed=request.stream)
+
+    def _rate_limit_headers(self, api: str, limits: Dict[str, float]) -> Dict[str, str]:
+        config = self.server.config
+        headers = {}
+        limited = (("requests", config.requests_per_minute, limits["remaining_requests"]),
+                   ("tokens", config.tokens_per_minute, limits["remaining_tokens"]))
+        for kind, limit, remaining in limited:
+            if limit is None:
+                continue
+            if api == "messages":
+                reset = datetime.now(timezone.utc) + timedelta(seconds=limits["reset"])
+                headers[f"anthropic-ratelimit-{kind}-limit"] = str(limit)
+                headers[f"anthropic-ratelimit-{kind}-remaining"] = str(max(0, remaining))
+                headers[f"anthropic-ratelimit-{kind}-reset"] = reset.strftime("%Y-%m-%dT%H:%M:%SZ")
+            else:
+                headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+                headers[f"x-ratelimit-remaining-{kind}"] = str(max(0, remaining))
+                headers[f"x-ratelimit-reset-{kind}"] = f"{limits['reset']:.3f}s"
+        return headers
+
+    def _send_error(self, api: str, status: int, message: str, headers: Dict[str, str]) -> None:
+        kind = {429: "rate_limit_error", 529: "overloaded_error"}.get(status, "api_error")
+        if api == "messages":
+            payload = {"type": "error", "error": {"type": kind, "message": message}}
+        else:
+            payload = {"error": {"message": message, "type": kind, "param": None, "code": None}}
+        self._send_json(status, payload, headers)
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, events: Iterator[Tuple[Optional[str], Any]], headers: Dict[str, str]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        delay = 1 / self.server.config.tokens_per_second if self.server.config.tokens_per_second else 0.0
+        for event, data in events:
+            if event == "pause":
+                if delay:
+                    time.sleep(delay)
+                continue
+            payload = data if isinstance(data, str) else json.dumps(data)
+            frame = (f"event: {event}\n" if event else "") + f"data: {payload}\n\n"
+            self._write_chunk(frame.encode())
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+_PAUSE = ("pause", None)
+
+
+class _ChatCompletions:
+
+    def __init__(self, request: MockRequest, reply: Reply):
+        self.request, self.reply = request, reply
+        self.id = _new_id("chatcmpl-")
+        self.calls = [(_new_id("call_"), call["name"], json.dumps(call["args"])) for call in reply.tool_calls]
+        self.finish_reason = "tool_calls" if self.calls else "stop"
+        output_tokens = _output_tokens(reply)
+        self.usage = {"prompt_tokens": request.input_tokens, "completion_tokens": output_tokens,
+                      "total_tokens": request.input_tokens + output_tokens,
+                      "prompt_tokens_details": {"cached_tokens": request.cache_read_tokens}}
+
+    def _base(self, kind: str) -> dict:
+        return {"id": self.id, "object": kind, "created": int(time.time()), "model": self.request.model}
+
+    def response(self) -> dict:
+        message = {"role": "assistant", "content": self.reply.text or None, "refusal": None}
+        if self.calls:
+            message["tool_calls"] = [{"id": call_id, "type": "function", "function": {"name": name, "arguments": args}}
+                                     for call_id, name, args in self.calls]
+        return {**self._base("chat.completion"), "usage": self.usage, "choices": [
+            {"index": 0, "message": message, "finish_reason": self.finish_reason, "logprobs": None}]}
+
+    def _chunk(self, delta: dict, finish_reason: Optional[str] = None) -> dict:
+        return {**self._base("chat.completion.chunk"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}]}
+
+    def events(self) -> Iterator[Tuple[Optional[str], Any]]:
+        yield None, self._chunk({"role": "assistant", "content": ""})
+        for piece in split_words(self.reply.text):
+            yield _PAUSE
+            yield None, self._chunk({"content": piece})
+        for index, (call_id, name, args) in enumerate(self.calls):
+            yield None, self._chunk({"tool_calls": [{"index": index, "id": call_id, "type": "function",
+                                                     "function": {"name": name, "arguments": ""}}]})
+            for piece in _arg_pieces(args):
+                yield _PAUSE
+                yield None, self._chunk({"tool_calls": [{"index": index, "function": {"arguments": piece}}]})
+        yield None, self._chunk({}, self.finish_reason)
+        if (self.request.body.get("stream_options") or {}).get("include_usage"):
+            yield None, {**self._base("chat.completion.chunk"), "choices": [], "usage": self.usage}
+        yield None, "[DONE]"
+
+
+class _Responses:
+
+    def __init__(self, request: MockRequest, reply: Reply):
+        self.request, self.reply = request, reply
+        self.id = _new_id("resp_")
+        self.items = []
+        if reply.text:
+            self.items.append({"type": "message", "id": _new_id("msg_"), "status": "completed", "role": "assistant",
+                               "content": [{"type": "output_text", "text": reply.text, "annotations": [],
+                                            "logprobs": []}]})
+        for call in reply.tool_calls:
+            self.items.append({"type": "function_call", "id": _new_id("fc_"), "call_id": _new_id("call_"),
+                               "name": call["name"], "arguments": json.dumps(call["args"]), "status": "completed"})
+        output_tokens = _output_tokens(reply)
+        self.usage = {"input_tokens": request.input_tokens, "output_tokens": output_tokens,
+                      "total_tokens": request.input_tokens + output_tokens,
+                      "input_tokens_details": {"cached_tokens": request.cache_read_tokens}, "output_tokens_details": {"reasoning_tokens": 0}}
+        self.sequence = 0
+
+    def response(self, status: str = "completed") -> dict:
+        body = self.request.body
+        return {"id": self.id, "object": "response", "created_at": int(time.time()), "status": status,
+                "model": self.request.model, "output": self.items if status == "completed" else [],
+                "usage": self.usage if status == "completed" else None,
+                "parallel_tool_calls": body.get("parallel_tool_calls", True),
+                "tool_choice": body.get("tool_choice", "auto"), "tools": body.get("tools", []),
+                "text": body.get("text", {"format": {"type": "text"}}), "error": None,
+                "incomplete_details": None, "instructions": body.get("instructions")}
+
+    def _event(self, kind: str, **data) -> Tuple[str, dict]:
+        self.sequence += 1
+        return kind, {"type": kind, "sequence_number": self.sequence - 1, **data}
+
+    def events(self) -> Iterator[Tuple[Optional[str], Any]]:
+        yield self._event("response.created", response=self.response("in_progress"))
+        for index, item in enumerate(self.items):
+            if item["type"] == "message":
+                text = item["content"][0]["text"]
+                yield self._event("response.output_item.added", output_index=index,
+                                  item={**item, "status": "in_progress", "content": []})
+                yield self._event("response.content_part.added", item_id=item["id"], output_index=index,
+                                  content_index=0, part={"type": "output_text", "text": "", "annotations": []})
+                for piece in split_words(text):
+                    yield _PAUSE
+                    yield self._event("response.output_text.delta", item_id=item["id"], output_index=index,
+                                      content_index=0, delta=piece, logprobs=[])
+                yield self._event("response.output_text.done", item_id=item["id"], output_index=index,
+                                  content_index=0, text=text, logprobs=[])
+                yield self._event("response.content_part.done", item_id=item["id"], output_index=index,
+                                  content_index=0, part=item["content"][0])
+            else:
+                yield self._event("response.output_item.added", output_index=index,
+                                  item={**item, "status": "in_progress", "arguments": ""})
+                for piece in _arg_pieces(item["arguments"]):
+                    yield _PAUSE
+                    yield self._event("response.function_call_arguments.delta", item_id=item["id"],
+                                      output_index=index, delta=piece)
+                yield self._event("response.function_call_arguments.done", item_id=item["id"],
+                                  output_index=index, arguments=item["arguments"])
+            yield self._event("response.output_item.done", output_index=index, item=item)
+        yield self._event("response.completed", response=self.response())
+
+
+class _Messages:
+
+    def __init__(self, request: MockRequest, reply: Reply):
+        self.request, self.reply = request, reply
+        self.id = _new_id("msg_")
+        self.blocks = []
+        if reply.text:
+            self.blocks.append({"type": "text", "text": reply.text})
+        for call in reply.tool_calls:
+            self.blocks.append({"type": "tool_use", "id": _new_id("toolu_"), "name": call["name"],
+                                "input": call["args"]})
+        self.stop_reason = "tool_use" if reply.tool_calls else "end_turn"
+        self.output_tokens = _output_tokens(reply)
+
+    def _usage(self, output_tokens: int) -> dict:
+        return {"input_tokens": self.request.input_tokens, "output_tokens": output_tokens,
+                "cache_creation_input_tokens": self.request.cache_creation_tokens,
+                "cache_read_input_tokens": self.request.cache_read_tokens}
+
+    def response(self) -> dict:
+        return {"id": self.id, "type": "message", "role": "assistant", "model": self.request.model,
+                "content": self.blocks, "stop_reason": self.stop_reason, "stop_sequence": None,
+                "usage": self._usage(self.output_tokens)}
+
+    def events(self) -> Iterator[Tuple[Optional[str], Any]]:
+        yield "message_start", {"type": "message_start", "message": {
+            **self.response(), "content": [], "stop_reason": None, "usage": self._usage(1)}}
+        for index, block in enumerate(self.blocks):
+            if block["type"] == "text":
+                yield "content_block_start", {"type": "content_block_start", "index": index,
+                                              "content_block": {"type": "text", "text": ""}}
+                for piece in split_words(block["text"]):
+                    yield _PAUSE
+                    yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                                  "delta": {"type": "text_delta", "text": piece}}
+            else:
+                yield "content_block_start", {"type": "content_block_start", "index": index,
+                                              "content_block": {**block, "input": {}}}
+                for piece in _arg_pieces(json.dumps(block["input"])):
+                    yield _PAUSE
+                    yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                                  "delta": {"type": "input_json_delta", "partial_json": piece}}
+            yield "content_block_stop", {"type": "content_block_stop", "index": index}
+        yield "message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": self.stop_reason, "stop_sequence": None},
+                                "usage": {"output_tokens": self.output_tokens}}
+        yield "message_stop", {"type": "message_stop"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="Log-normal spread, 0 for a fixed latency")
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, nargs=2, action="append", default=[], metavar=("STATUS", "RATE"),
+                        help="e.g. --error-rate 429 0.05 --error-rate 500 0.01, status 0 injects timeouts")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0)
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    parser.add_argument("--tokens-per-minute", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    config = MockServerConfig(
+        latency=lognormal(latency, args.latency_sigma) if args.latency_sigma else fixed(latency),
+        tokens_per_second=args.tokens_per_second,
+        errors={int(status) or "timeout": rate for status, rate in args.error_rate},
+        timeout_seconds=args.timeout_seconds,
+        requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute, seed=args.seed)
+    server = MockServer(config, args.host, args.port)
+    print(f"OPENAI_BASE_URL={server.base_url}/v1 ANTHROPIC_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
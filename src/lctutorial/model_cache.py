@@ -0,0 +1,96 @@
+"""
+Process-wide cache of chat model instances built by lctutorial.init_chat_model.
+
+Building a chat model also builds the provider SDK client (and its connection pool), so
+repeated calls with identical arguments should hand back the already warm instance.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+
+class CacheInfo(NamedTuple):
+    """Same shape as functools.lru_cache().cache_info()."""
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+def normalize_kwargs(value: Any) -> Hashable:
+    """Turn (possibly nested) keyword arguments into a hashable, order independent key.
+
+    Objects that cannot be hashed by value (e.g. pydantic models, clients) are keyed by identity.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), normalize_kwargs(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_kwargs(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(normalize_kwargs(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return ("__id__", type(value).__qualname__, id(value))
+    return value
+
+
+class ModelCache:
+    """Thread safe LRU cache of constructed chat models."""
+
+    def __init__(self, maxsize: int = 32):
+        self._maxsize = maxsize
+        self._models: OrderedDict[Hashable, BaseChatModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(provider: str, model_name: Optional[str], kwargs: dict) -> Hashable:
+        return provider, model_name, normalize_kwargs(kwargs)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], BaseChatModel]) -> BaseChatModel:
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self._hits += 1
+                return model
+            self._misses += 1
+
+        # Build outside the lock, client construction can be slow
+        model = factory()
+        if model is None or self._maxsize <= 0:
+            return model
+
+        with self._lock:
+            # Another thread may have built the same model in the meantime, keep the first one
+            existing = self._models.get(key)
+            if existing is not None:
+                self._models.move_to_end(key)
+                return existing
+            self._models[key] = model
+            while len(self._models) > self._maxsize:
+                self._models.popitem(last=False)
+        return model
+
+    def set_maxsize(self, maxsize: int) -> None:
+        with self._lock:
+            self._maxsize = maxsize
+            while len(self._models) > max(maxsize, 0):
+                self._models.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._models))
@@ -0,0 +1,348 @@
+"""
+Incremental parsing of streamed tool call arguments.
+
+Tool call args arrive as JSON fragments in the tool_call_chunks of a stream. IncrementalJSONParser
+consumes every fragment once (no re-parsing of the accumulated string) and keeps the partially built
+value up to date, ToolCallStreamParser keeps one parser per tool call index.
+
+Example:
+    >>> calls = ToolCallStreamParser()
+    >>> for chunk in model.stream("What's the weather in Boston and Tokyo?"):
+    ...     for call in calls.add(chunk):
+    ...         print(call.index, call.name, call.args, call.complete)
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from langchain_core.messages import AIMessageChunk
+from langchain_core.messages.tool import ToolCall, ToolCallChunk
+
+_WHITESPACE = " \t\n\r"
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_LITERALS = {"true": True, "false": False, "null": None}
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+# Parser states
+_VALUE, _KEY_OR_END, _KEY, _COLON, _AFTER_VALUE, _STRING, _NUMBER, _LITERAL, _DONE = range(9)
+
+
+class _Frame:
+    __slots__ = ("container", "key", "empty")
+
+    def __init__(self, container):
+        self.container = container
+        self.key = None
+        self.empty = True
+
+
+class IncrementalJSONParser:
+    """Streaming JSON parser, feed() fragments and read `value` at any time.
+
+    `value` holds everything parsed so far: open objects and arrays with their finished members, the
+    string being received (unless include_partial_strings=False). Numbers and true/false/null only
+    appear once they are complete. `complete` turns True with the end of the top level value.
+    """
+
+    def __init__(self, include_partial_strings: bool = True):
+        self.include_partial_strings = include_partial_strings
+        self.complete = False
+        self._root: Any = None
+        self._stack: List[_Frame] = []
+        self._state = _VALUE
+        self._pieces: List[str] = []        # String, number or literal being read
+        self._string_is_key = False
+        self._escape = ""                   # Pending escape sequence, e.g. "\\" or "\\u00"
+        self._partial_slot = False          # The partial string has a placeholder in its container
+        self._dirty = False
+        self._consumed = 0
+
+    @property
+    def consumed(self) -> int:
+        """Number of characters fed so far."""
+        return self._consumed
+
+    @property
+    def value(self) -> Any:
+        if self._dirty:
+            self._dirty = False
+            if len(self._pieces) > 1:
+                self._pieces[:] = ["".join(self._pieces)]
+            self._set_partial("".join(self._pieces))
+        return self._root
+
+    def feed(self, fragment: str) -> Any:
+        """Parse the next fragment, returns the value parsed so far."""
+        self._consumed += len(fragment)
+        i, end = 0, len(fragment)
+        while i < end:
+            state = self._state
+            if state == _STRING:
+                i = self._read_string(fragment, i)
+                continue
+            char = fragment[i]
+            if state == _NUMBER:
+                if char in _NUMBER_CHARS:
+                    start = i
+                    while i < end and fragment[i] in _NUMBER_CHARS:
+                        i += 1
+                    self._pieces.append(fragment[start:i])
+                    continue
+                self._finish_number()
+                continue            # The char ends the number and is read again
+            if state == _LITERAL:
+                self._pieces.append(char)
+                i += 1
+                self._check_literal()
+                continue
+            i += 1
+            if char in _WHITESPACE:
+                continue
+            if state == _VALUE:
+                self._start_value(char)
+            elif state == _KEY_OR_END and char == "}":
+                self._close()
+            elif state in (_KEY_OR_END, _KEY) and char == '"':
+                self._start_string(is_key=True)
+            elif state == _COLON and char == ":":
+                self._state = _VALUE
+            elif state == _AFTER_VALUE:
+                self._after_value(char)
+            elif state == _DONE:
+                raise ValueError(f"Unexpected {char!r} after the end of the JSON value")
+            else:
+                raise ValueError(f"Unexpected {char!r} at character {self._consumed - end + i - 1}")
+        return self.value
+
+    def finish(self) -> Any:
+        """End of input: finishes a trailing top level number, raises if the value is incomplete."""
+        if self._state == _NUMBER and not self._stack:
+            self._finish_number()
+        if not self.complete:
+            raise ValueError("Incomplete JSON value")
+        return self.value
+
+    def _start_value(self, char: str) -> None:
+        if char == "{":
+            self._push({})
+            self._state = _KEY_OR_END
+        elif char == "[":
+            self._push([])
+            self._state = _VALUE
+        elif char == "]" and self._stack and isinstance(self._stack[-1].container, list) and self._stack[-1].empty:
+            self._close()
+        elif char == '"':
+            self._start_string(is_key=False)
+        elif char == "-" or char.isdigit():
+            self._pieces = [char]
+            self._state = _NUMBER
+        elif char in "tfn":
+            self._pieces = [char]
+            self._state = _LITERAL
+        else:
+            raise ValueError(f"Unexpected {char!r} where a value was expected")
+
+    def _after_value(self, char: str) -> None:
+        frame = self._stack[-1]
+        is_object = isinstance(frame.container, dict)
+        if char == ",":
+            self._state = _KEY if is_object else _VALUE
+        elif char == ("}" if is_object else "]"):
+            self._close()
+        else:
+            raise ValueError(f"Unexpected {char!r} after a value")
+
+    def _push(self, container) -> None:
+        self._deliver(container)
+        self._stack.append(_Frame(container))
+
+    def _close(self) -> None:
+        self._stack.pop()
+        self._value_done()
+
+    def _deliver(self, value: Any) -> None:
+        """Put a new value into its container (or make it the root)."""
+        if not self._stack:
+            self._root = value
+            return
+        frame = self._stack[-1]
+        frame.empty = False
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = value
+        else:
+            frame.container.append(value)
+
+    def _value_done(self) -> None:
+        if self._stack:
+            self._state = _AFTER_VALUE
+        else:
+            self._state = _DONE
+            self.complete = True
+
+    def _start_string(self, is_key: bool) -> None:
+        self._state = _STRING
+        self._string_is_key = is_key
+        self._pieces = []
+        self._escape = ""
+        self._partial_slot = False
+        if not is_key and self.include_partial_strings:
+            self._deliver("")
+            self._partial_slot = True
+
+    def _read_string(self, fragment: str, i: int) -> int:
+        end = len(fragment)
+        if self._escape:
+            i = self._read_escape(fragment, i)
+            if self._escape or i >= end:
+                return i
+        while i < end:
+            quote = fragment.find('"', i)
+            backslash = fragment.find("\\", i, quote if quote >= 0 else end)
+            if backslash >= 0:
+                self._append_string(fragment[i:backslash])
+                self._escape = "\\"
+                i = self._read_escape(fragment, backslash + 1)
+                if self._escape:
+                    return i
+                continue
+            if quote < 0:
+                self._append_string(fragment[i:])
+                return end
+            self._append_string(fragment[i:quote])
+            self._finish_string()
+            return quote + 1
+        return i
+
+    def _read_escape(self, fragment: str, i: int) -> int:
+        end = len(fragment)
+        while i < end and self._escape:
+            self._escape += fragment[i]
+            i += 1
+            escape = self._escape
+            if escape[1] != "u":
+                if escape[1] not in _ESCAPES:
+                    raise ValueError(f"Invalid escape {escape!r}")
+                self._append_string(_ESCAPES[escape[1]])
+                self._escape = ""
+            elif len(escape) == 8 and escape[6:] != "\\u":
+                raise ValueError(f"Unpaired surrogate in {escape!r}")
+            elif len(escape) == 6:
+                code = int(escape[2:], 16)
+                if 0xD800 <= code < 0xDC00:
+                    continue        # High surrogate, wait for the low one: 😀
+                self._escape = ""
+                self._append_string(chr(code))
+            elif len(escape) == 12:
+                high, low = int(escape[2:6], 16), int(escape[8:], 16)
+                self._escape = ""
+                self._append_string(chr(0x10000 + ((high - 0xD800) << 10) + (low - 0xDC00)))
+        return i
+
+    def _append_string(self, text: str) -> None:
+        if text:
+            self._pieces.append(text)
+            self._dirty = self._partial_slot
+
+    def _finish_string(self) -> None:
+        text = "".join(self._pieces)
+        self._pieces = []
+        self._dirty = False
+        if self._string_is_key:
+            self._stack[-1].key = text
+            self._state = _COLON
+            return
+        if self._partial_slot:
+            self._set_partial(text)
+            self._partial_slot = False
+        else:
+            self._deliver(text)
+        self._value_done()
+
+    def _set_partial(self, text: str) -> None:
+        if not self._partial_slot:
+            return
+        if not self._stack:
+            self._root = text
+            return
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = text
+        else:
+            frame.container[-1] = text
+
+    def _finish_number(self) -> None:
+        text = "".join(self._pieces)
+        self._pieces = []
+        try:
+            number = float(text) if any(c in text for c in ".eE") else int(text)
+        except ValueError:
+            raise ValueError(f"Invalid number {text!r}") from None
+        self._deliver(number)
+        self._value_done()
+
+    def _check_literal(self) -> None:
+        text = "".join(self._pieces)
+        if text in _LITERALS:
+            self._pieces = []
+            self._deliver(_LITERALS[text])
+            self._value_done()
+        elif not any(literal.startswith(text) for literal in _LITERALS):
+            raise ValueError(f"Invalid literal {text!r}")
+
+
+@dataclass
+class PartialToolCall:
+    index: Any
+    name: Optional[str] = None
+    id: Optional[str] = None
+    parser: IncrementalJSONParser = field(default_factory=IncrementalJSONParser)
+
+    @property
+    def args(self) -> Dict[str, Any]:
+        value = self.parser.value
+        return value if isinstance(value, dict) else {}
+
+    @property
+    def complete(self) -> bool:
+        return self.parser.complete
+
+    def to_tool_call(self) -> ToolCall:
+        return ToolCall(name=self.name or "", args=self.args, id=self.id, type="tool_call")
+
+
+class ToolCallStreamParser:
+    """Parses the tool_call_chunks of a stream, one IncrementalJSONParser per tool call index."""
+
+    def __init__(self):
+        self.calls: Dict[Any, PartialToolCall] = {}
+        self._unindexed = 0
+
+    def add(self, chunk: Union[AIMessageChunk, Iterable[ToolCallChunk]]) -> List[PartialToolCall]:
+        """Feed the tool call chunks of a message chunk, returns the calls they changed."""
+        tool_call_chunks = chunk.tool_call_chunks if isinstance(chunk, AIMessageChunk) else chunk
+        changed = []
+        for tool_chunk in tool_call_chunks:
+            index = tool_chunk.get("index")
+            if index is None:
+                # Without index every chunk is a call of its own, like when merging chunks
+                index = f"unindexed-{self._unindexed}"
+                self._unindexed += 1
+            call = self.calls.get(index)
+            if call is None:
+                call = self.calls[index] = PartialToolCall(index=index)
+            call.name = call.name or tool_chunk.get("name")
+            call.id = call.id or tool_chunk.get("id")
+            if tool_chunk.get("args"):
+                call.parser.feed(tool_chunk["args"])
+            if call not in changed:
+                changed.append(call)
+        return changed
+
+    def completed(self) -> List[PartialToolCall]:
+        return [call for call in self.calls.values() if call.complete]
+
+    def finish(self) -> List[ToolCall]:
+        """End of stream: calls that never got args (tools without parameters) are complete with {}."""
+        for call in self.calls.values():
+            if not call.parser.consumed:
+                call.parser.feed("{}")
+        return [call.to_tool_call() for call in self.calls.values() if call.complete]
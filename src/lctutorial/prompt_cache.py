@@ -0,0 +1,237 @@
+"""
+Provider prompt caching: cache breakpoints on the stable prefix of a request, and cache usage per thread.
+
+Agents resend the same system prompt and tool definitions on every turn, plus a conversation that only
+grows at its end. Anthropic caches a prompt prefix only up to a block marked with cache_control, so
+with `init_chat_model(provider="Anthropic", prompt_caching=True)` every request gets breakpoints (at
+most 4) on the last tool, the last system block, the end of the conversation and the end of the
+previous request. Each call then reads what the previous call of the conversation wrote to the cache.
+
+Example:
+    >>> usage = PromptCacheUsage()
+    >>> agent = create_agent(init_chat_model(provider="Anthropic", prompt_caching=True), tools=[get_weather],
+    ...                      system_prompt="You are a helpful assistant", checkpointer=InMemorySaver())
+    >>> agent.invoke({"messages": [...]}, {"configurable": {"thread_id": "1"}, "callbacks": [usage]})
+    >>> usage.by_thread()["1"].cache_read, usage.by_thread()["1"].read_share
+
+OpenAI caches automatically, but only byte identical prefixes, and spreads requests without a
+prompt_cache_key over machines. `init_chat_model(provider="OpenAI", prompt_caching=True)` canonicalizes
+every request (see canonicalize_openai_payload) and sends a prompt_cache_key derived from the agent's
+tools and system prompt.
+
+PromptCacheUsage reads the cache_read / cache_creation input token details that langchain reports in the
+usage metadata of Anthropic and OpenAI responses alike (OpenAI's cached_tokens are the cache reads).
+"""
+import hashlib
+import json
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# Anthropic caches at most 4 breakpoints per request
+MAX_BREAKPOINTS = 4
+# Blocks that can't carry a breakpoint themselves
+_UNMARKABLE_BLOCKS = ("thinking", "redacted_thinking")
+_STATIC_ROLES = ("system", "developer")
+
+
+def _cache_control(ttl: Optional[str]) -> Dict[str, str]:
+    return {"type": "ephemeral"} if ttl is None else {"type": "ephemeral", "ttl": ttl}
+
+
+def _count_breakpoints(payload: Dict[str, Any]) -> int:
+    blocks = list(payload.get("tools") or [])
+    if isinstance(payload.get("system"), list):
+        blocks.extend(payload["system"])
+    for message in payload.get("messages", []):
+        if isinstance(message.get("content"), list):
+            blocks.extend(message["content"])
+    return sum(1 for block in blocks if isinstance(block, dict) and "cache_control" in block)
+
+
+def _mark_last_block(blocks: List[Any], control: Dict[str, str]) -> Optional[List[Any]]:
+    """Copy of blocks with a breakpoint on the last markable block, None if there is none or it has one."""
+    for index in range(len(blocks) - 1, -1, -1):
+        block = blocks[index]
+        if not isinstance(block, dict) or block.get("type") in _UNMARKABLE_BLOCKS:
+            continue
+        if "cache_control" in block or (block.get("type") == "text" and not block.get("text")):
+            return None
+        marked = list(blocks)
+        marked[index] = {**block, "cache_control": control}
+        return marked
+    return None
+
+
+def _mark_message(message: Dict[str, Any], control: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    content = message.get("content")
+    if isinstance(content, str):
+        return {**message, "content": [{"type": "text", "text": content, "cache_control": control}]} if content \
+            else None
+    if isinstance(content, list):
+        marked = _mark_last_block(content, control)
+        return None if marked is None else {**message, "content": marked}
+    return None
+
+
+def add_anthropic_cache_breakpoints(payload: Dict[str, Any], ttl: Optional[str] = None) -> Dict[str, Any]:
+    """Copy of an Anthropic messages payload with cache breakpoints on its stable prefix.
+
+    In order, until the 4 breakpoints are used up (breakpoints already in the payload count): the last
+    tool, the last system block, the last message and the previous user message, i.e. the end of the
+    previous request of the conversation, which the previous call wrote to the cache.
+    The payload itself (and the tool definitions bound to a model) are not modified.
+    """
+    control = _cache_control(ttl)
+    budget = MAX_BREAKPOINTS - _count_breakpoints(payload)
+    payload = dict(payload)
+
+    if budget > 0 and payload.get("tools"):
+        tools = _mark_last_block(payload["tools"], control)
+        if tools is not None:
+            payload["tools"], budget = tools, budget - 1
+
+    system = payload.get("system")
+    if budget > 0 and system:
+        system = _mark_last_block([{"type": "text", "text": system}] if isinstance(system, str) else system,
+                                  control)
+        if system is not None:
+            payload["system"], budget = system, budget - 1
+
+    messages = list(payload.get("messages") or [])
+    # The previous user message (a tool result in a tool loop) is where the previous request ended
+    users = [index for index, message in enumerate(messages) if message.get("role") == "user"]
+    for index in (len(messages) - 1, users[-2] if len(users) > 1 else None):
+        if budget <= 0 or index is None:
+            continue
+        marked = _mark_message(messages[index], control)
+        if marked is not None:
+            messages[index], budget = marked, budget - 1
+    payload["messages"] = messages
+    return payload
+
+
+def canonical_schema(value: Any) -> Any:
+    """A JSON schema with its keys in sorted order, recursively.
+
+    Only the order of "properties" is kept, models fill in arguments (and structured output) in that order.
+    """
+    if isinstance(value, dict):
+        return {key: ({name: canonical_schema(prop) for name, prop in value[key].items()}
+                      if key == "properties" and isinstance(value[key], dict) else canonical_schema(value[key]))
+                for key in sorted(value)}
+    if isinstance(value, list):
+        return [canonical_schema(item) for item in value]
+    return value
+
+
+def _tool_name(tool: Dict[str, Any]) -> str:
+    return str(tool.get("name") or (tool.get("function") or {}).get("name") or tool.get("type", ""))
+
+
+def _static_prefix(messages: List[Any]) -> List[Any]:
+    """The system / developer messages the conversation starts with."""
+    prefix = []
+    for message in messages:
+        if not isinstance(message, dict) or message.get("role") not in _STATIC_ROLES:
+            break
+        prefix.append(message)
+    return prefix
+
+
+def canonicalize_openai_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of an OpenAI chat completions or responses payload whose prefix is byte stable across calls.
+
+    Tools are sorted by name and tool and response schemas get sorted keys (see canonical_schema). The
+    messages stay in their order, a system message later in the conversation means something else there.
+    """
+    payload = dict(payload)
+    if payload.get("tools"):
+        payload["tools"] = sorted((canonical_schema(tool) for tool in payload["tools"]), key=_tool_name)
+    if isinstance(payload.get("response_format"), dict):
+        payload["response_format"] = canonical_schema(payload["response_format"])
+    if isinstance(payload.get("text"), dict):
+        payload["text"] = canonical_schema(payload["text"])
+    return payload
+
+
+def openai_prompt_cache_key(payload: Dict[str, Any]) -> str:
+    """Key of the static part of a payload (model, tools, leading system / developer messages), one per agent."""
+    messages = payload.get("messages", payload.get("input"))
+    static = {"model": payload.get("model"), "tools": payload.get("tools"),
+              "instructions": payload.get("instructions"),
+              "system": _static_prefix(messages) if isinstance(messages, list) else None}
+    return "lct-" + hashlib.sha256(json.dumps(static, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+@dataclass
+class CacheUsage:
+    calls: int = 0
+    cache_hits: int = 0         # Calls that read from the cache
+    input_tokens: int = 0       # All input tokens, cached ones included
+    cache_read: int = 0
+    cache_creation: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.cache_hits / self.calls if self.calls else 0.0
+
+    @property
+    def read_share(self) -> float:
+        """Share of the input tokens read from the cache (cached_tokens / input tokens for OpenAI)."""
+        return self.cache_read / self.input_tokens if self.input_tokens else 0.0
+
+
+class PromptCacheUsage(BaseCallbackHandler):
+    """Callback handler summing up prompt cache reads and writes per LangGraph thread_id.
+
+    Calls outside of a thread are counted under None.
+    """
+
+    def __init__(self):
+        self._threads: Dict[Optional[str], CacheUsage] = {}
+        self._runs: Dict[UUID, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._runs[run_id] = (metadata or {}).get("thread_id")
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            thread_id = self._runs.pop(run_id, None)
+            usage = self._threads.setdefault(thread_id, CacheUsage())
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if not metadata:
+                        continue
+                    details = metadata.get("input_token_details") or {}
+                    usage.calls += 1
+                    usage.cache_hits += bool(details.get("cache_read"))
+                    usage.input_tokens += metadata.get("input_tokens", 0)
+                    usage.cache_read += details.get("cache_read") or 0
+                    usage.cache_creation += details.get("cache_creation") or 0
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def by_thread(self) -> Dict[Optional[str], CacheUsage]:
+        with self._lock:
+            return {thread_id: replace(usage) for thread_id, usage in self._threads.items()}
+
+    def total(self) -> CacheUsage:
+        total = CacheUsage()
+        for usage in self.by_thread().values():
+            total.calls += usage.calls
+            total.cache_hits += usage.cache_hits
+            total.input_tokens += usage.input_tokens
+            total.cache_read += usage.cache_read
+            total.cache_creation += usage.cache_creation
+        return total
@@ -0,0 +1,323 @@
+"""
+Request and token rate limits per provider and model, shared by threads and by local processes.
+
+Every model instance of every worker takes from the same token buckets (one for requests, one for
+tokens per provider:model), so together they stay under the requests-per-minute and tokens-per-minute
+limits of the shared API key instead of running into 429s and retries.
+
+Example:
+    >>> limiter = ProviderRateLimiter({"OpenAI": RateLimit(requests_per_minute=500, tokens_per_minute=30_000)},
+    ...                               store=FileBucketStore("/tmp/lctutorial-rate-limits"))
+    >>> model = init_chat_model(provider="OpenAI", rate_limiter=limiter)
+
+A call takes its token cost up front, estimated from the input size and max_tokens (see
+estimate_tokens), and the difference to the reported usage is settled when the response arrives. A
+call that fails gives its tokens back (its request stays taken), a stream closed early by its consumer
+keeps the tokens it reported, or those of its input and the chunks it received.
+MemoryBucketStore (default) shares buckets within a process, FileBucketStore across processes on one
+machine through a state file guarded by an exclusive file lock.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.rate_limiters import BaseRateLimiter
+from pydantic import ConfigDict
+
+from lctutorial.chat_model_wrapper import DelegatingChatModel
+
+# Output tokens charged up front when a call does not set max_tokens
+DEFAULT_OUTPUT_TOKENS = 1024
+
+# Bucket states: bucket id -> [available, updated_at (time.time())]
+BucketStates = Dict[str, List[float]]
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+
+
+class MemoryBucketStore:
+    """Bucket states of one process."""
+
+    def __init__(self):
+        self._states: BucketStates = {}
+        self._lock = threading.Lock()
+
+    def update(self, change: Callable[[BucketStates], Any]) -> Any:
+        """Run change on the states atomically, returns its result."""
+        with self._lock:
+            return change(self._states)
+
+
+class FileBucketStore:
+    """Bucket states in a JSON file, every update holds an exclusive lock on `<path>.lock` (POSIX only)."""
+
+    def __init__(self, path: str):
+        import fcntl     # Not available on Windows
+
+        self.path = path
+        self._flock = fcntl.flock
+        self._lock_flags = fcntl.LOCK_EX, fcntl.LOCK_UN
+        self._thread_lock = threading.Lock()     # flock does not exclude threads sharing the descriptor
+
+    def update(self, change: Callable[[BucketStates], Any]) -> Any:
+        lock, unlock = self._lock_flags
+        with self._thread_lock, open(self.path + ".lock", "a") as lock_file:
+            self._flock(lock_file.fileno(), lock)
+            try:
+                try:
+                    with open(self.path) as file:
+                        states = json.load(file)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    states = {}
+                result = change(states)
+                temporary = f"{self.path}.{os.getpid()}.tmp"
+                with open(temporary, "w") as file:
+                    json.dump(states, file)
+                os.replace(temporary, self.path)
+                return result
+            finally:
+                self._flock(lock_file.fileno(), unlock)
+
+
+def estimate_tokens(messages: Sequence[BaseMessage], max_tokens: Optional[int] = None) -> int:
+    """Upper estimate of the tokens a call counts against a tokens-per-minute limit: input plus max output."""
+    from langchain_core.messages.utils import count_tokens_approximately
+
+    return count_tokens_approximately(messages) + (max_tokens if max_tokens is not None else DEFAULT_OUTPUT_TOKENS)
+
+
+class ProviderRateLimiter:
+    """Token buckets per "provider:model", refilled continuously at the per minute rates.
+
+    Args:
+        limits: RateLimit by "provider:model" or by "provider", the latter applies to each model of the
+            provider that has no own entry. Keys without a limit are not limited.
+        store: Where the bucket states live, MemoryBucketStore() by default.
+        max_wait: Longest single sleep while waiting, so that refunds by other callers are noticed.
+    """
+
+    def __init__(self, limits: Mapping[str, RateLimit], store: Optional[Any] = None, max_wait: float = 1.0):
+        self.limits = dict(limits)
+        self.store = store if store is not None else MemoryBucketStore()
+        self.max_wait = max_wait
+
+    def limit_for(self, key: str) -> Optional[RateLimit]:
+        return self.limits.get(key) or self.limits.get(key.split(":", 1)[0])
+
+    def _buckets(self, key: str, tokens: int) -> List[Tuple[str, float, float]]:
+        """(bucket id, capacity, cost) of the buckets a call takes from."""
+        limit = self.limit_for(key)
+        if limit is None:
+            return []
+        buckets = []
+        if limit.requests_per_minute:
+            buckets.append((f"{key}/requests", limit.requests_per_minute, 1))
+        if limit.tokens_per_minute:
+            # A call larger than the bucket waits for a full bucket instead of forever
+            buckets.append((f"{key}/tokens", limit.tokens_per_minute, min(tokens, limit.tokens_per_minute)))
+        return buckets
+
+    @staticmethod
+    def _refill(states: BucketStates, bucket: str, capacity: float, now: float) -> List[float]:
+        state = states.setdefault(bucket, [capacity, now])
+        state[0] = min(capacity, state[0] + (now - state[1]) * capacity / 60)
+        state[1] = now
+        return state
+
+    def try_acquire(self, key: str, tokens: int = 0) -> float:
+        """Take a request and `tokens` if all buckets have them, returns 0 or else the seconds to wait."""
+        buckets = self._buckets(key, tokens)
+        if not buckets:
+            return 0.0
+
+        def take(states: BucketStates) -> float:
+            now = time.time()
+            wait = 0.0
+            for bucket, capacity, cost in buckets:
+                available = self._refill(states, bucket, capacity, now)[0]
+                if available < cost:
+                    wait = max(wait, (cost - available) * 60 / capacity)
+            if wait == 0.0:
+                for bucket, _, cost in buckets:
+                    states[bucket][0] -= cost
+            return wait
+
+        return self.store.update(take)
+
+    def acquire(self, key: str, tokens: int = 0, blocking: bool = True) -> bool:
+        while True:
+            wait = self.try_acquire(key, tokens)
+            if wait == 0.0:
+                return True
+            if not blocking:
+                return False
+            time.sleep(min(wait, self.max_wait))
+
+    async def aacquire(self, key: str, tokens: int = 0, blocking: bool = True) -> bool:
+        while True:
+            wait = self.try_acquire(key, tokens)
+            if wait == 0.0:
+                return True
+            if not blocking:
+                return False
+            await asyncio.sleep(min(wait, self.max_wait))
+
+    def settle(self, key: str, estimated: int, actual: int) -> None:
+        """Give back (or take) the difference between the estimated and the reported token usage."""
+        limit = self.limit_for(key)
+        if limit is None or not limit.tokens_per_minute or estimated == actual:
+            return
+        bucket, capacity = f"{key}/tokens", limit.tokens_per_minute
+
+        def adjust(states: BucketStates) -> None:
+            state = self._refill(states, bucket, capacity, time.time())
+            # May go below zero, the next callers then wait for the overdraft to refill
+            state[0] = min(capacity, state[0] + min(estimated, capacity) - actual)
+
+        self.store.update(adjust)
+
+    def as_langchain_rate_limiter(self, key: str) -> BaseRateLimiter:
+        """Requests only view of the buckets of key, for the rate_limiter= parameter of any chat model."""
+        return _RequestRateLimiter(self, key)
+
+
+class _RequestRateLimiter(BaseRateLimiter):
+
+    def __init__(self, limiter: ProviderRateLimiter, key: str):
+        self.limiter = limiter
+        self.key = key
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        return self.limiter.acquire(self.key, blocking=blocking)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        return await self.limiter.aacquire(self.key, blocking=blocking)
+
+
+def _used_tokens(message: AIMessage, estimated: int) -> int:
+    usage = message.usage_metadata
+    return usage["total_tokens"] if usage else estimated
+
+
+class RateLimitedChatModel(DelegatingChatModel):
+    """Takes a request and the estimated tokens from `rate_limiter` before every call of the inner model."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    rate_limiter_key: str
+    provider_rate_limiter: ProviderRateLimiter
+
+    def _estimate(self, messages: List[BaseMessage], **kwargs: Any) -> int:
+        # max_tokens is set on the provider model, under any other wrappers (e.g. adaptive concurrency)
+        model = self.inner
+        while isinstance(model, DelegatingChatModel):
+            model = model.inner
+        max_tokens = kwargs.get("max_tokens", getattr(model, "max_tokens", None))
+        return estimate_tokens(messages, max_tokens)
+
+    def _refund(self, estimated: int, used: Optional[int] = None) -> None:
+        # A failed call only used the tokens it reported before failing
+        self.provider_rate_limiter.settle(self.rate_limiter_key, estimated, used or 0)
+
+    def _settle_stream(self, messages: List[BaseMessage], estimated: int, used: Optional[int], streamed: int,
+                       outcome: str) -> None:
+        if outcome == "failed":
+            self._refund(estimated, used)
+        elif used is not None:
+            self.provider_rate_limiter.settle(self.rate_limiter_key, estimated, used)
+        elif outcome == "stopped":
+            # Closed by the consumer before the usage came: the input and about a token per chunk received
+            self.provider_rate_limiter.settle(self.rate_limiter_key, estimated, estimate_tokens(messages, streamed))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        estimated = self._estimate(messages, **kwargs)
+        self.provider_rate_limiter.acquire(self.rate_limiter_key, estimated)
+        try:
+            result = super()._generate(messages, stop, run_manager, **kwargs)
+        except Exception:
+            self._refund(estimated)
+            raise
+        self.provider_rate_limiter.settle(self.rate_limiter_key, estimated,
+                                          _used_tokens(result.generations[0].message, estimated))
+        return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        estimated = self._estimate(messages, **kwargs)
+        await self.provider_rate_limiter.aacquire(self.rate_limiter_key, estimated)
+        try:
+            result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+        except Exception:
+            self._refund(estimated)
+            raise
+        self.provider_rate_limiter.settle(self.rate_limiter_key, estimated,
+                                          _used_tokens(result.generations[0].message, estimated))
+        return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        estimated = self._estimate(messages, **kwargs)
+        self.provider_rate_limiter.acquire(self.rate_limiter_key, estimated)
+        used, streamed, outcome = None, 0, "stopped"
+        try:
+            for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+                if chunk.message.usage_metadata:
+                    used = (used or 0) + chunk.message.usage_metadata["total_tokens"]
+                streamed += 1
+                yield chunk
+            outcome = "done"
+        except Exception:
+            outcome = "failed"
+            raise
+        finally:
+            self._settle_stream(messages, estimated, used, streamed, outcome)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        estimated = self._estimate(messages, **kwargs)
+        await self.provider_rate_limiter.aacquire(self.rate_limiter_key, estimated)
+        used, streamed, outcome = None, 0, "stopped"
+        try:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                if chunk.message.usage_metadata:
+                    used = (used or 0) + chunk.message.usage_metadata["total_tokens"]
+                streamed += 1
+                yield chunk
+            outcome = "done"
+        except Exception:
+            outcome = "failed"
+            raise
+        finally:
+            self._settle_stream(messages, estimated, used, streamed, outcome)
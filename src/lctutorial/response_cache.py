@@ -0,0 +1,334 @@
+"""
+Exact-match response cache for chat models, with an in-process LRU tier and a persistent SQLite tier.
+
+Example:
+    >>> cache = ResponseCache(maxsize=1024, ttl=3600, path="responses.sqlite")
+    >>> model = init_chat_model(provider="Anthropic", response_cache=cache)
+    >>> model.invoke("what is the weather in Paris")      # Paid round trip
+    >>> model.invoke("what is the weather in Paris")      # Served from memory
+    >>> cache.stats()
+
+ResponseCache implements langchain's BaseCache and can also be passed as `cache=` to any chat model,
+that however only covers invoke/batch. CachedChatModel additionally replays cached responses for
+stream/astream as a sequence of chunks.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.load import dumpd, dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+from lctutorial.chat_model_wrapper import DelegatingChatModel
+from lctutorial.chunk_accumulator import ChunkAccumulator
+from lctutorial.text_pieces import split_words
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    sqlite_hits: int = 0
+    evictions: int = 0
+    latency_saved: float = 0.0     # Seconds the original calls of all served hits took
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class _Entry:
+    generations: RETURN_VAL_TYPE
+    expires_at: Optional[float]
+    latency: float
+
+
+def normalize_messages(messages: Sequence[BaseMessage]) -> str:
+    """Serialize messages for a cache key, leaving out what does not change the model input (ids, usage, ...)."""
+    normalized = []
+    for message in messages:
+        update: dict[str, Any] = {"id": None}
+        if isinstance(message, AIMessage):
+            update.update(response_metadata={}, usage_metadata=None)
+        normalized.append(dumpd(message.model_copy(update=update)))
+    return json.dumps(normalized, sort_keys=True)
+
+
+class ResponseCache(BaseCache):
+    """Two tier (memory LRU + optional SQLite) exact-match cache with TTLs and hit/miss statistics.
+
+    Args:
+        maxsize: Number of responses kept in memory.
+        ttl: Seconds a response stays valid, None keeps responses until they are evicted.
+        path: SQLite database file for the persistent tier, None disables it.
+        max_db_bytes: Size budget of the SQLite tier, least recently used responses are evicted first.
+        max_pending: Number of misses whose start time is kept until their response is stored. Misses
+            that never get one (failed calls, abandoned streams) are forgotten oldest first.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, path: Optional[str] = None,
+                 max_db_bytes: Optional[int] = None, max_pending: int = 1024):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_db_bytes = max_db_bytes
+        self.max_pending = max_pending
+        self._memory: OrderedDict[str, _Entry] = OrderedDict()
+        self._pending: OrderedDict[str, float] = OrderedDict()
+        self._stats = CacheStats()
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_bytes = 0
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, last_access REAL NOT NULL, "
+                "size INTEGER NOT NULL, latency REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._db_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry.expires_at, now):
+                self._memory.move_to_end(key)
+                self._stats.memory_hits += 1
+                return self._hit(entry)
+            if entry is not None:
+                del self._memory[key]
+
+            entry = self._db_lookup(key, now)
+            if entry is not None:
+                self._remember(key, entry)
+                self._stats.sqlite_hits += 1
+                return self._hit(entry)
+
+            self._stats.misses += 1
+            self._pending[key] = time.perf_counter()
+            self._pending.move_to_end(key)
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self.make_key(prompt, llm_string)
+        with self._lock:
+            started = self._pending.pop(key, None)
+            latency = time.perf_counter() - started if started is not None else 0.0
+            expires_at = time.time() + self.ttl if self.ttl is not None else None
+            entry = _Entry(list(return_val), expires_at, latency)
+            self._remember(key, entry)
+            self._db_store(key, entry)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._pending.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db_bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return replace(self._stats)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @staticmethod
+    def _expired(expires_at: Optional[float], now: float) -> bool:
+        return expires_at is not None and expires_at <= now
+
+    def _hit(self, entry: _Entry) -> RETURN_VAL_TYPE:
+        self._stats.hits += 1
+        self._stats.latency_saved += entry.latency
+        return entry.generations
+
+    def _remember(self, key: str, entry: _Entry) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self._stats.evictions += 1
+
+    def _db_lookup(self, key: str, now: float) -> Optional[_Entry]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires_at, latency, size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, latency, size = row
+        if self._expired(expires_at, now):
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db_bytes -= size
+            return None
+        self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return _Entry(loads(value), expires_at, latency)
+
+    def _db_store(self, key: str, entry: _Entry) -> None:
+        if self._db is None:
+            return
+        value = dumps(entry.generations)
+        size = len(value)
+        old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access, size, latency) "
+            "VALUES (?, ?, ?, ?, ?, ?)", (key, value, entry.expires_at, time.time(), size, entry.latency))
+        self._db_bytes += size - (old[0] if old else 0)
+        self._db_evict()
+
+    def _db_evict(self) -> None:
+        if self.max_db_bytes is None:
+            return
+        # Expired rows go first, then the least recently used ones
+        now = time.time()
+        for key, size in self._db.execute(
+                "SELECT key, size FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)).fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db_bytes -= size
+        while self._db_bytes > self.max_db_bytes:
+            row = self._db.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._db_bytes -= row[1]
+            self._stats.evictions += 1
+
+
+def replay_chunks(message: AIMessage) -> Iterator[AIMessageChunk]:
+    """Split a complete message into chunks that add up to the same message again."""
+    if isinstance(message.content, str):
+        for piece in split_words(message.content):
+            yield AIMessageChunk(content=piece, id=message.id)
+    elif message.content:
+        yield AIMessageChunk(content=message.content, id=message.id)
+
+    for index, tool_call in enumerate(message.tool_calls):
+        yield AIMessageChunk(content="", id=message.id, tool_call_chunks=[tool_call_chunk(
+            name=tool_call["name"], args=json.dumps(tool_call["args"]), id=tool_call["id"], index=index)])
+
+    yield AIMessageChunk(content="", id=message.id, usage_metadata=message.usage_metadata,
+                         response_metadata=message.response_metadata, chunk_position="last")
+
+
+class CachedChatModel(DelegatingChatModel):
+    """Serves invoke/batch and stream calls of the inner model from a ResponseCache (or any other
+    BaseCache, e.g. lctutorial.semantic_cache.SemanticCache).
+
+    The key covers the normalized messages, bound tools and every call parameter (stop, tool_choice,
+    ...) plus the identifying params (model name, temperature, max tokens, ...) of the inner model.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    response_cache: BaseCache
+    # The wrapper does its own caching, never also consult langchain's global cache
+    cache: Any = False
+
+    def _cache_key(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> Tuple[str, str]:
+        return normalize_messages(messages), self._get_llm_string(stop=stop, **kwargs)
+
+    def _lookup(self, key: Tuple[str, str]) -> Optional[AIMessage]:
+        generations = self.response_cache.lookup(*key)
+        if not generations:
+            return None
+        # Callers (and BaseChatModel, which assigns the run id) modify the returned message
+        return generations[0].message.model_copy(deep=True)
+
+    def _store(self, key: Tuple[str, str], message: AIMessage) -> None:
+        # Without an id every hit gets the id of its own run, like a fresh response would
+        message = message.model_copy(update={"id": None}, deep=True)
+        self.response_cache.update(*key, [ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = self._cache_key(messages, stop, **kwargs)
+        message = self._lookup(key)
+        if message is None:
+            message = self._invoke_inner(messages, stop, **kwargs)
+            self._store(key, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        key = self._cache_key(messages, stop, **kwargs)
+        message = self._lookup(key)
+        if message is None:
+            message = await self._ainvoke_inner(messages, stop, **kwargs)
+            self._store(key, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key = self._cache_key(messages, stop, **kwargs)
+        message = self._lookup(key)
+        if message is not None:
+            for chunk in replay_chunks(message):
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        accumulator = ChunkAccumulator()
+        for generation_chunk in super()._stream(messages, stop, run_manager, **kwargs):
+            accumulator.add(generation_chunk.message)
+            yield generation_chunk
+        if accumulator.chunks:
+            self._store(key, accumulator.to_message())
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key = self._cache_key(messages, stop, **kwargs)
+        message = self._lookup(key)
+        if message is not None:
+            for chunk in replay_chunks(message):
+                yield ChatGenerationChunk(message=chunk)
+            return
+
+        accumulator = ChunkAccumulator()
+        async for generation_chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            accumulator.add(generation_chunk.message)
+            yield generation_chunk
+        if accumulator.chunks:
+            self._store(key, accumulator.to_message())
@@ -0,0 +1,354 @@
+"""
+Latency-aware routing of chat model calls across candidate models (and providers).
+
+RoutingChatModel keeps rolling latency, time to first token and error statistics per candidate and
+sends each call to the best candidate under its policy:
+    - "fastest": lowest median latency (time to first token for streams),
+    - "cheapest": lowest cost among the candidates whose p95 latency meets the SLO, else the fastest,
+    - "weighted": random by weight.
+A failing call fails over to the next candidate. Candidates that fail repeatedly are skipped for a cool
+down period, candidates with a high error rate are only used when the others fail. A small share of
+calls explores the other candidates, so that their statistics stay current.
+
+Example:
+    >>> model = init_routing_model({
+    ...     "gpt-5-nano": {"provider": "OpenAI", "model_name": "gpt-5-nano", "cost": 0.05},
+    ...     "claude-sonnet": {"provider": "Anthropic", "model_name": "claude-sonnet-4-5-20250929", "cost": 3.0},
+    ... }, policy="cheapest", slo=2.0)
+    >>> model.invoke("what's your name")
+    >>> model.router.stats()
+"""
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Literal, Mapping, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from pydantic import ConfigDict, PrivateAttr
+
+from lctutorial.chat_model_wrapper import _INNER_CONFIG
+
+Policy = Literal["fastest", "cheapest", "weighted"]
+
+
+@dataclass
+class RouteCandidate:
+    name: str
+    model: BaseChatModel
+    cost: float = 0.0       # Any unit, e.g. USD per million output tokens, only compared between candidates
+    weight: float = 1.0
+
+
+@dataclass
+class CandidateStats:
+    calls: int
+    errors: int
+    error_rate: float
+    p50_latency: Optional[float]
+    p95_latency: Optional[float]
+    p50_ttft: Optional[float]
+    p95_ttft: Optional[float]
+    available: bool             # False while the circuit is open after consecutive failures
+
+
+def _percentile(values: Sequence[float], share: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+class _Window:
+    """Rolling outcome window of one candidate."""
+
+    def __init__(self, size: int):
+        self.latencies: Deque[float] = deque(maxlen=size)
+        self.ttfts: Deque[float] = deque(maxlen=size)
+        self.outcomes: Deque[bool] = deque(maxlen=size)    # True for an error
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+
+class Router:
+    """Ranks the candidates for each call and learns from the outcomes.
+
+    Args:
+        candidates: The candidate models, in order of preference while there are no statistics.
+        policy: "fastest", "cheapest" or "weighted".
+        slo: Latency objective in seconds for "cheapest", p95 of the latency (time to first token for streams).
+        window: Number of recent calls the statistics of a candidate cover.
+        failure_threshold: Consecutive failures that take a candidate out for `cooldown` seconds.
+        max_error_rate: Candidates above this error rate rank after all others.
+        explore: Share of calls sent to a random other candidate to refresh its statistics.
+    """
+
+    def __init__(self, candidates: Sequence[RouteCandidate], policy: Policy = "fastest", slo: Optional[float] = None,
+                 window: int = 50, failure_threshold: int = 3, cooldown: float = 30.0, max_error_rate: float = 0.2,
+                 min_samples: int = 5, explore: float = 0.05, seed: Optional[int] = None):
+        if not candidates:
+            raise ValueError("A router needs at least one candidate")
+        if policy == "cheapest" and slo is None:
+            raise ValueError('The "cheapest" policy needs an slo')
+        self.candidates = list(candidates)
+        self.policy = policy
+        self.slo = slo
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.explore = explore
+        self._windows = {candidate.name: _Window(window) for candidate in candidates}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _stats(self, name: str, now: float) -> CandidateStats:
+        window = self._windows[name]
+        outcomes = window.outcomes
+        return CandidateStats(
+            calls=window.calls, errors=window.errors,
+            error_rate=sum(outcomes) / len(outcomes) if outcomes else 0.0,
+            p50_latency=_percentile(window.latencies, 0.5), p95_latency=_percentile(window.latencies, 0.95),
+            p50_ttft=_percentile(window.ttfts, 0.5), p95_ttft=_percentile(window.ttfts, 0.95),
+            available=window.open_until <= now)
+
+    def stats(self) -> Dict[str, CandidateStats]:
+        with self._lock:
+            now = time.monotonic()
+            return {name: self._stats(name, now) for name in self._windows}
+
+    def rank(self, streaming: bool = False) -> List[RouteCandidate]:
+        """The candidates in the order they are tried for the next call."""
+        with self._lock:
+            now = time.monotonic()
+            stats = {name: self._stats(name, now) for name in self._windows}
+            explore = self._random.random() < self.explore
+            weighted_pick = self._random.random()
+
+        def speed(candidate: RouteCandidate, share: float) -> Optional[float]:
+            s = stats[candidate.name]
+            invoke, stream = (s.p50_latency, s.p50_ttft) if share == 0.5 else (s.p95_latency, s.p95_ttft)
+            first, second = (stream, invoke) if streaming else (invoke, stream)
+            return first if first is not None else second
+
+        def health(candidate: RouteCandidate) -> int:
+            s = stats[candidate.name]
+            if not s.available:
+                return 2
+            return int(len(self._windows[candidate.name].outcomes) >= self.min_samples
+                       and s.error_rate > self.max_error_rate)
+
+        order = {candidate.name: index for index, candidate in enumerate(self.candidates)}
+        if self.policy == "fastest":
+            # Candidates without samples first, so that every candidate gets measured
+            ranked = sorted(self.candidates, key=lambda c: (speed(c, 0.5) or 0.0, order[c.name]))
+        elif self.policy == "cheapest":
+            def cheapest(candidate: RouteCandidate) -> tuple:
+                p95 = speed(candidate, 0.95)
+                if p95 is None or p95 <= self.slo:
+                    return False, candidate.cost, order[candidate.name]
+                return True, speed(candidate, 0.5), order[candidate.name]
+
+            ranked = sorted(self.candidates, key=cheapest)
+        else:
+            ranked = self._weighted_order(weighted_pick)
+        ranked.sort(key=health)     # Stable, keeps the policy order within each health class
+        if explore and len(ranked) > 1 and health(ranked[1]) == 0:
+            ranked[0], ranked[1] = ranked[1], ranked[0]
+        return ranked
+
+    def _weighted_order(self, pick: float) -> List[RouteCandidate]:
+        remaining = list(self.candidates)
+        ranked = []
+        while remaining:
+            total = sum(candidate.weight for candidate in remaining)
+            threshold, chosen = pick * total, remaining[-1]
+            for candidate in remaining:
+                threshold -= candidate.weight
+                if threshold < 0:
+                    chosen = candidate
+                    break
+            ranked.append(chosen)
+            remaining.remove(chosen)
+        return ranked
+
+    def record(self, name: str, latency: Optional[float] = None, ttft: Optional[float] = None,
+               error: bool = False) -> None:
+        with self._lock:
+            window = self._windows[name]
+            window.calls += 1
+            window.outcomes.append(error)
+            if error:
+                window.errors += 1
+                window.consecutive_failures += 1
+                if window.consecutive_failures >= self.failure_threshold:
+                    window.open_until = time.monotonic() + self.cooldown
+                return
+            window.consecutive_failures = 0
+            window.open_until = 0.0
+            if latency is not None:
+                window.latencies.append(latency)
+            if ttft is not None:
+                window.ttfts.append(ttft)
+
+
+class RoutingChatModel(BaseChatModel):
+    """Chat model that sends every call to a candidate chosen by `router`, with failover."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    router: Router
+    tool_binding: Optional[tuple] = None    # (tools, tool_choice, kwargs) of bind_tools
+
+    _bound: Dict[str, Runnable] = PrivateAttr(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing-chat-model"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"candidates": [c.name for c in self.router.candidates], "policy": self.router.policy}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        # Every candidate formats the tools for its own provider, at call time
+        bound = self.model_copy(update={"tool_binding": (list(tools), tool_choice, kwargs)})
+        bound._bound = {}
+        return bound
+
+    def _runnable(self, candidate: RouteCandidate) -> Runnable:
+        if self.tool_binding is None:
+            return candidate.model
+        bound = self._bound.get(candidate.name)
+        if bound is None:
+            tools, tool_choice, kwargs = self.tool_binding
+            bound = self._bound[candidate.name] = candidate.model.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+        return bound
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        error = None
+        for candidate in self.router.rank():
+            start = time.monotonic()
+            try:
+                message = self._runnable(candidate).invoke(messages, config=_INNER_CONFIG, stop=stop, **kwargs)
+            except Exception as exc:
+                self.router.record(candidate.name, error=True)
+                error = exc
+                continue
+            self.router.record(candidate.name, latency=time.monotonic() - start)
+            message.response_metadata["routed_to"] = candidate.name
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        raise error
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        error = None
+        for candidate in self.router.rank():
+            start = time.monotonic()
+            try:
+                message = await self._runnable(candidate).ainvoke(messages, config=_INNER_CONFIG, stop=stop,
+                                                                  **kwargs)
+            except Exception as exc:
+                self.router.record(candidate.name, error=True)
+                error = exc
+                continue
+            self.router.record(candidate.name, latency=time.monotonic() - start)
+            message.response_metadata["routed_to"] = candidate.name
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        raise error
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        error = None
+        for candidate in self.router.rank(streaming=True):
+            start = time.monotonic()
+            chunks = self._runnable(candidate).stream(messages, config=_INNER_CONFIG, stop=stop, **kwargs)
+            try:
+                # Failover is only possible until the first chunk went out
+                first = next(chunks, None)
+            except Exception as exc:
+                self.router.record(candidate.name, error=True)
+                error = exc
+                continue
+            ttft = time.monotonic() - start
+            try:
+                if first is not None:
+                    yield ChatGenerationChunk(message=first)
+                    for chunk in chunks:
+                        yield ChatGenerationChunk(message=chunk)
+            except Exception:
+                self.router.record(candidate.name, error=True)
+                raise
+            self.router.record(candidate.name, latency=time.monotonic() - start, ttft=ttft)
+            return
+        raise error
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        error = None
+        for candidate in self.router.rank(streaming=True):
+            start = time.monotonic()
+            chunks = self._runnable(candidate).astream(messages, config=_INNER_CONFIG, stop=stop, **kwargs)
+            try:
+                first = await anext(chunks, None)
+            except Exception as exc:
+                self.router.record(candidate.name, error=True)
+                error = exc
+                continue
+            ttft = time.monotonic() - start
+            try:
+                if first is not None:
+                    yield ChatGenerationChunk(message=first)
+                    async for chunk in chunks:
+                        yield ChatGenerationChunk(message=chunk)
+            except Exception:
+                self.router.record(candidate.name, error=True)
+                raise
+            self.router.record(candidate.name, latency=time.monotonic() - start, ttft=ttft)
+            return
+        raise error
+
+
+def init_routing_model(candidates: Mapping[str, Mapping[str, Any]], policy: Policy = "fastest",
+                       **router_kwargs: Any) -> RoutingChatModel:
+    """A RoutingChatModel over models from lctutorial.init_chat_model.
+
+    candidates maps a candidate name to the init_chat_model arguments of its model, plus optional
+    "cost" and "weight". router_kwargs go to Router (slo, window, cooldown, ...).
+    """
+    from lctutorial import init_chat_model
+
+    route_candidates = []
+    for name, spec in candidates.items():
+        spec = dict(spec)
+        cost, weight = spec.pop("cost", 0.0), spec.pop("weight", 1.0)
+        route_candidates.append(RouteCandidate(name=name, model=init_chat_model(**spec), cost=cost, weight=weight))
+    return RoutingChatModel(router=Router(route_candidates, policy=policy, **router_kwargs))
@@ -0,0 +1,326 @@
+"""
+Model-based safety guardrail that checks a response while it streams, instead of after the agent finished.
+
+The after_agent guardrail (see post_hoc_safety_guardrail) asks a safety model for a ResponseSafety
+evaluation once the whole answer exists: a full extra LLM round trip after the generation, and the
+streamed tokens reached the user before it ran. StreamingSafetyGuardrail streams the agent's model and
+holds its chunks back until a check covering them passed. Checks of the text so far run while the
+model keeps generating, every `window` characters (one check in flight at a time), so after the last
+token only the check of the last window is left to wait for.
+
+Example:
+    >>> guardrail = StreamingSafetyGuardrail(LLMSafetyClassifier(init_chat_model(provider="OpenAI")))
+    >>> agent = create_agent(model=model, tools=[get_weather], middleware=[guardrail])
+    >>> for token, metadata in agent.stream({"messages": [...]}, stream_mode="messages"):
+    ...     print(token.text, end="")
+    >>> guardrail.stats.snapshot().mean_added_latency
+
+An unsafe check stops the generation: nothing after the last passed check is delivered, the stream ends
+with the replacement text, and the message in the agent state is rewritten to the replacement (without
+tool calls, so the agent ends). A failing check counts as unsafe. Every guarded message has
+response_metadata["safety"] ("safe" / "unsafe") and ["safety_latency"], the seconds it was held back
+after its generation ended.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional, Union
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ModelRequest, ModelResponse, after_agent
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import BaseModel, ConfigDict, Field
+
+from lctutorial.chat_model_wrapper import _INNER_CONFIG, DelegatingChatModel
+from lctutorial.chunk_accumulator import ChunkAccumulator
+
+SAFETY_PROMPT = "Evaluate this AI response as generally safe or unsafe."
+REFUSAL = "I cannot provide that response. Please rephrase your request."
+
+Verdict = Literal["safe", "unsafe"]
+_Pending = Union[Future, asyncio.Future]
+
+
+class ResponseSafety(BaseModel):
+    """Evaluate a response as safe or unsafe."""
+    evaluation: Literal["safe", "unsafe"]
+
+
+class LLMSafetyClassifier:
+    """Asks a chat model for a ResponseSafety evaluation of a response text.
+
+    Answers without a ResponseSafety call count as unsafe.
+    """
+
+    def __init__(self, model: BaseChatModel, prompt: str = SAFETY_PROMPT):
+        self.model = model
+        self.prompt = prompt
+        self._bound = model.bind_tools([ResponseSafety], tool_choice="any")
+
+    def _messages(self, text: str) -> List[Dict[str, str]]:
+        return [{"role": "system", "content": self.prompt}, {"role": "user", "content": f"AI response: {text}"}]
+
+    @staticmethod
+    def _verdict(message: AIMessage) -> Verdict:
+        for tool_call in message.tool_calls:
+            if tool_call["name"] == ResponseSafety.__name__:
+                return "safe" if tool_call["args"].get("evaluation") == "safe" else "unsafe"
+        return "unsafe"
+
+    def classify(self, text: str) -> Verdict:
+        # Without the caller's callbacks, the evaluation doesn't show up in the agent's "messages" stream
+        return self._verdict(self._bound.invoke(self._messages(text), config=_INNER_CONFIG))
+
+    async def aclassify(self, text: str) -> Verdict:
+        return self._verdict(await self._bound.ainvoke(self._messages(text), config=_INNER_CONFIG))
+
+
+@dataclass
+class GuardrailStats:
+    responses: int = 0
+    checks: int = 0
+    blocked: int = 0
+    added_latency: float = 0.0          # Seconds the responses were held back after their generation ended
+    max_added_latency: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def mean_added_latency(self) -> float:
+        return self.added_latency / self.responses if self.responses else 0.0
+
+    def record(self, checks: int, blocked: bool, added_latency: float) -> None:
+        with self._lock:
+            self.responses += 1
+            self.checks += checks
+            self.blocked += blocked
+            self.added_latency += added_latency
+            self.max_added_latency = max(self.max_added_latency, added_latency)
+
+    def snapshot(self) -> "GuardrailStats":
+        with self._lock:
+            return replace(self, _lock=threading.Lock())
+
+
+class _GuardedStream:
+    """The chunks of one response, held back until a check covering them passed."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.held: List[AIMessageChunk] = []
+        self.text = ""
+        self.checked = 0                                    # Characters of text covered by the checks
+        self.check: Optional[tuple[int, _Pending]] = None   # Held chunks covered by the check in flight
+        self.checks = 0
+        self.verdict: Verdict = "safe"
+
+    def add(self, chunk: AIMessageChunk) -> None:
+        self.held.append(chunk)
+        self.text += chunk.text
+
+    def due(self) -> bool:
+        return self.check is None and len(self.text) - self.checked >= self.window
+
+    @property
+    def unchecked(self) -> bool:
+        return len(self.text) > self.checked
+
+    def submit(self, pending: _Pending) -> None:
+        self.check = len(self.held), pending
+        self.checked = len(self.text)
+        self.checks += 1
+
+    def settle(self, verdict: Verdict) -> List[AIMessageChunk]:
+        """The chunks the check in flight released, none if it failed."""
+        covered, _ = self.check
+        self.check = None
+        if verdict != "safe":
+            self.verdict = "unsafe"
+            self.held = []
+            return []
+        released, self.held = self.held[:covered], self.held[covered:]
+        return released
+
+
+def _result(pending: Future) -> Verdict:
+    try:
+        return pending.result()
+    except Exception:
+        return "unsafe"
+
+
+class SafetyGuardedChatModel(DelegatingChatModel):
+    """Streams the inner model, releasing chunks once a concurrent safety check of the text passed."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    classifier: Any
+    window: int = 200
+    replacement: str = REFUSAL
+    stats: GuardrailStats = Field(default_factory=GuardrailStats)
+
+    def _closing(self, stream: _GuardedStream, added_latency: float) -> ChatGenerationChunk:
+        self.stats.record(stream.checks, stream.verdict == "unsafe", added_latency)
+        metadata = {"safety": stream.verdict, "safety_latency": added_latency}
+        content = self.replacement if stream.verdict == "unsafe" else ""
+        return ChatGenerationChunk(message=AIMessageChunk(content=content, response_metadata=metadata))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        accumulator = ChunkAccumulator()
+        for generation_chunk in self._stream(messages, stop, run_manager, **kwargs):
+            accumulator.add(generation_chunk.message)
+        return ChatResult(generations=[ChatGeneration(message=accumulator.to_message())])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        accumulator = ChunkAccumulator()
+        async for generation_chunk in self._astream(messages, stop, run_manager, **kwargs):
+            accumulator.add(generation_chunk.message)
+        return ChatResult(generations=[ChatGeneration(message=accumulator.to_message())])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        stream = _GuardedStream(self.window)
+        chunks = self.inner.stream(messages, config=_INNER_CONFIG, stop=stop, **kwargs)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="safety-guardrail")
+        try:
+            for chunk in chunks:
+                stream.add(chunk)
+                if stream.check is not None and stream.check[1].done():
+                    for released in stream.settle(_result(stream.check[1])):
+                        yield ChatGenerationChunk(message=released)
+                    if stream.verdict == "unsafe":
+                        break
+                if stream.due():
+                    stream.submit(executor.submit(self.classifier.classify, stream.text))
+
+            generated = time.perf_counter()
+            if stream.verdict == "safe" and stream.check is not None:
+                for released in stream.settle(_result(stream.check[1])):
+                    yield ChatGenerationChunk(message=released)
+            if stream.verdict == "safe" and stream.unchecked:
+                stream.submit(executor.submit(self.classifier.classify, stream.text))
+                for released in stream.settle(_result(stream.check[1])):
+                    yield ChatGenerationChunk(message=released)
+            # Chunks after the last check without text, e.g. tool call chunks
+            for released in stream.held:
+                yield ChatGenerationChunk(message=released)
+            yield self._closing(stream, time.perf_counter() - generated)
+        finally:
+            chunks.close()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        stream = _GuardedStream(self.window)
+        chunks = self.inner.astream(messages, config=_INNER_CONFIG, stop=stop, **kwargs)
+
+        async def settle() -> List[AIMessageChunk]:
+            try:
+                verdict = await stream.check[1]
+            except Exception:
+                verdict = "unsafe"
+            return stream.settle(verdict)
+
+        try:
+            async for chunk in chunks:
+                stream.add(chunk)
+                if stream.check is not None and stream.check[1].done():
+                    for released in await settle():
+                        yield ChatGenerationChunk(message=released)
+                    if stream.verdict == "unsafe":
+                        break
+                if stream.due():
+                    stream.submit(asyncio.ensure_future(self.classifier.aclassify(stream.text)))
+
+            generated = time.perf_counter()
+            if stream.verdict == "safe" and stream.check is not None:
+                for released in await settle():
+                    yield ChatGenerationChunk(message=released)
+            if stream.verdict == "safe" and stream.unchecked:
+                stream.submit(asyncio.ensure_future(self.classifier.aclassify(stream.text)))
+                for released in await settle():
+                    yield ChatGenerationChunk(message=released)
+            for released in stream.held:
+                yield ChatGenerationChunk(message=released)
+            yield self._closing(stream, time.perf_counter() - generated)
+        finally:
+            await chunks.aclose()
+            if stream.check is not None:
+                stream.check[1].cancel()
+
+
+class StreamingSafetyGuardrail(AgentMiddleware):
+    """Checks every model response of the agent while it streams, see SafetyGuardedChatModel.
+
+    Args:
+        classifier: Has classify(text) and aclassify(text) returning "safe" or "unsafe",
+            e.g. an LLMSafetyClassifier, or a PrefilteredSafetyClassifier deciding clear cases locally.
+        window: Characters generated between two checks.
+        replacement: Text of a blocked response.
+    """
+
+    def __init__(self, classifier: Any, window: int = 200, replacement: str = REFUSAL):
+        super().__init__()
+        self.classifier = classifier
+        self.window = window
+        self.replacement = replacement
+        self.stats = GuardrailStats()
+
+    def _guarded(self, request: ModelRequest) -> ModelRequest:
+        return request.override(model=SafetyGuardedChatModel(inner=request.model, classifier=self.classifier,
+                                                              window=self.window, replacement=self.replacement,
+                                                              stats=self.stats))
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]):
+        return handler(self._guarded(request))
+
+    async def awrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], Any]):
+        return await handler(self._guarded(request))
+
+    def after_model(self, state: AgentState, runtime: Any) -> Optional[Dict[str, Any]]:
+        message = state["messages"][-1] if state["messages"] else None
+        if not isinstance(message, AIMessage) or message.response_metadata.get("safety") != "unsafe":
+            return None
+        # Same id: replaces the blocked message, whose tool calls (if any) must not run
+        return {"messages": [AIMessage(content=self.replacement, id=message.id,
+                                       response_metadata=message.response_metadata)]}
+
+
+def post_hoc_safety_guardrail(classifier: Any, replacement: str = REFUSAL):
+    """The after_agent guardrail of the LangChain docs: checks the final answer once the agent finished."""
+
+    @after_agent(can_jump_to=["end"])
+    def safety_guardrail(state: AgentState, runtime: Any) -> Optional[Dict[str, Any]]:
+        if not state["messages"] or not isinstance(state["messages"][-1], AIMessage):
+            return None
+        last_message = state["messages"][-1]
+        if classifier.classify(last_message.text) == "unsafe":
+            last_message.content = replacement
+        return None
+
+    return safety_guardrail
@@ -0,0 +1,276 @@
+"""
+Local pre-classifier in front of the LLM safety evaluation: only ambiguous responses go to the model.
+
+Most agent answers ("It's always sunny in Boston!") are trivially safe, yet the safety guardrail spends
+an LLM call on each of them. SafetyPrefilter scores a response with the weights of the risk terms it
+contains, found in a single pass by an Aho-Corasick automaton (tens of microseconds for a typical
+answer), and decides "safe", "unsafe" (a clearly harmful phrase) or "uncertain".
+PrefilteredSafetyClassifier asks the LLM classifier only about the uncertain ones.
+
+A list of terms can't recognize harm that is worded differently, so "safe" is conservative: no risk to
+speak of, and at most `max_safe_length` characters of the response outside the `allow` patterns, the known
+benign shapes of your answers. Anything longer goes to the LLM.
+
+Example:
+    >>> prefilter = SafetyPrefilter(allow=[r"It's always sunny in [A-Z][\\w ]*!"])
+    >>> classifier = PrefilteredSafetyClassifier(prefilter, LLMSafetyClassifier(safety_model), shadow_rate=0.05)
+    >>> agent = create_agent(model=model, tools=[get_weather], middleware=[StreamingSafetyGuardrail(classifier)])
+    >>> classifier.stats().skip_rate, classifier.stats().disagreement_rate
+
+A sample (`shadow_rate`) of the local decisions is also evaluated by the LLM, in the background, to
+measure how often the two disagree. The default terms are a starting point, tune them (and the
+thresholds) on your traffic using these numbers.
+"""
+import asyncio
+import random
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Mapping, Optional, Set, Tuple
+
+Decision = Literal["safe", "unsafe", "uncertain"]
+
+# Phrases that are harmful on their own weigh 1 or more, terms that are only suspicious less: they add up
+# to keep a response from being "safe", never to make it "unsafe". A term ending in * also matches the
+# words starting with it ("bomb*": bombs, bombing)
+DEFAULT_TERMS: Dict[str, float] = {
+    "build a bomb": 1.0, "make a bomb": 1.0, "pipe bomb*": 1.0, "nerve agent*": 1.0, "synthesize meth": 1.0,
+    "cook meth": 1.0, "make ricin": 1.0, "bioweapon*": 1.0, "kill yourself": 1.0, "write ransomware": 1.0,
+    "untraceable gun*": 1.0, "ghost gun*": 1.0, "launder money": 1.0, "money launder*": 1.0, "child sexual": 1.0,
+    "bomb*": 0.5, "explosive*": 0.5, "detonat*": 0.5, "weapon*": 0.4, "firearm*": 0.4, "ammunition": 0.4,
+    "kill*": 0.4, "murder*": 0.5, "suicid*": 0.5, "self-harm*": 0.5, "overdos*": 0.4, "poison*": 0.4,
+    "ricin": 0.6, "sarin": 0.6, "anthrax": 0.6, "meth": 0.4, "methamphetamine": 0.4, "cocaine": 0.4,
+    "heroin": 0.4, "malware": 0.4, "ransomware": 0.5, "keylog*": 0.5, "phishing": 0.4, "exploit*": 0.3,
+    "hack*": 0.3, "password*": 0.2, "credit card*": 0.2, "steal*": 0.3, "stole*": 0.3, "fraud*": 0.3,
+    "counterfeit*": 0.4, "kidnap*": 0.5, "hostage*": 0.4, "terroris*": 0.5, "attack*": 0.2, "gun*": 0.3,
+    "drug*": 0.3, "abus*": 0.3, "hurt*": 0.3, "harm*": 0.3, "injur*": 0.3, "toxic*": 0.3, "lethal*": 0.4,
+    "bleach": 0.2, "ammonia": 0.2, "chlorine": 0.2,
+}
+
+
+class AhoCorasick:
+    """Finds all occurrences of a set of patterns in one pass over a text, however many patterns."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = list(patterns)
+        # Trie transitions, failure links and the patterns ending in each state (via failure links too)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                following = self._goto[state].get(char)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[state][char] = following
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = following
+            self._out[state] += (index,)
+
+        # Transitions of the automaton as a DFA: the failure links are followed once here, not per character
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [{} for _ in self._goto[1:]]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[following] = self._goto[fail].get(char, 0)
+                self._out[following] += self._out[self._fail[following]]
+            # Breadth first, the shallower failure state is complete already
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(start, pattern index) of every occurrence, by end position."""
+        delta, out, patterns = self._delta, self._out, self.patterns
+        state = 0
+        for position, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if out[state]:
+                for index in out[state]:
+                    yield position - len(patterns[index]) + 1, index
+
+
+class SafetyPrefilter:
+    """Decides on a response locally from the weights of the risk terms it contains.
+
+    A term counts once and starts a word ("skill" doesn't contain "kill"). It matches as a whole word,
+    or as a prefix when it ends in *. Matching is case insensitive. Responses containing a term that weighs
+    at least `unsafe_at` on its own are unsafe, weaker terms adding up to it are left to the LLM.
+    Responses scoring below `safe_below` are safe if at most `max_safe_length` characters (whitespace
+    aside) are not covered by the `allow` regular expressions. The rest is uncertain.
+    """
+
+    def __init__(self, terms: Optional[Mapping[str, float]] = None, safe_below: float = 0.3,
+                 unsafe_at: float = 1.0, max_safe_length: Optional[int] = 40, allow: Iterable[str] = ()):
+        self.terms = dict(DEFAULT_TERMS if terms is None else terms)
+        self.safe_below = safe_below
+        self.unsafe_at = unsafe_at
+        self.max_safe_length = max_safe_length
+        self.allow = [re.compile(pattern) for pattern in allow]
+        self._names = list(self.terms)
+        self._prefix = [term.endswith("*") for term in self._names]
+        self._matcher = AhoCorasick(term.rstrip("*").lower() for term in self._names)
+
+    def matches(self, text: str) -> Set[str]:
+        """The terms occurring in text."""
+        text = text.lower()
+        found = set()
+        for start, index in self._matcher.finditer(text):
+            end = start + len(self._matcher.patterns[index])
+            if (start == 0 or not text[start - 1].isalnum()) and \
+                    (self._prefix[index] or end == len(text) or not text[end].isalnum()):
+                found.add(index)
+        return {self._names[index] for index in found}
+
+    def score(self, text: str) -> float:
+        return sum(self.terms[term] for term in self.matches(text))
+
+    def uncovered(self, text: str) -> int:
+        """Characters of text, whitespace aside, not covered by an allow pattern."""
+        for pattern in self.allow:
+            text = pattern.sub(" ", text)
+        return len("".join(text.split()))
+
+    def decide(self, text: str) -> Decision:
+        weights = [self.terms[term] for term in self.matches(text)]
+        if max(weights, default=0.0) >= self.unsafe_at:
+            return "unsafe"
+        score = sum(weights)
+        if score < self.safe_below and (self.max_safe_length is None or self.uncovered(text) <= self.max_safe_length):
+            return "safe"
+        return "uncertain"
+
+
+@dataclass
+class PrefilterStats:
+    checks: int = 0
+    safe: int = 0               # Decided locally
+    unsafe: int = 0             # Decided locally
+    uncertain: int = 0          # Evaluated by the LLM
+    shadowed: int = 0           # Local decisions also evaluated by the LLM
+    disagreements: int = 0
+    false_safe: int = 0         # Shadowed local "safe" decisions the LLM evaluated as unsafe
+    shadow_errors: int = 0
+
+    @property
+    def skip_rate(self) -> float:
+        """Share of the checks that didn't need the LLM."""
+        return (self.safe + self.unsafe) / self.checks if self.checks else 0.0
+
+    @property
+    def disagreement_rate(self) -> float:
+        return self.disagreements / self.shadowed if self.shadowed else 0.0
+
+
+class PrefilteredSafetyClassifier:
+    """Safety classifier (classify / aclassify, like LLMSafetyClassifier) asking `classifier` only
+    about the responses `prefilter` is uncertain about.
+
+    Args:
+        prefilter: The local stage, e.g. a SafetyPrefilter.
+        classifier: The LLM stage, e.g. an LLMSafetyClassifier.
+        shadow_rate: Share of the local decisions also sent to the LLM stage, in the background, to
+            count disagreements. 0 disables shadowing.
+        seed: Seed of the shadow sampling.
+    """
+
+    def __init__(self, prefilter: SafetyPrefilter, classifier: Any, shadow_rate: float = 0.0,
+                 seed: Optional[int] = None, max_shadow_workers: int = 2):
+        self.prefilter = prefilter
+        self.classifier = classifier
+        self.shadow_rate = shadow_rate
+        self.max_shadow_workers = max_shadow_workers
+        self._random = random.Random(seed)
+        self._stats = PrefilterStats()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._shadows: Set[Future] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _decide(self, text: str) -> Tuple[Decision, bool]:
+        """The local decision, and whether to shadow it."""
+        decision = self.prefilter.decide(text)
+        with self._lock:
+            self._stats.checks += 1
+            setattr(self._stats, decision, getattr(self._stats, decision) + 1)
+            shadow = decision != "uncertain" and self.shadow_rate > 0 and self._random.random() < self.shadow_rate
+        return decision, shadow
+
+    def _compare(self, decision: Decision, verdict: Optional[str]) -> None:
+        with self._lock:
+            if verdict is None:
+                self._stats.shadow_errors += 1
+                return
+            self._stats.shadowed += 1
+            if verdict != decision:
+                self._stats.disagreements += 1
+                self._stats.false_safe += decision == "safe"
+
+    def _shadow(self, text: str, decision: Decision) -> None:
+        try:
+            verdict = self.classifier.classify(text)
+        except Exception:
+            verdict = None
+        self._compare(decision, verdict)
+
+    async def _ashadow(self, text: str, decision: Decision) -> None:
+        try:
+            verdict = await self.classifier.aclassify(text)
+        except Exception:
+            verdict = None
+        self._compare(decision, verdict)
+
+    def _forget(self, future: Future) -> None:
+        with self._lock:
+            self._shadows.discard(future)
+
+    def classify(self, text: str) -> str:
+        decision, shadow = self._decide(text)
+        if decision == "uncertain":
+            return self.classifier.classify(text)
+        if shadow:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_shadow_workers, thread_name_prefix="safety-shadow")
+                future = self._executor.submit(self._shadow, text, decision)
+                self._shadows.add(future)
+            future.add_done_callback(self._forget)
+        return decision
+
+    async def aclassify(self, text: str) -> str:
+        decision, shadow = self._decide(text)
+        if decision == "uncertain":
+            return await self.classifier.aclassify(text)
+        if shadow:
+            task = asyncio.ensure_future(self._ashadow(text, decision))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return decision
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait for the shadow evaluations started by classify."""
+        with self._lock:
+            shadows = list(self._shadows)
+        wait(shadows, timeout=timeout)
+
+    async def aflush(self) -> None:
+        """Wait for the shadow evaluations started by aclassify in the running loop."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> PrefilterStats:
+        with self._lock:
+            return replace(self._stats)
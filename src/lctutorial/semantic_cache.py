@@ -0,0 +1,269 @@
+"""
+Semantic response cache, answers prompts that only differ in wording from a cached one.
+
+Prompts are embedded locally with a hashing vectorizer over words and character n-grams, no embedding
+service is called. Lookups are a single matrix-vector product over a float32 matrix of all cached
+prompts, a response is served when the cosine similarity reaches the threshold.
+
+Example:
+    >>> cache = SemanticCache(threshold=0.8, capacity=100_000, path="semantic-cache")
+    >>> model = init_chat_model(provider="Anthropic", response_cache=cache)
+    >>> model.invoke("What is the weather in San Francisco?")     # Paid round trip
+    >>> model.invoke("what's the weather in San Francisco")       # Served from the cache
+    >>> cache.flush()
+
+Only the last user message is compared by similarity, the rest of the conversation, the bound tools and
+the model parameters have to match exactly, and so do the numbers in the message ("convert 10 USD to
+EUR" never gets the answer for 100 USD, however similar the wording).
+Needs numpy: pip install "langchain-tutorial[semantic-cache]".
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from dataclasses import dataclass, replace
+from typing import Any, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover
+    raise ImportError(
+        'lctutorial.semantic_cache needs numpy, install it with: pip install "langchain-tutorial[semantic-cache]"'
+    ) from e
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+_TOKENS = re.compile(r"\w+")
+_NUMBERS = re.compile(r"\d+(?:[.,]\d+)*")
+_STOP_WORDS = frozenset(
+    "a an and are can could do does for how i in is it me of on please tell the to what what's whats "
+    "will would you".split())
+
+
+class HashingVectorizer:
+    """Maps text to an L2 normalized float32 vector of hashed word and character n-gram counts.
+
+    Word features catch reordered phrasings, character trigrams catch inflections and typos
+    ("forecast"/"forecasts", "weahter"). Common question words are left out so they do not make
+    every question look alike.
+    """
+
+    def __init__(self, dim: int = 256, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    def features(self, text: str) -> List[str]:
+        words = [word for word in _TOKENS.findall(text.lower()) if word not in _STOP_WORDS]
+        features = [f"w:{word}" for word in words]
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + self.ngram] for i in range(max(len(padded) - self.ngram + 1, 1)))
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self.features(text):
+            hashed = zlib.crc32(feature.encode())
+            # The sign bit keeps colliding features from only ever adding up
+            vector[hashed % self.dim] += 1.0 if hashed & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def transform_many(self, texts: Iterable[str]) -> np.ndarray:
+        vectors = [self.transform(text) for text in texts]
+        return np.stack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+
+
+@dataclass
+class SemanticCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    similarity: float = 0.0     # Summed similarity of all hits, see mean_similarity
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def mean_similarity(self) -> float:
+        return self.similarity / self.hits if self.hits else 0.0
+
+
+def split_prompt(prompt: str) -> Tuple[str, str]:
+    """Split a cache prompt into (context, query): the serialized conversation up to the last user message
+    and that message's text. Prompts that are not serialized messages are a query without context."""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return "", prompt
+    if not isinstance(messages, list):
+        return "", prompt
+
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if isinstance(message, dict) and message.get("id", [""])[-1] in ("HumanMessage", "HumanMessageChunk"):
+            content = message.get("kwargs", {}).get("content", "")
+            if isinstance(content, list):
+                content = " ".join(block.get("text", "") if isinstance(block, dict) else str(block)
+                                   for block in content)
+            context = messages[:index] + messages[index + 1:]
+            return json.dumps(context, sort_keys=True), content
+    return prompt, ""
+
+
+class SemanticCache(BaseCache):
+    """Similarity based cache with capacity bounded LRU eviction and optional memory-mapped persistence.
+
+    Args:
+        threshold: Minimum cosine similarity (0..1) between two queries to serve the cached response.
+        capacity: Maximum number of cached responses, the least recently used one is replaced when full.
+        dim: Vector dimension, 256 dims take 1 KiB per entry.
+        path: Directory for the persistent cache, None keeps it in memory only. A saved cache is memory
+            mapped when opened, changes are written by flush() and close().
+        vectorizer: Text embedding, defaults to a HashingVectorizer of the given dim.
+    """
+
+    def __init__(self, threshold: float = 0.85, capacity: int = 10_000, dim: int = 256,
+                 path: Optional[str] = None, vectorizer: Optional[HashingVectorizer] = None):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.vectorizer = vectorizer or HashingVectorizer(dim)
+        self.dim = self.vectorizer.dim
+        self.path = path
+        self._lock = threading.RLock()
+        self._stats = SemanticCacheStats()
+        self._clock = 0
+        self._size = 0
+        self._entries: List[Optional[str]] = [None] * capacity
+        self._open(path)
+
+    @staticmethod
+    def context_key(context: str, llm_string: str) -> int:
+        digest = hashlib.blake2b(f"{llm_string}\0{context}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little", signed=True)
+
+    def search(self, query: np.ndarray, context: int) -> Tuple[int, float]:
+        """Index and similarity of the cached query most similar to `query` within a context, (-1, 0.0) if none."""
+        size = self._size
+        if not size:
+            return -1, 0.0
+        similarities = self._vectors[:size] @ query
+        similarities[self._contexts[:size] != context] = -1.0
+        index = int(np.argmax(similarities))
+        similarity = float(similarities[index])
+        return (index, similarity) if similarity >= 0 else (-1, 0.0)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        context, query = self._embed(prompt)
+        with self._lock:
+            index, similarity = self.search(query, self.context_key(context, llm_string))
+            if index < 0 or similarity < self.threshold:
+                self._stats.misses += 1
+                return None
+            self._touch(index)
+            self._stats.hits += 1
+            self._stats.similarity += similarity
+            return loads(self._entries[index])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        context, query = self._embed(prompt)
+        value = dumps(list(return_val))
+        with self._lock:
+            key = self.context_key(context, llm_string)
+            index, similarity = self.search(query, key)
+            if index < 0 or similarity < 1.0 - 1e-6:
+                index = self._free_slot()
+            self._vectors[index] = query
+            self._contexts[index] = key
+            self._entries[index] = value
+            self._touch(index)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._size = 0
+            self._clock = 0
+            self._entries = [None] * self.capacity
+            self._contexts[:] = 0
+            self._last_used[:] = 0
+
+    def stats(self) -> SemanticCacheStats:
+        with self._lock:
+            return replace(self._stats)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def flush(self) -> None:
+        """Write the cache to `path`, a no-op for in-memory caches."""
+        if self.path is None:
+            return
+        with self._lock:
+            # Every file is replaced as a whole, the responses last, so readers never see a half written cache
+            for name, array in self._arrays().items():
+                file = os.path.join(self.path, f"{name}.npy")
+                with open(file + ".tmp", "wb") as f:
+                    np.save(f, array)
+                os.replace(file + ".tmp", file)
+            entries_path = os.path.join(self.path, "entries.json")
+            with open(entries_path + ".tmp", "w") as f:
+                json.dump({"size": self._size, "clock": self._clock, "entries": self._entries[:self._size]}, f)
+            os.replace(entries_path + ".tmp", entries_path)
+
+    def close(self) -> None:
+        self.flush()
+
+    def _embed(self, prompt: str) -> Tuple[str, np.ndarray]:
+        context, text = split_prompt(prompt)
+        numbers = _NUMBERS.findall(text)
+        if numbers:
+            # Numbers barely move the similarity but change the answer, they are part of the exact match
+            context = f"{context}\0{' '.join(numbers)}"
+        query = self.vectorizer.transform(text)
+        if not query.any():
+            # Nothing to compare (no user message, only stop words), such prompts only match exactly
+            context, query = prompt, np.eye(1, self.dim, dtype=np.float32)[0]
+        return context, query
+
+    def _touch(self, index: int) -> None:
+        self._clock += 1
+        self._last_used[index] = self._clock
+
+    def _free_slot(self) -> int:
+        if self._size < self.capacity:
+            self._size += 1
+            return self._size - 1
+        self._stats.evictions += 1
+        return int(np.argmin(self._last_used))
+
+    def _arrays(self) -> dict[str, np.ndarray]:
+        return {"vectors": self._vectors, "contexts": self._contexts, "last_used": self._last_used}
+
+    def _open(self, path: Optional[str]) -> None:
+        self._vectors = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        self._contexts = np.zeros(self.capacity, dtype=np.int64)
+        self._last_used = np.zeros(self.capacity, dtype=np.int64)
+        if path is None:
+            return
+        os.makedirs(path, exist_ok=True)
+        entries_path = os.path.join(path, "entries.json")
+        if not os.path.exists(entries_path):
+            return
+
+        loaded = {}
+        for name, empty in self._arrays().items():
+            file = os.path.join(path, f"{name}.npy")
+            # Copy-on-write mapping: pages are read lazily and changes only reach the file through flush()
+            array = np.load(file, mmap_mode="c")
+            if array.shape != empty.shape:
+                raise ValueError(f"{file} has shape {array.shape}, the cache is configured for {empty.shape}")
+            loaded[name] = array
+        self._vectors, self._contexts, self._last_used = loaded["vectors"], loaded["contexts"], loaded["last_used"]
+        with open(entries_path) as f:
+            saved = json.load(f)
+        self._size, self._clock = saved["size"], saved["clock"]
+        self._entries[:self._size] = saved["entries"]
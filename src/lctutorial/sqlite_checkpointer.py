@@ -0,0 +1,339 @@
+"""
+Persistent LangGraph checkpointer in SQLite (WAL mode) that stores growing message lists as deltas.
+
+InMemorySaver keeps paused threads (human in the loop interrupts) in process memory only, and every
+checkpoint stores the whole value of each changed channel, i.e. the complete message history again per
+step. SqliteDeltaSaver stores a list channel that only grew (the messages of an agent) as the appended
+items, referencing the version it extends, with a full snapshot after every `snapshot_every` deltas.
+Payloads are zlib compressed.
+
+Example:
+    >>> with SqliteDeltaSaver("checkpoints.db") as checkpointer:
+    ...     agent = create_hitl_agent(model, checkpointer=checkpointer)
+    ...     agent.invoke({"messages": [...]}, {"configurable": {"thread_id": "some_id"}})
+    ... # After a restart
+    >>> agent = create_hitl_agent(model, checkpointer=SqliteDeltaSaver("checkpoints.db"))
+    >>> agent.invoke(Command(resume={"decisions": [{"type": "approve"}]}), {"configurable": {"thread_id": "some_id"}})
+
+Loading a checkpoint reads its snapshot and at most `snapshot_every` deltas instead of one full copy per
+step. The last value of each channel stays in memory (`cache_size` channels), so a thread that keeps
+running in the same process is loaded, and its next delta found, without reading the history at all.
+Cached values are shared with the graph like the state within a run is, they must not be mutated in place.
+"""
+import asyncio
+import random
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL,
+    kind TEXT NOT NULL, base_version TEXT, chain INTEGER NOT NULL, type TEXT, data BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version));
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT, data BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));
+"""
+
+# Blob kinds: the whole value, the items appended to the value of base_version, or no value
+_FULL, _DELTA, _EMPTY = "full", "delta", "empty"
+_MISSING = object()
+
+
+@dataclass
+class StorageStats:
+    checkpoints: int
+    snapshots: int              # Channel values stored whole
+    deltas: int                 # Channel values stored as appended items
+    bytes: int                  # Compressed payload bytes of checkpoints, channel values and writes
+
+
+class SqliteDeltaSaver(BaseCheckpointSaver[str]):
+    """Checkpointer storing checkpoints in a SQLite database file, list channels as deltas.
+
+    Args:
+        path: Database file, ":memory:" for a database that lives as long as the saver.
+        snapshot_every: Deltas after which a list channel is stored whole again, bounds the reads per load.
+        compression_level: zlib level of the payloads.
+        cache_size: Number of channels whose last value is kept in memory.
+    """
+
+    def __init__(self, path: str, *, serde: Optional[SerializerProtocol] = None, snapshot_every: int = 32,
+                 compression_level: int = 1, cache_size: int = 1024):
+        super().__init__(serde=serde)
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.compression_level = compression_level
+        self.cache_size = cache_size
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        # (thread_id, checkpoint_ns, channel) -> (version, value, chain) of the last written / loaded value
+        self._latest: OrderedDict[Tuple[str, str, str], Tuple[str, Any, int]] = OrderedDict()
+
+    def __enter__(self) -> "SqliteDeltaSaver":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    # Payloads
+
+    def _dumps(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        return type_, zlib.compress(data, self.compression_level)
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        return self.serde.loads_typed((type_, zlib.decompress(data)))
+
+    # Channel values
+
+    def _remember(self, key: Tuple[str, str, str], version: str, value: Any, chain: int) -> None:
+        self._latest[key] = version, list(value) if isinstance(value, list) else value, chain
+        self._latest.move_to_end(key)
+        while len(self._latest) > self.cache_size:
+            self._latest.popitem(last=False)
+
+    def _blob_row(self, thread_id: str, checkpoint_ns: str, channel: str, version: Any, value: Any) -> tuple:
+        """The blobs row of a channel value, a delta if it extends the last value of the channel."""
+        version = str(version)
+        if value is _MISSING:
+            return thread_id, checkpoint_ns, channel, version, _EMPTY, None, 0, None, None
+        if isinstance(value, list):
+            base = self._latest.get((thread_id, checkpoint_ns, channel))
+            if base is not None and isinstance(base[1], list) and base[2] < self.snapshot_every:
+                base_version, base_value, chain = base
+                if len(value) >= len(base_value) and all(
+                        new is old or new == old for new, old in zip(value, base_value)):
+                    return (thread_id, checkpoint_ns, channel, version, _DELTA, base_version, chain + 1,
+                            *self._dumps(value[len(base_value):]))
+        return thread_id, checkpoint_ns, channel, version, _FULL, None, 0, *self._dumps(value)
+
+    def _load_value(self, thread_id: str, checkpoint_ns: str, channel: str, version: Any) -> Any:
+        key = (thread_id, checkpoint_ns, channel)
+        version = str(version)
+        cached = self._latest.get(key)
+        if cached is not None and cached[0] == version:
+            self._latest.move_to_end(key)
+            return list(cached[1]) if isinstance(cached[1], list) else cached[1]
+
+        # Walk back from the delta to the snapshot it extends
+        rows = []
+        current = version
+        while True:
+            row = self._connection.execute(
+                "SELECT kind, base_version, chain, type, data FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version = ?", (thread_id, checkpoint_ns, channel, current)).fetchone()
+            if row is None or row[0] == _EMPTY:
+                return _MISSING
+            rows.append(row)
+            if row[0] == _FULL:
+                break
+            current = row[1]
+        value = self._loads(*rows[-1][3:])
+        for row in reversed(rows[:-1]):
+            value = value + self._loads(*row[3:])
+        self._remember(key, version, value, rows[0][2])
+        return value
+
+    # Checkpoints
+
+    def _tuple(self, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, data, metadata_type, metadata = row
+        checkpoint: Checkpoint = self._loads(type_, data)
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            value = self._load_value(thread_id, checkpoint_ns, channel, version)
+            if value is not _MISSING:
+                channel_values[channel] = value
+        writes = self._connection.execute(
+            "SELECT task_id, channel, type, data FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id = ? ORDER BY rowid", (thread_id, checkpoint_ns, checkpoint_id)).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self._loads(metadata_type, metadata),
+            parent_config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                            "checkpoint_id": parent_checkpoint_id}}
+            if parent_checkpoint_id else None,
+            pending_writes=[(task_id, channel, self._loads(type_, data)) for task_id, channel, type_, data in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        parameters = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            parameters.append(checkpoint_id)
+        with self._lock:
+            row = self._connection.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", parameters).fetchone()
+            return None if row is None else self._tuple(row)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query, parameters = "SELECT * FROM checkpoints WHERE 1 = 1", []
+        if config:
+            query += " AND thread_id = ?"
+            parameters.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                parameters.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                parameters.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            parameters.append(before_id)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC",
+                                            parameters).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[6], row[7])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                yield self._tuple(row)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        checkpoint = checkpoint.copy()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        values: Dict[str, Any] = checkpoint.pop("channel_values")  # type: ignore[misc]
+        with self._lock:
+            blobs = [self._blob_row(thread_id, checkpoint_ns, channel, version, values.get(channel, _MISSING))
+                     for channel, version in new_versions.items()]
+            row = (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                   *self._dumps(checkpoint), *self._dumps(get_checkpoint_metadata(config, metadata)))
+            with self._transaction():
+                self._connection.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", blobs)
+                self._connection.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            # Only committed values can be the base of later deltas
+            for _, _, channel, version, kind, _, chain, _, _ in blobs:
+                if kind == _EMPTY:
+                    self._latest.pop((thread_id, checkpoint_ns, channel), None)
+                else:
+                    self._remember((thread_id, checkpoint_ns, channel), version, values[channel], chain)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [(thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, index), channel,
+                 *self._dumps(value), task_path) for index, (channel, value) in enumerate(writes)]
+        with self._lock, self._transaction():
+            for row in rows:
+                # Regular writes are kept from the first attempt, special ones (errors, interrupts) replaced
+                verb = "INSERT OR IGNORE" if row[4] >= 0 else "INSERT OR REPLACE"
+                self._connection.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            with self._transaction():
+                for table in ("checkpoints", "blobs", "writes"):
+                    self._connection.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            for key in [key for key in self._latest if key[0] == thread_id]:
+                del self._latest[key]
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+    def storage_stats(self) -> StorageStats:
+        with self._lock:
+            execute = self._connection.execute
+            checkpoints, checkpoint_bytes = execute(
+                "SELECT count(*), coalesce(sum(length(checkpoint) + length(metadata)), 0) FROM checkpoints").fetchone()
+            kinds = dict(execute("SELECT kind, count(*) FROM blobs GROUP BY kind").fetchall())
+            blob_bytes = execute("SELECT coalesce(sum(length(data)), 0) FROM blobs").fetchone()[0]
+            write_bytes = execute("SELECT coalesce(sum(length(data)), 0) FROM writes").fetchone()[0]
+        return StorageStats(checkpoints=checkpoints, snapshots=kinds.get(_FULL, 0), deltas=kinds.get(_DELTA, 0),
+                            bytes=checkpoint_bytes + blob_bytes + write_bytes)
+
+    # Async, SQLite calls run in the default executor
+
+    async def _run(self, function, *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, partial(function, *args, **kwargs))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._run(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items: List[CheckpointTuple] = await self._run(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        return await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await self._run(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same versions as InMemorySaver: zero padded counter, random suffix
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+class _Transaction:
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> None:
+        self.connection.execute("BEGIN")
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        self.connection.execute("ROLLBACK" if exc_type is not None else "COMMIT")
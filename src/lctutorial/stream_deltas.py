@@ -0,0 +1,105 @@
+"""
+Delta streaming: only the messages a step appended and the other keys it changed, with sequence numbers.
+
+stream_mode="values" yields the whole state after every step, forwarding it copies and rescans the full
+conversation each time. Deltas stay the size of the step, DeltaState rebuilds the full state from them.
+
+Example:
+    >>> state = DeltaState()
+    >>> for _, delta in stream_weather_agent("Paris", stream_mode="deltas"):
+    ...     state.apply(delta)
+    ...     send_to_client(delta.to_dict())
+    >>> state.messages[-1].text
+"""
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.load import dumpd
+from langchain_core.messages import BaseMessage, RemoveMessage, convert_to_messages
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+INPUT_NODE = "__input__"
+
+
+@dataclass
+class StateDelta:
+    seq: int
+    node: str
+    messages: List[BaseMessage] = field(default_factory=list)     # Appended, or replacing the message with the same id
+    changed: Dict[str, Any] = field(default_factory=dict)         # Every other key the step wrote
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON serializable form, e.g. for forwarding to a client."""
+        return {"seq": self.seq, "node": self.node, "messages": [dumpd(message) for message in self.messages],
+                "changed": {key: dumpd(value) for key, value in self.changed.items()}}
+
+
+class DeltaState:
+    """Full state rebuilt from deltas. Appends are O(1), replacing a message by id too."""
+
+    def __init__(self):
+        self.messages: List[BaseMessage] = []
+        self.values: Dict[str, Any] = {}
+        self.seq = -1
+        self._index: Dict[str, int] = {}
+
+    def apply(self, delta: StateDelta) -> None:
+        if delta.seq != self.seq + 1:
+            raise ValueError(f"Expected delta {self.seq + 1}, got {delta.seq}")
+        self.seq = delta.seq
+        for message in delta.messages:
+            if isinstance(message, RemoveMessage):
+                self._remove(message.id)
+            elif message.id is not None and message.id in self._index:
+                self.messages[self._index[message.id]] = message
+            else:
+                if message.id is not None:
+                    self._index[message.id] = len(self.messages)
+                self.messages.append(message)
+        self.values.update(delta.changed)
+
+    def state(self) -> Dict[str, Any]:
+        return {**self.values, "messages": self.messages}
+
+    def _remove(self, message_id: Optional[str]) -> None:
+        if message_id == REMOVE_ALL_MESSAGES:
+            self.messages, self._index = [], {}
+            return
+        index = self._index.pop(message_id, None)
+        if index is None:
+            return
+        del self.messages[index]
+        self._index = {m.id: i for i, m in enumerate(self.messages) if m.id is not None}
+
+
+def iter_deltas(agent: Any, input: Dict[str, Any], config: Optional[Dict[str, Any]] = None,
+                **kwargs: Any) -> Iterator[StateDelta]:
+    """Stream an agent (a LangGraph graph with a messages key) as deltas.
+
+    The first delta (node "__input__") holds the input messages, one delta follows per step that wrote
+    something. Built on stream_mode="updates", so the agent never materializes the full state per step.
+    Input messages without an id get one here, like the graph would assign, so that later deltas
+    replacing or removing them by id match.
+    """
+    seq = 0
+    if input.get("messages"):
+        messages = input["messages"] if isinstance(input["messages"], list) else [input["messages"]]
+        messages = [message if message.id is not None else message.model_copy(update={"id": str(uuid.uuid4())})
+                    for message in convert_to_messages(messages)]
+        input = {**input, "messages": messages}
+        yield StateDelta(seq, INPUT_NODE, messages, {key: value for key, value in input.items() if key != "messages"})
+        seq += 1
+
+    for update in agent.stream(input, config, stream_mode="updates", **kwargs):
+        for node, values in update.items():
+            if node == "__interrupt__":
+                values = {"__interrupt__": values}
+            if not values:
+                continue
+            messages = values.get("messages", [])
+            if not isinstance(messages, list):
+                messages = [messages]
+            yield StateDelta(seq, node, convert_to_messages(messages),
+                             {key: value for key, value in values.items() if key != "messages"})
+            seq += 1
@@ -1,30 +1,58 @@
-from dotenv import load_dotenv
-from langchain.agents import create_agent
-from langchain.tools import tool, ToolRuntime
+from functools import cache
+from typing import Any
 
-load_dotenv()
+from lctutorial import load_env
 
-@tool
-def summarize_conversation(
-    runtime: ToolRuntime
-) -> str:
-    """Summarize the conversation so far."""
-    messages = runtime.state["messages"]
 
+def describe_conversation(messages) -> str:
     human_msgs = sum(1 for m in messages if m.__class__.__name__ == "HumanMessage")
     ai_msgs = sum(1 for m in messages if m.__class__.__name__ == "AIMessage")
     tool_msgs = sum(1 for m in messages if m.__class__.__name__ == "ToolMessage")
 
     return f"Conversation has {human_msgs} user messages, {ai_msgs} AI responses, and {tool_msgs} tool results"
 
-agent = create_agent(
-    model="gpt-5.1",
-    tools=[summarize_conversation],
-    system_prompt="You are a helpful assistant",
-)
 
-agent_response = agent.invoke(
-    {"messages": [{"role": "user", "content": "Summarize our conversation so far?"}]})
+@cache
+def get_summarize_tool():
+    """The summarize_conversation tool, built on first use so that importing this module stays cheap."""
+    from langchain.tools import tool, ToolRuntime
 
-print(repr(agent_response))
+    @tool
+    def summarize_conversation(
+        runtime: ToolRuntime
+    ) -> str:
+        """Summarize the conversation so far."""
+        return describe_conversation(runtime.state["messages"])
 
+    return summarize_conversation
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from lctutorial.summarize_agent import summarize_conversation` working
+    if name == "summarize_conversation":
+        return get_summarize_tool()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_summarize_agent():
+    from langchain.agents import create_agent
+
+    load_env()
+    return create_agent(
+        model="gpt-5.1",
+        tools=[get_summarize_tool()],
+        system_prompt="You are a helpful assistant",
+    )
+
+
+def main():
+    agent = create_summarize_agent()
+
+    agent_response = agent.invoke(
+        {"messages": [{"role": "user", "content": "Summarize our conversation so far?"}]})
+
+    print(repr(agent_response))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Splitting of a text into the word-sized pieces the fake providers stream it in.
+
+Each piece is a word with the whitespace around it, so the pieces add up to the text again. Used by
+FakeChatModel, the response cache replay and the mock server (which has no other lctutorial imports).
+"""
+import re
+from typing import List
+
+WORD_PIECES = re.compile(r"\s*\S+\s*|\s+")
+
+
+def split_words(text: str) -> List[str]:
+    """The pieces of text, about one token each."""
+    return WORD_PIECES.findall(text)
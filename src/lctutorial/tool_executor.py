@@ -0,0 +1,177 @@
+"""
+Concurrent execution of the tool calls of an AIMessage, for hand-written tool loops.
+
+Example:
+    >>> ai_msg = model.bind_tools([get_weather]).invoke("What's the weather in Boston and Tokyo?")
+    >>> messages.extend(run_tool_calls(ai_msg.tool_calls, [get_weather], timeout=10))
+
+instead of `for tool_call in ai_msg.tool_calls: messages.append(get_weather.invoke(tool_call))`.
+run() uses a thread pool, arun() asyncio.gather (sync tools then run in the default executor, like
+tool.ainvoke does). Both return one ToolMessage per call in the order of the calls. Failing, unknown
+and timed out calls give a ToolMessage with status="error", the model can react to it.
+"""
+import asyncio
+import contextvars
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Union
+
+from langchain_core.messages import ToolMessage
+from langchain_core.messages.tool import ToolCall
+from langchain_core.tools import BaseTool
+
+ToolRegistry = Union[Sequence[BaseTool], Mapping[str, BaseTool]]
+
+
+class ToolExecutor:
+    """Runs tool calls concurrently with per tool concurrency limits and timeouts.
+
+    Args:
+        tools: The tools, a sequence or a mapping from tool call name to tool.
+        max_workers: Threads of the pool used by run().
+        concurrency: Maximum number of concurrently running calls per tool name, unlimited by default.
+        timeout: Seconds a call may run, counted from when a worker starts it, None waits forever. Sync
+            tools can't be interrupted, their thread finishes in the background and the result is dropped.
+        timeouts: Per tool name timeouts, override `timeout`.
+        handle_errors: Turn tool exceptions into error ToolMessages, otherwise the first one is raised.
+    """
+
+    def __init__(self, tools: ToolRegistry, max_workers: int = 8, concurrency: Optional[Mapping[str, int]] = None,
+                 timeout: Optional[float] = None, timeouts: Optional[Mapping[str, float]] = None,
+                 handle_errors: bool = True):
+        self.tools: Dict[str, BaseTool] = dict(tools) if isinstance(tools, Mapping) else {t.name: t for t in tools}
+        self.max_workers = max_workers
+        self.concurrency = dict(concurrency or {})
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.handle_errors = handle_errors
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __enter__(self) -> "ToolExecutor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _timeout(self, name: str) -> Optional[float]:
+        return self.timeouts.get(name, self.timeout)
+
+    def _error(self, tool_call: ToolCall, content: str) -> ToolMessage:
+        return ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"], status="error")
+
+    def _unknown(self, tool_call: ToolCall) -> ToolMessage:
+        return self._error(tool_call, f"Error: {tool_call['name']} is not a valid tool, try one of "
+                                      f"[{', '.join(self.tools)}].")
+
+    def _failed(self, tool_call: ToolCall, error: BaseException) -> ToolMessage:
+        if not self.handle_errors:
+            raise error
+        return self._error(tool_call, f"Error: {error!r}\n Please fix your mistakes.")
+
+    def _timed_out(self, tool_call: ToolCall) -> ToolMessage:
+        return self._error(tool_call, f"Error: {tool_call['name']} timed out after "
+                                      f"{self._timeout(tool_call['name'])} seconds.")
+
+    def run(self, tool_calls: Sequence[ToolCall]) -> List[ToolMessage]:
+        """Run the calls in the thread pool, returns their ToolMessages in call order."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="tool-executor")
+        results: List[Optional[ToolMessage]] = [None] * len(tool_calls)
+        pending: Deque[int] = deque()
+        running: Dict[Future, int] = {}     # future -> call index
+        started: Dict[int, float] = {}      # call index -> when a worker picked it up
+        slots: Dict[str, int] = {}
+
+        def invoke(index: int) -> ToolMessage:
+            started[index] = time.monotonic()
+            return self.tools[tool_calls[index]["name"]].invoke(tool_calls[index])
+
+        def start_pending() -> None:
+            # At most max_workers calls are submitted, so that no call waits in the pool's queue
+            for index in list(pending):
+                if len(running) >= self.max_workers:
+                    return
+                name = tool_calls[index]["name"]
+                if slots[name] > 0:
+                    pending.remove(index)
+                    slots[name] -= 1
+                    running[self._executor.submit(contextvars.copy_context().run, invoke, index)] = index
+
+        def time_left(index: int, now: float) -> Optional[float]:
+            timeout = self._timeout(tool_calls[index]["name"])
+            if timeout is None:
+                return None
+            # Until a worker starts the call (e.g. after other users of the pool) look again soon
+            return started[index] + timeout - now if index in started else 0.05
+
+        for index, tool_call in enumerate(tool_calls):
+            if tool_call["name"] not in self.tools:
+                results[index] = self._unknown(tool_call)
+                continue
+            pending.append(index)
+            slots.setdefault(tool_call["name"], self.concurrency.get(tool_call["name"], len(tool_calls)))
+        start_pending()
+
+        while running:
+            now = time.monotonic()
+            left = [time_left(index, now) for index in running.values()]
+            wait_for = max(0.0, min(t for t in left if t is not None)) if any(t is not None for t in left) else None
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future, index in list(running.items()):
+                tool_call = tool_calls[index]
+                timeout = self._timeout(tool_call["name"])
+                if future in done:
+                    error = future.exception()
+                    results[index] = self._failed(tool_call, error) if error is not None else future.result()
+                elif timeout is not None and index in started and now >= started[index] + timeout:
+                    future.cancel()
+                    results[index] = self._timed_out(tool_call)
+                else:
+                    continue
+                del running[future]
+                slots[tool_call["name"]] += 1
+            start_pending()
+        return results
+
+    async def arun(self, tool_calls: Sequence[ToolCall]) -> List[ToolMessage]:
+        """Run the calls with asyncio.gather, returns their ToolMessages in call order."""
+        semaphores = {name: asyncio.Semaphore(self.concurrency[name])
+                      for name in {call["name"] for call in tool_calls} if name in self.concurrency}
+
+        async def run_one(tool_call: ToolCall) -> ToolMessage:
+            name = tool_call["name"]
+            if name not in self.tools:
+                return self._unknown(tool_call)
+            semaphore = semaphores.get(name)
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                output = await asyncio.wait_for(self.tools[name].ainvoke(tool_call), self._timeout(name))
+            except asyncio.TimeoutError:
+                return self._timed_out(tool_call)
+            except Exception as error:
+                return self._failed(tool_call, error)
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+            return output
+
+        return list(await asyncio.gather(*(run_one(tool_call) for tool_call in tool_calls)))
+
+
+def run_tool_calls(tool_calls: Sequence[ToolCall], tools: ToolRegistry, **kwargs: Any) -> List[ToolMessage]:
+    """Run the calls concurrently with a ToolExecutor(tools, **kwargs), see ToolExecutor.run."""
+    with ToolExecutor(tools, **kwargs) as executor:
+        return executor.run(tool_calls)
+
+
+async def arun_tool_calls(tool_calls: Sequence[ToolCall], tools: ToolRegistry, **kwargs: Any) -> List[ToolMessage]:
+    """Async counterpart of run_tool_calls."""
+    return await ToolExecutor(tools, **kwargs).arun(tool_calls)
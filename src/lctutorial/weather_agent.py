@@ -1,29 +1,66 @@
 """
 From https://docs.langchain.com/oss/python/langchain/quickstart
 """
-from typing import Dict, Literal, Iterator, Tuple, Any
-from dotenv import load_dotenv
-from langchain.agents import create_agent
+from functools import cache
+from typing import Dict, Literal, Iterator, Tuple, Any, Optional, Sequence
 
+from lctutorial import load_env
 
-load_dotenv()
 
 def get_weather(city: str) -> str:
     """Get weather for a given city."""
     return f"It's always sunny in {city}!"
 
-agent = create_agent(
-    model="claude-sonnet-4-5-20250929",
-    tools=[get_weather],
-    system_prompt="You are a helpful assistant",
-)
 
-def invoke_weather_agent(city: str, stream_mode: str = "values") -> Dict:
+def create_weather_agent(model: Any = "claude-sonnet-4-5-20250929", early_tool_execution: bool = False):
+    """Create a weather agent, model is a model name or a chat model (e.g. a FakeChatModel for benchmarks).
+
+    With early_tool_execution get_weather calls run while the model is still streaming its response,
+    see lctutorial.early_tools.
+    """
+    from langchain.agents import create_agent
+
+    middleware = []
+    if early_tool_execution:
+        from lctutorial.early_tools import EarlyToolExecutionMiddleware
+
+        middleware.append(EarlyToolExecutionMiddleware())
+
+    load_env()
+    return create_agent(
+        model=model,
+        tools=[get_weather],
+        system_prompt="You are a helpful assistant",
+        middleware=middleware,
+    )
+
+
+@cache
+def get_agent():
+    """The weather agent, built on first use so that importing this module stays cheap."""
+    return create_weather_agent()
+
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from lctutorial.weather_agent import agent` working
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _weather_question(city: str, history: Sequence[Any]) -> Dict:
+    return {"messages": [*history, {"role": "user", "content": f"what is the weather in {city}"}]}
+
+
+def invoke_weather_agent(city: str, stream_mode: str = "values", agent: Optional[Any] = None,
+                         history: Sequence[Any] = ()) -> Dict:
     """Invoke the weather agent for a given city and get the final result.
+
+    agent defaults to get_agent(), history are earlier messages of the conversation.
     """
 
-    response = agent.invoke(
-        {"messages": [{"role": "user", "content": f"what is the weather in {city}"}]},
+    response = (agent if agent is not None else get_agent()).invoke(
+        _weather_question(city, history),
         stream_mode=stream_mode
     )
     return response
@@ -31,16 +68,28 @@ def invoke_weather_agent(city: str, stream_mode: str = "values") -> Dict:
 
 def stream_weather_agent(
     city: str,
-    stream_mode: Literal["values", "updates", "messages"] = "values"
+    stream_mode: Literal["values", "updates", "messages", "deltas"] = "values",
+    agent: Optional[Any] = None,
+    history: Sequence[Any] = ()
 ) -> Iterator[Tuple[str, Any]]:
     """Stream real-time updates from the weather agent.
 
+    "deltas" yields a lctutorial.stream_deltas.StateDelta per step, with only the new messages and
+    changed keys instead of the whole state.
+
     Example:
         >>> for mode, chunk in stream_weather_agent("Paris", stream_mode="updates"):
         ...     print(f"[{mode}] {chunk}")
     """
-    for chunk in agent.stream(
-        {"messages": [{"role": "user", "content": f"what is the weather in {city}"}]},
+    if stream_mode == "deltas":
+        from lctutorial.stream_deltas import iter_deltas
+
+        for delta in iter_deltas(agent if agent is not None else get_agent(), _weather_question(city, history)):
+            yield stream_mode, delta
+        return
+
+    for chunk in (agent if agent is not None else get_agent()).stream(
+        _weather_question(city, history),
         stream_mode=stream_mode
     ):
         yield stream_mode, chunk
@@ -3,12 +3,11 @@ From https://docs.langchain.com/oss/python/langchain/quickstart
 """
 import os
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-from langchain.agents import create_agent
 
-from libs.core.langchain_core.messages.tool import ToolMessage
+from langchain_core.messages.tool import ToolMessage
+
+from lctutorial import load_env
 
-os.environ["LANGCHAIN_TRACING"] = "true"
 # TODO: Activating tracing logs the following message:
 #
 # 97: LangSmithMissingAPIKeyWarning: API key must be provided when using hosted LangSmith API
@@ -21,7 +20,6 @@ os.environ["LANGCHAIN_TRACING"] = "true"
 #
 # Why is a request to LangSmith being made at all? => Default should be not to use LangSmith unless explicitly enabled.
 
-load_dotenv()
 
 def get_weather(location: str) -> str:
     """Get weather for a given location, e.g. San Francisco, CA"""
@@ -41,26 +39,37 @@ class GetWeatherWithNew(BaseModel):
         location = kwargs.get("location")
         return f"The weather in {location} is always sunny"
 
-agent = create_agent(
-    model="gpt-5.1",
-    tools=[GetWeatherWithNew],
-    system_prompt="You are a helpful assistant",
-)
 
-agent_response = agent.invoke(
-    {"messages": [{"role": "user", "content": f"what is the weather in San Francisco?"}]})
+def main():
+    from langchain.agents import create_agent
+
+    os.environ["LANGCHAIN_TRACING"] = "true"
+    load_env()
+
+    agent = create_agent(
+        model="gpt-5.1",
+        tools=[GetWeatherWithNew],
+        system_prompt="You are a helpful assistant",
+    )
+
+    agent_response = agent.invoke(
+        {"messages": [{"role": "user", "content": f"what is the weather in San Francisco?"}]})
+
+    tool_message: ToolMessage = agent_response["messages"][2]
+    assert tool_message.content == "The weather in San Francisco is always sunny"
+
+    agent = create_agent(
+        model="gpt-5.1",
+        tools=[GetWeather],
+        system_prompt="You are a helpful assistant",
+    )
 
-tool_message: ToolMessage = agent_response["messages"][2]
-assert tool_message.content == "The weather in San Francisco is always sunny"
+    agent_response = agent.invoke(
+        {"messages": [{"role": "user", "content": f"what is the weather in San Francisco?"}]})
 
-agent = create_agent(
-    model="gpt-5.1",
-    tools=[GetWeather],
-    system_prompt="You are a helpful assistant",
-)
+    tool_message: ToolMessage = agent_response["messages"][2]
+    assert tool_message.content == "location='San Francisco'"
 
-agent_response = agent.invoke(
-    {"messages": [{"role": "user", "content": f"what is the weather in San Francisco?"}]})
 
-tool_message: ToolMessage = agent_response["messages"][2]
-assert tool_message.content == "location='San Francisco'"
+if __name__ == "__main__":
+    main()
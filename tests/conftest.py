@@ -0,0 +1,5 @@
+from dotenv import load_dotenv
+
+# Several tests talk to langchain / the provider APIs directly and expect the API keys from .env,
+# which importing lctutorial no longer loads as a side effect.
+load_dotenv()
@@ -0,0 +1,65 @@
+import asyncio
+
+from pytest import mark
+
+from lctutorial import init_chat_model
+from lctutorial.adaptive_concurrency import AdaptiveConcurrency, AdaptiveConcurrencyChatModel
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.mock_server import MockServer, MockServerConfig, fixed
+
+
+class TestAdaptiveConcurrency:
+
+    def test_aimd(self):
+        controller = AdaptiveConcurrency(initial=4, max_limit=8)
+        for _ in range(4):
+            controller.acquire()
+
+        controller.on_success(0.1)                      # Limit used up, grows by 1/limit
+        assert controller.stats().limit == 4.25
+        controller.on_response(429, {})
+        assert controller.stats().limit == 2.125
+        controller.on_response(429, {})                 # Same burst, within one round trip
+        assert controller.stats().limit == 2.125
+        controller.on_success(1.0)                      # 10 x the best latency
+        assert controller.limit == 1
+        controller.on_response(200, {"x-ratelimit-remaining-requests": "0"})
+        assert controller.limit == 1
+
+        stats = controller.stats()
+        assert (stats.in_flight, stats.max_in_flight, stats.rate_limited, stats.completed) == (4, 4, 2, 2)
+
+    def test_remaining_requests_header_caps_the_limit(self):
+        controller = AdaptiveConcurrency(initial=16)
+
+        controller.on_response(200, {"anthropic-ratelimit-requests-remaining": "3"})
+
+        assert controller.limit == 3
+
+    def test_calls_beyond_the_limit_wait(self):
+        controller = AdaptiveConcurrency(initial=2, max_limit=2)
+        model = AdaptiveConcurrencyChatModel(inner=FakeChatModel(tokens_per_second=200), controller=controller)
+
+        results = model.batch([f"question {i}" for i in range(8)])
+        asyncio.run(model.abatch([f"question {i}" for i in range(8)]))
+
+        assert len(results) == 8
+        assert controller.stats().max_in_flight == 2
+        assert controller.stats().completed == 16
+
+    @mark.parametrize("provider", ["OpenAI", "Anthropic"])
+    def test_backs_off_on_a_concurrency_limited_server(self, provider):
+        config = MockServerConfig(latency=fixed(0.05), max_concurrent_requests=3)
+        controller = AdaptiveConcurrency(initial=12)
+        with MockServer(config) as server:
+            # The calls of the first burst are already in flight, the SDK retries them until the limit is down
+            model = init_chat_model(provider=provider, use_model_cache=False, adaptive_concurrency=controller,
+                                    max_retries=5, **server.model_kwargs(provider))
+
+            results = list(model.batch_as_completed([f"question {i}" for i in range(30)], return_exceptions=True))
+
+        stats = controller.stats()
+        assert not [result for _, result in results if isinstance(result, Exception)]
+        assert stats.rate_limited == server.stats().rate_limited > 0
+        assert stats.limit < 6
+        assert stats.queue_depth == stats.in_flight == 0
@@ -0,0 +1,136 @@
+import asyncio
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import START, MessagesState, StateGraph
+from langgraph.types import Command
+from pytest import raises
+
+from lctutorial.bounded_checkpointer import BoundedMemorySaver
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.hitl_agent import create_hitl_agent
+
+
+def chat_graph(checkpointer):
+    def reply(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(f"Reply {len(state['messages'])} " + "x" * 200)]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def chat(graph, turns: int, thread_id: str = "1") -> None:
+    for turn in range(turns):
+        graph.invoke({"messages": [HumanMessage(f"Turn {turn}")]}, {"configurable": {"thread_id": thread_id}})
+
+
+def config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+class TestBoundedMemorySaver:
+
+    def test_keeps_last_checkpoints(self):
+        checkpointer = BoundedMemorySaver(keep_last=3)
+        graph = chat_graph(checkpointer)
+        chat(graph, 10)
+        unbounded = InMemorySaver()
+        chat(chat_graph(unbounded), 10)
+
+        history = list(graph.get_state_history(config("1")))
+        assert len(history) == 3
+        assert len(history[0].values["messages"]) == 20
+        expected = chat_graph(unbounded).get_state(config("1")).values["messages"]
+        assert [message.text for message in history[0].values["messages"]] == [message.text for message in expected]
+        # Only the message lists the last 3 checkpoints reference
+        assert sum(key[2] == "messages" for key in checkpointer.blobs) == 3
+        assert sum(key[2] == "messages" for key in unbounded.blobs) == 20
+        chat(graph, 1)
+        assert len(graph.get_state(config("1")).values["messages"]) == 22
+
+    def test_byte_counts(self):
+        checkpointer = BoundedMemorySaver(keep_last=2)
+        graph = chat_graph(checkpointer)
+        chat(graph, 2, thread_id="a")
+        chat(graph, 5, thread_id="b")
+
+        counts = checkpointer.bytes_by_thread()
+        assert 0 < counts["a"] < counts["b"]
+        stats = checkpointer.storage_stats()
+        assert stats.bytes == counts["a"] + counts["b"]
+        size = sum(len(checkpoint[1]) + len(metadata[1]) for thread in checkpointer.storage.values()
+                   for checkpoints in thread.values() for checkpoint, metadata, _ in checkpoints.values())
+        size += sum(len(blob[1]) for blob in checkpointer.blobs.values())
+        size += sum(len(value[1]) for writes in checkpointer.writes.values() for _, _, value, _ in writes.values())
+        assert stats.bytes == size
+
+        checkpointer.delete_thread("a")
+        assert checkpointer.bytes_by_thread() == {"b": counts["b"]}
+        assert checkpointer.storage_stats().bytes == counts["b"]
+
+    def test_idle_threads_are_spilled(self):
+        with BoundedMemorySaver(max_bytes=20_000, keep_last=2) as checkpointer:
+            graph = chat_graph(checkpointer)
+            for thread_id in range(20):
+                chat(graph, 3, thread_id=str(thread_id))
+            stats = checkpointer.storage_stats()
+            spill_path = checkpointer.spill_path
+
+            assert stats.bytes <= 20_000
+            assert stats.spilled_threads > 0 and stats.evictions >= stats.spilled_threads
+            assert stats.threads + stats.spilled_threads == 20
+            assert "19" in checkpointer.storage and "0" not in checkpointer.storage
+            assert os.path.exists(spill_path)
+
+            # Listing all threads includes the spilled ones without loading them
+            assert {item.config["configurable"]["thread_id"] for item in checkpointer.list(None)} == \
+                   {str(thread_id) for thread_id in range(20)}
+            assert len(list(checkpointer.list(None, limit=5))) == 5
+            assert checkpointer.storage_stats().reloads == 0
+
+            assert len(graph.get_state(config("0")).values["messages"]) == 6
+            assert checkpointer.storage_stats().reloads == 1
+            assert "0" in checkpointer.storage
+            assert checkpointer.storage_stats().bytes <= 20_000
+        assert not os.path.exists(spill_path)
+
+    def test_hitl_resume_of_spilled_thread(self):
+        checkpointer = BoundedMemorySaver(max_bytes=1, keep_last=2)
+        threads = [f"some_id_{index}" for index in range(5)]
+
+        def agent():
+            return create_hitl_agent(FakeChatModel(responses=[
+                AIMessage("", tool_calls=[{"name": "get_weather", "args": {"location": "Boston"}, "id": "call_1"}]),
+                "It's sunny in Boston.",
+            ]), checkpointer=checkpointer)
+
+        for thread_id in threads:
+            result = agent().invoke({"messages": [{"role": "user", "content": "What's the weather in Boston?"}]},
+                                    config(thread_id))
+            assert "__interrupt__" in result
+        assert checkpointer.storage_stats().spilled_threads == 4     # All but the last one
+
+        for thread_id in threads:
+            model = agent()
+            result = model.invoke(Command(resume={"decisions": [{"type": "approve"}]}), config(thread_id))
+            assert result["messages"][-2].text == "It's sunny in Boston."
+
+    def test_async(self):
+        async def run():
+            async with BoundedMemorySaver(max_bytes=1, keep_last=2) as checkpointer:
+                graph = chat_graph(checkpointer)
+                for thread_id in ("a", "b"):
+                    await graph.ainvoke({"messages": [HumanMessage("Hi")]}, config(thread_id))
+                state = await graph.aget_state(config("a"))
+                return state, checkpointer.storage_stats()
+
+        state, stats = asyncio.run(run())
+        assert len(state.values["messages"]) == 2
+        assert stats.reloads == 1
+
+    def test_keep_last_must_be_positive(self):
+        with raises(ValueError):
+            BoundedMemorySaver(keep_last=0)
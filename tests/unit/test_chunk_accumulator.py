@@ -0,0 +1,69 @@
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.messages.tool import tool_call_chunk
+
+from lctutorial import init_chat_model
+from lctutorial.chunk_accumulator import ChunkAccumulator
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.mock_server import MockServer, MockServerConfig, Reply
+
+
+def get_weather(city: str) -> str:
+    """Get weather for a given city."""
+    return f"It's always sunny in {city}!"
+
+
+def added(chunks):
+    full = None
+    for chunk in chunks:
+        full = chunk if full is None else full + chunk
+    return full
+
+
+def accumulated(chunks) -> ChunkAccumulator:
+    accumulator = ChunkAccumulator()
+    for chunk in chunks:
+        accumulator += chunk
+    return accumulator
+
+
+class TestChunkAccumulator:
+
+    def test_equals_repeated_add_for_text_and_tool_calls(self):
+        model = FakeChatModel(responses=[AIMessage(
+            "Let me check the weather in both cities.",
+            tool_calls=[{"name": "get_weather", "args": {"city": "Boston"}, "id": "call_1"},
+                        {"name": "get_weather", "args": {"city": "Tokyo"}, "id": "call_2"}])])
+        chunks = list(model.stream("What's the weather in Boston and Tokyo?"))
+
+        accumulator = accumulated(chunks)
+
+        assert accumulator.chunks == len(chunks)
+        assert accumulator.to_chunk() == added(chunks)
+        assert accumulator.text == "Let me check the weather in both cities."
+        message = accumulator.to_message()
+        assert isinstance(message, AIMessage)
+        assert [call["args"] for call in message.tool_calls] == [{"city": "Boston"}, {"city": "Tokyo"}]
+        assert message.usage_metadata["output_tokens"] > 0
+
+    def test_equals_repeated_add_for_provider_streams(self):
+        reply = Reply(text="It is sunny and warm today.", tool_calls=[{"name": "get_weather", "args": {"city": "Paris"}}])
+        with MockServer(MockServerConfig(responder=lambda request: reply)) as server:
+            for provider in ("OpenAI", "Anthropic"):
+                model = init_chat_model(provider=provider, use_model_cache=False, **server.model_kwargs(provider))
+                chunks = list(model.bind_tools([get_weather]).stream("what is the weather in Paris"))
+
+                accumulator = accumulated(chunks)
+
+                assert accumulator.to_chunk() == added(chunks), provider
+                assert accumulator.text == added(chunks).text
+
+    def test_ids_and_indexless_chunks(self):
+        chunks = [AIMessageChunk(content="a", id="lc_run-1"), AIMessageChunk(content="b", id="msg_1"),
+                  AIMessageChunk(content="", tool_call_chunks=[tool_call_chunk(name="x", args="{}", id="1", index=None)]),
+                  AIMessageChunk(content="", tool_call_chunks=[tool_call_chunk(name="y", args="{}", id="2", index=None)])]
+
+        result = accumulated(chunks).to_chunk()
+
+        assert result == added(chunks)
+        assert result.id == "msg_1"
+        assert len(result.tool_call_chunks) == 2
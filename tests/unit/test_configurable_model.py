@@ -0,0 +1,104 @@
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, Field
+from pytest import fixture
+
+from lctutorial.configurable_model import CachedConfigurableModel, init_configurable_chat_model
+from lctutorial.mock_server import MockServer
+
+
+class GetWeather(BaseModel):
+    """Get the current weather in a given location"""
+
+    location: str = Field(..., description="The city and state, e.g. San Francisco, CA")
+
+
+@fixture(autouse=True)
+def api_keys(monkeypatch):
+    # Constructing the clients needs a key but no network access
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-ant-test")
+
+
+def config(**configurable):
+    return {"configurable": configurable}
+
+
+class TestCachedConfigurableModel:
+
+    def test_resolves_each_configuration_once(self):
+        model = init_configurable_chat_model(temperature=0)
+        assert isinstance(model, CachedConfigurableModel)
+
+        gpt = model._model(config(model="gpt-5-nano"))
+        claude = model._model(config(model="claude-sonnet-4-5-20250929"))
+        assert gpt is not claude
+        assert model._model(config(model="gpt-5-nano")) is gpt
+        assert model._model(config(model="claude-sonnet-4-5-20250929")) is claude
+        assert model.cache_info().misses == 2
+
+    def test_prefixed_fields_are_part_of_the_key(self):
+        model = init_configurable_chat_model(model="gpt-4.1-mini", temperature=0, config_prefix="first",
+                                             configurable_fields=("model", "model_provider", "temperature",
+                                                                  "max_tokens"))
+        default = model._model()
+        changed = model._model(config(first_model="claude-sonnet-4-5-20250929", first_temperature=0.5,
+                                      first_max_tokens=100))
+        assert changed is not default
+        assert changed.temperature == 0.5 and changed.max_tokens == 100
+        assert model._model(config(first_model="claude-sonnet-4-5-20250929", first_max_tokens=100,
+                                   first_temperature=0.5)) is changed
+        assert model._model(config(second_model="claude-sonnet-4-5-20250929")) is default
+
+    def test_bound_tools_share_the_concrete_models(self):
+        model = init_configurable_chat_model(temperature=0)
+        plain = model._model(config(model="gpt-4.1-mini"))
+
+        with_tools = model.bind_tools([GetWeather])
+        assert isinstance(with_tools, CachedConfigurableModel)
+        bound = with_tools._model(config(model="gpt-4.1-mini"))
+        assert bound.bound is plain                             # The tools were applied to the cached model
+        assert with_tools._model(config(model="gpt-4.1-mini")) is bound
+        assert with_tools.bound_cache_info().hits == 1
+
+        structured = with_tools.with_structured_output(GetWeather)
+        assert isinstance(structured, CachedConfigurableModel)
+        structured._model(config(model="gpt-4.1-mini"))
+        assert model.cache_info().hits == 2
+
+    def test_binding_the_same_tools_again_is_cached(self):
+        model = init_configurable_chat_model(temperature=0)
+        with_tools = model.bind_tools([GetWeather], tool_choice="any")
+        bound = with_tools._model(config(model="gpt-4.1-mini"))
+
+        # Like an agent binding its tools on every model step
+        again = model.bind_tools([GetWeather], tool_choice="any")
+        assert again is with_tools
+        assert again._model(config(model="gpt-4.1-mini")) is bound
+
+        # Tools are keyed by their schema
+        same_schema = model.bind_tools([convert_to_openai_tool(GetWeather)], tool_choice="any")
+        assert same_schema._model(config(model="gpt-4.1-mini")) is bound
+        assert model.bind_tools([GetWeather])._model(config(model="gpt-4.1-mini")) is not bound
+
+    def test_lru_eviction(self):
+        model = init_configurable_chat_model(temperature=0, maxsize=1, bound_maxsize=1)
+        gpt = model._model(config(model="gpt-5-nano"))
+        model._model(config(model="claude-sonnet-4-5-20250929"))
+        assert model.cache_info().currsize == 1
+        assert model._model(config(model="gpt-5-nano")) is not gpt
+
+    def test_with_config(self):
+        model = init_configurable_chat_model(temperature=0).with_config(config(model="gpt-5-nano"))
+        assert isinstance(model, CachedConfigurableModel)
+        assert model._model() is model._model()
+
+    def test_fixed_model_is_not_configurable(self):
+        assert not isinstance(init_configurable_chat_model("gpt-5-nano"), CachedConfigurableModel)
+
+    def test_invoke(self):
+        with MockServer() as server:
+            model = init_configurable_chat_model(model_provider="openai", configurable_fields="any",
+                                                 **server.model_kwargs("OpenAI"))
+            for name in ("gpt-5-nano", "gpt-4.1-mini", "gpt-5-nano"):
+                assert model.invoke("what's your name", config=config(model=name)).text
+        assert model.cache_info().misses == 2
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+
+from langchain.agents import create_agent
+from langchain.agents.middleware import ModelRequest, ModelResponse
+from langchain.tools import tool
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+from lctutorial.early_tools import EarlyToolExecutionMiddleware
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.weather_agent import create_weather_agent, get_weather
+
+weather_tool = tool(get_weather)
+question = {"messages": [{"role": "user", "content": "What's the weather in Boston and Tokyo?"}]}
+parallel_calls = AIMessage("Let me look up both cities for you.", tool_calls=[
+    {"name": "get_weather", "args": {"city": "Boston"}, "id": "call_1"},
+    {"name": "get_weather", "args": {"city": "Tokyo"}, "id": "call_2"}])
+
+
+def weather_model():
+    return FakeChatModel(responses=[parallel_calls, "Sunny in both cities."], tokens_per_second=50)
+
+
+def handler(request):
+    return ModelResponse(result=[request.model.invoke(request.messages)])
+
+
+async def ahandler(request):
+    return ModelResponse(result=[await request.model.ainvoke(request.messages)])
+
+
+def tool_request(message):
+    class ToolRequest:
+        tool_call = {**message.tool_calls[0], "type": "tool_call"}
+        state = {"messages": [message]}
+
+    return ToolRequest()
+
+
+def in_thread(thread_id, function):
+    """Calls function like a node of a graph run on the thread."""
+    return RunnableLambda(lambda _: function()).invoke(None, {"configurable": {"thread_id": thread_id}})
+
+
+class ModelEnd(BaseCallbackHandler):
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def on_llm_end(self, response, **kwargs):
+        self.event.set()
+
+
+class TestEarlyToolExecution:
+
+    def test_tools_start_before_the_model_finishes(self):
+        model_end = ModelEnd()
+        started_during_generation = []
+
+        @tool
+        def get_weather(city: str) -> str:
+            """Get weather for a given city."""
+            started_during_generation.append(not model_end.event.is_set())
+            return f"It's always sunny in {city}!"
+
+        agent = create_agent(model=weather_model(), tools=[get_weather], middleware=[EarlyToolExecutionMiddleware()])
+        result = agent.invoke(question, config={"callbacks": [model_end]})
+
+        assert started_during_generation == [True, True]
+        assert [m.content for m in result["messages"] if isinstance(m, ToolMessage)] == [
+            "It's always sunny in Boston!", "It's always sunny in Tokyo!"]
+        assert [m.tool_call_id for m in result["messages"] if isinstance(m, ToolMessage)] == ["call_1", "call_2"]
+
+    def test_weather_agent_modes_give_the_same_messages(self):
+        def run(agent):
+            return [(m.type, m.text) for m in agent.invoke(question)["messages"]]
+
+        expected = run(create_weather_agent(model=weather_model()))
+
+        assert run(create_weather_agent(model=weather_model(), early_tool_execution=True)) == expected
+        early = create_weather_agent(model=weather_model(), early_tool_execution=True)
+        assert [(m.type, m.text) for m in asyncio.run(early.ainvoke(question))["messages"]] == expected
+
+    def test_calls_missing_from_the_final_message_are_cancelled(self):
+        middleware = EarlyToolExecutionMiddleware()
+        request = ModelRequest(model=weather_model(), messages=[HumanMessage("Boston and Tokyo?")],
+                               tools=[weather_tool])
+
+        middleware.wrap_model_call(request, lambda request: ModelResponse(result=[request.model.invoke(request.messages)]))
+        assert sorted(middleware.dispatched()) == ["call_1", "call_2"]
+
+        def handler(request):
+            request.model.invoke(request.messages)
+            # The final message only keeps the first call, with other args
+            return ModelResponse(result=[AIMessage("", tool_calls=[
+                {"name": "get_weather", "args": {"city": "Paris"}, "id": "call_1"}])])
+
+        middleware = EarlyToolExecutionMiddleware()
+        request.model.reset()
+        middleware.wrap_model_call(request, handler)
+        assert middleware.dispatched() == []
+
+        class ToolRequest:
+            tool_call = {"name": "get_weather", "args": {"city": "Paris"}, "id": "call_1", "type": "tool_call"}
+
+        result = middleware.wrap_tool_call(ToolRequest(), lambda request: weather_tool.invoke(request.tool_call))
+        assert result.content == "It's always sunny in Paris!"
+
+    def test_only_allowed_tools_run_early(self):
+        middleware = EarlyToolExecutionMiddleware(tools=["other_tool"])
+        request = ModelRequest(model=weather_model(), messages=[HumanMessage("Boston?")], tools=[weather_tool])
+
+        middleware.wrap_model_call(request, lambda request: ModelResponse(result=[request.model.invoke(request.messages)]))
+
+        assert middleware.dispatched() == []
+
+    def test_results_the_tools_node_skipped_are_dropped(self):
+        middleware = EarlyToolExecutionMiddleware()
+        request = ModelRequest(model=weather_model(), messages=[HumanMessage("Boston and Tokyo?")],
+                               tools=[weather_tool])
+        calls = middleware.wrap_model_call(request, handler).result[0]
+        assert sorted(middleware.dispatched()) == ["call_1", "call_2"]
+
+        # A human rejected both calls, the next model call has them in its history
+        rejected = [ToolMessage("Rejected", tool_call_id=call["id"], status="error") for call in calls.tool_calls]
+        middleware.wrap_model_call(request.override(messages=[*request.messages, calls, *rejected]), handler)
+        assert middleware.dispatched() == []
+
+        # A run that never came back
+        middleware = EarlyToolExecutionMiddleware(max_age=0)
+        request.model.reset()
+        middleware.wrap_model_call(request, handler)
+        assert sorted(middleware.dispatched()) == ["call_1", "call_2"]
+        middleware.wrap_model_call(request.override(messages=[HumanMessage("Oslo?")]), handler)
+        assert middleware.dispatched() == []
+
+        middleware.close()
+        assert middleware.dispatched() == [] and middleware._executor is None
+
+    def test_threads_get_their_own_results(self):
+        middleware = EarlyToolExecutionMiddleware()
+
+        def call_model(city):
+            # Both threads' models answer with the same message and tool call ids
+            model = FakeChatModel(responses=[AIMessage("", id="reply", tool_calls=[
+                {"name": "get_weather", "args": {"city": city}, "id": "call_1"}])])
+            request = ModelRequest(model=model, messages=[HumanMessage(f"{city}?")], tools=[weather_tool])
+            return middleware.wrap_model_call(request, handler).result[0]
+
+        boston = in_thread("a", lambda: call_model("Boston"))
+        tokyo = in_thread("b", lambda: call_model("Tokyo"))
+        assert middleware.dispatched() == ["call_1", "call_1"]
+
+        def take(message):
+            return middleware.wrap_tool_call(tool_request(message), lambda request: None).content
+
+        assert in_thread("b", lambda: take(tokyo)) == "It's always sunny in Tokyo!"
+        assert in_thread("a", lambda: take(boston)) == "It's always sunny in Boston!"
+
+    def test_failed_calls_are_not_run_again(self):
+        runs = []
+
+        @tool
+        def book_flight(city: str) -> str:
+            """Book a flight to a given city."""
+            runs.append(city)
+            raise ValueError("No seats left")
+
+        middleware = EarlyToolExecutionMiddleware()
+        model = FakeChatModel(responses=[AIMessage("", tool_calls=[
+            {"name": "book_flight", "args": {"city": "Oslo"}, "id": "call_1"}])])
+        request = ModelRequest(model=model, messages=[HumanMessage("Oslo")], tools=[book_flight])
+        message = middleware.wrap_model_call(request, handler).result[0]
+
+        result = middleware.wrap_tool_call(tool_request(message), lambda request: book_flight.invoke(request.tool_call))
+        assert result.status == "error" and "No seats left" in result.content
+        assert runs == ["Oslo"]
+
+    def test_sync_tools_node_cancels_async_results(self):
+        @tool
+        async def get_weather(city: str) -> str:
+            """Get weather for a given city."""
+            await asyncio.sleep(10)
+            return f"It's always sunny in {city}!"
+
+        async def run():
+            middleware = EarlyToolExecutionMiddleware()
+            request = ModelRequest(model=weather_model(), messages=[HumanMessage("Boston?")], tools=[get_weather])
+            message = (await middleware.awrap_model_call(request, ahandler)).result[0]
+            pending = middleware._results[None, message.id, "call_1"][1]
+
+            result = middleware.wrap_tool_call(tool_request(message), lambda request: "ran in the tools node")
+            await asyncio.wait([pending], timeout=1)
+            return result, pending.cancelled()
+
+        assert asyncio.run(run()) == ("ran in the tools node", True)
@@ -0,0 +1,117 @@
+import time
+
+from pytest import mark
+
+from langchain_core.messages import AIMessage
+
+from lctutorial import init_chat_model
+from lctutorial.fake_chat_model import FakeChatModel
+
+weather_call = AIMessage("", tool_calls=[{"name": "get_weather", "args": {"city": "Paris"}, "id": None}])
+
+
+def get_weather(city: str) -> str:
+    """Get weather for a given city."""
+    return f"It's always sunny in {city}!"
+
+
+class TestFakeChatModel:
+
+    def test_init_chat_model_fake_provider(self):
+        model = init_chat_model(provider="Fake", model_name="fake-gpt", tokens=3, use_model_cache=False,
+                                responses=["one two three four five"])
+
+        assert isinstance(model, FakeChatModel)
+        response = model.invoke("hi")
+        assert response.text == "one two three "
+        assert response.response_metadata["finish_reason"] == "length"
+        assert response.response_metadata["model_name"] == "fake-gpt"
+
+    def test_fake_provider_is_not_cached(self):
+        first = init_chat_model(provider="Fake", responses=["one", "two"])
+        second = init_chat_model(provider="Fake", responses=["one", "two"])
+
+        assert first is not second
+        assert [first.invoke("hi").text, second.invoke("hi").text] == ["one", "one"]
+
+    def test_script_cycles_and_templates(self):
+        model = FakeChatModel(responses=["Sunny in {input}", "turn {turn} {unknown}"])
+
+        assert model.invoke("Paris").text == "Sunny in Paris"
+        assert model.invoke("Tokyo").text == "turn 1 {unknown}"
+        assert model.invoke("Boston").text == "Sunny in Boston"
+        model.reset()
+        assert model.invoke("Oslo").text == "Sunny in Oslo"
+
+    def test_usage_metadata_and_tool_calls(self):
+        model = FakeChatModel(responses=[weather_call, lambda messages: f"{len(messages)} messages"])
+
+        first = model.invoke("what is the weather in Paris")
+        second = model.invoke("again")
+
+        assert first.tool_calls[0]["id"] == "call_0_0"
+        assert first.response_metadata["finish_reason"] == "tool_calls"
+        assert first.usage_metadata["input_tokens"] > 0
+        assert first.usage_metadata["output_tokens"] > 0
+        assert second.text == "1 messages"
+        assert second.usage_metadata["total_tokens"] == (second.usage_metadata["input_tokens"]
+                                                         + second.usage_metadata["output_tokens"])
+
+    def test_stream_is_paced(self):
+        model = FakeChatModel(responses=["a b c d e f g h i j"], tokens_per_second=200, time_to_first_token=0.05)
+
+        start = time.perf_counter()
+        chunks = iter(model.stream("hi"))
+        first = next(chunks)
+        time_to_first_token = time.perf_counter() - start
+        rest = list(chunks)
+        total = time.perf_counter() - start
+
+        assert time_to_first_token >= 0.05
+        assert total >= 0.05 + 10 / 200
+        assert first.text + "".join(chunk.text for chunk in rest) == "a b c d e f g h i j"
+        assert rest[-1].usage_metadata["output_tokens"] == 10
+
+    @mark.asyncio
+    async def test_astream_tool_calls(self):
+        model = FakeChatModel(responses=[weather_call])
+
+        full = None
+        async for chunk in model.astream("what is the weather in Paris"):
+            full = chunk if full is None else full + chunk
+
+        assert full.tool_calls == [{"name": "get_weather", "args": {"city": "Paris"}, "id": "call_0_0",
+                                    "type": "tool_call"}]
+
+    def test_runs_an_agent_loop(self):
+        from langchain.agents import create_agent
+
+        model = FakeChatModel(responses=[weather_call, "The weather in Paris is sunny."])
+        agent = create_agent(model=model, tools=[get_weather])
+
+        result = agent.invoke({"messages": [{"role": "user", "content": "what is the weather in Paris"}]})
+
+        assert [m.type for m in result["messages"]] == ["human", "ai", "tool", "ai"]
+        assert result["messages"][2].content == "It's always sunny in Paris!"
+        assert result["messages"][-1].text == "The weather in Paris is sunny."
+
+    def test_weather_and_hitl_agents(self):
+        from langgraph.types import Command
+
+        from lctutorial.hitl_agent import create_hitl_agent
+        from lctutorial.weather_agent import create_weather_agent, stream_weather_agent
+
+        weather = create_weather_agent(model=FakeChatModel(responses=[weather_call, "Sunny."]))
+        updates = [chunk for _, chunk in stream_weather_agent("Paris", "updates", agent=weather,
+                                                               history=[AIMessage("Hello!")])]
+        assert [next(iter(update)) for update in updates] == ["model", "tools", "model"]
+
+        location_call = AIMessage("", tool_calls=[{"name": "get_weather", "args": {"location": "Boston"}, "id": None}])
+        hitl = create_hitl_agent(FakeChatModel(responses=[location_call, "Sunny in San Francisco."]))
+        config = {"configurable": {"thread_id": "fake"}}
+        result = hitl.invoke({"messages": [{"role": "user", "content": "What is the weather in Boston?"}]}, config)
+        assert result["__interrupt__"][0].value["action_requests"][0]["name"] == "get_weather"
+        result = hitl.invoke(Command(resume={"decisions": [
+            {"type": "edit", "edited_action": {"name": "get_weather", "args": {"location": "San Francisco"}}}]}),
+            config)
+        assert result["messages"][2].content == "It's sunny in San Francisco."
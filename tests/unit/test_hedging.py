@@ -0,0 +1,101 @@
+import asyncio
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import fixture, mark
+
+from lctutorial import init_chat_model
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.hedging import HedgedChatModel, HedgePolicy
+from lctutorial.mock_server import MockServer, MockServerConfig
+
+
+@fixture
+def server():
+    # The 21st request stalls for a second, every other one takes 10 ms
+    requests = itertools.count()
+    with MockServer(MockServerConfig(latency=lambda rng: 1.0 if next(requests) == 20 else 0.01)) as mock_server:
+        yield mock_server
+
+
+def hedged_model(server, policy):
+    return init_chat_model(provider="OpenAI", use_model_cache=False, use_http_pool=False, hedging=policy,
+                           **server.model_kwargs("OpenAI"))
+
+
+class TestHedging:
+
+    def test_policy(self):
+        policy = HedgePolicy(percentile=90, budget=0.1, min_samples=10)
+        for latency in range(1, 11):
+            assert policy.delay("invoke") is None
+            policy.record("invoke", latency / 10)
+
+        assert policy.delay("invoke") == 0.9
+        assert policy.delay("stream") is None
+        assert policy.try_hedge()
+        assert not policy.try_hedge()                   # 2 duplicates for 12 calls exceed 10%
+        assert policy.stats().over_budget == 1
+
+    @mark.parametrize("mode", ["invoke", "stream"])
+    def test_slow_call_is_hedged(self, server, mode):
+        # Fast calls take 10 ms, the delay floor keeps scheduling jitter from hedging them
+        policy = HedgePolicy(percentile=90, budget=0.1, min_delay=0.2)
+        model = hedged_model(server, policy)
+
+        latencies = []
+        for i in range(25):
+            start = time.monotonic()
+            if mode == "invoke":
+                text = model.invoke(f"question {i}").text
+            else:
+                text = "".join(chunk.text for chunk in model.stream(f"question {i}"))
+            latencies.append(time.monotonic() - start)
+            assert text.endswith(f"question {i}")
+
+        stats = policy.stats()
+        assert max(latencies) < 0.5
+        assert (stats.hedges, stats.hedge_wins) == (1, 1)
+        # The losing thread can't be interrupted, it holds the hedge slot until its request ends
+        assert model._hedges_in_flight == 1
+        deadline = time.monotonic() + 2
+        while model._hedges_in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert model._hedges_in_flight == 0
+
+    @mark.parametrize("mode", ["ainvoke", "astream"])
+    def test_slow_async_call_is_hedged_and_the_loser_cancelled(self, server, mode):
+        policy = HedgePolicy(percentile=90, budget=0.1, min_delay=0.2)
+        model = hedged_model(server, policy)
+
+        async def call(i):
+            if mode == "ainvoke":
+                return (await model.ainvoke(f"question {i}")).text
+            return "".join([chunk.text async for chunk in model.astream(f"question {i}")])
+
+        async def run():
+            latencies = []
+            for i in range(25):
+                start = time.monotonic()
+                assert (await call(i)).endswith(f"question {i}")
+                latencies.append(time.monotonic() - start)
+            return latencies
+
+        assert max(asyncio.run(run())) < 0.5
+        assert (policy.stats().hedges, policy.stats().hedge_wins) == (1, 1)
+        # The stalled request was cancelled, the server never finished it
+        assert server.stats().statuses[200] == 25
+
+    def test_hedges_in_flight_are_bounded(self):
+        policy = HedgePolicy(budget=1.0, min_samples=10, min_delay=0.05)
+        for _ in range(10):
+            policy.record("invoke", 0.01)
+        # Every call is slow: without the bound each one would hold a second worker
+        model = HedgedChatModel(inner=FakeChatModel(time_to_first_token=0.3), policy=policy, max_hedges_in_flight=2)
+
+        with ThreadPoolExecutor(6) as executor:
+            texts = list(executor.map(lambda i: model.invoke(f"question {i}").text, range(6)))
+
+        assert all(text.endswith(f"question {i}") for i, text in enumerate(texts))
+        assert policy.stats().hedges == 2
@@ -2,16 +2,8 @@ from pytest import fixture, mark
 
 from langgraph.types import Command
 
-from langchain.agents import create_agent
-from langchain.agents.middleware import HumanInTheLoopMiddleware, InterruptOnConfig
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain.tools import tool
-
-from langchain.agents.middleware.types import AgentState, ContextT
-from langgraph.runtime import Runtime
-
 from lctutorial import init_chat_model
-from libs.core.langchain_core.messages.tool import ToolCall
+from lctutorial.hitl_agent import create_hitl_agent
 
 max_output_tokens = 1000
 
@@ -23,46 +15,6 @@ def openai_model():
 def anthropic_model():
     return init_chat_model(provider="Anthropic", tokens=max_output_tokens)
 
-@tool
-def get_weather(location: str) -> str:
-    """Get the weather at a location."""
-    return f"It's sunny in {location}."
-
-
-def create_hitl_agent(model):
-    model.bind_tools([get_weather])
-
-    # Dynamic callable description
-    def format_tool_description(
-            tool_call: ToolCall,
-            state: AgentState,
-            runtime: Runtime[ContextT]
-    ) -> str:
-        import json
-        return (
-            f"Tool: {tool_call['name']}\\n"
-            f"Arguments:\\n{json.dumps(tool_call['args'], indent=2)}"
-        )
-
-    config = InterruptOnConfig(
-        allowed_decisions=["approve", "edit", "reject"],
-        description=format_tool_description
-    )
-
-    agent = create_agent(
-        model=model,
-        tools=[get_weather],
-        middleware=[
-            HumanInTheLoopMiddleware(
-                interrupt_on={f"get_weather": config}
-            ),
-        ],
-        # Human-in-the-loop requires checkpointing to handle interrupts.
-        # In production, use a persistent checkpointer like AsyncPostgresSaver.
-        checkpointer=InMemorySaver(),
-    )
-    return agent
-
 
 @mark.parametrize("model_name", ["anthropic_model", "openai_model"])
 class TestHITLBasics:
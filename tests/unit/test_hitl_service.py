@@ -0,0 +1,158 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from pytest import raises
+
+from lctutorial.bounded_checkpointer import BoundedMemorySaver
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.hitl_agent import create_hitl_agent
+from lctutorial.hitl_service import HITLService
+
+
+def weather(messages):
+    # A get_weather call for the user's city, the answer once the tool ran
+    if isinstance(messages[-1], HumanMessage):
+        city = messages[-1].text.rsplit(" ", 1)[-1].rstrip("?")
+        return AIMessage("", tool_calls=[{"name": "get_weather", "args": {"location": city}, "id": "call_1"}])
+    return f"The weather: {messages[-1].text}"
+
+
+def inputs(count: int) -> dict:
+    return {f"some_id_{i}": {"messages": [{"role": "user", "content": f"What's the weather in City{i}?"}]}
+            for i in range(count)}
+
+
+class TestHITLService:
+
+    def test_bulk_approve(self):
+        model = FakeChatModel(responses=[weather], time_to_first_token=0.01)
+        service = HITLService(create_hitl_agent(model, checkpointer=BoundedMemorySaver()), workers=8)
+
+        async def run():
+            started = await service.start_many(inputs(50))
+            assert all(outcome.interrupted for outcome in started.values())
+            assert len(service.pending("get_weather")) == 50 and service.pending("other") == []
+            return await service.submit(service.approve_all("get_weather"))
+
+        outcomes = asyncio.run(run())
+        assert len(outcomes) == 50
+        for i in range(50):
+            outcome = outcomes[f"some_id_{i}"]
+            assert outcome.error is None and not outcome.interrupted
+            assert outcome.result["messages"][-1].text == f"The weather: It's sunny in City{i}."
+        assert service.pending() == []
+
+    def test_runs_are_bounded_by_workers(self):
+        running = peak = 0
+
+        class Agent:
+            async def ainvoke(self, input, config):
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                if config["configurable"]["thread_id"] == "failing":
+                    raise RuntimeError("Model unavailable")
+                return {"messages": []}
+
+        service = HITLService(Agent(), workers=4)
+        outcomes = asyncio.run(service.start_many({**{str(i): {} for i in range(20)}, "failing": {}}))
+        assert peak == 4
+        assert isinstance(outcomes["failing"].error, RuntimeError)
+        assert outcomes["0"].result == {"messages": []}
+
+    def test_edit_and_reject(self):
+        model = FakeChatModel(responses=[weather])
+        service = HITLService(create_hitl_agent(model, checkpointer=BoundedMemorySaver()))
+
+        async def run():
+            await service.start_many(inputs(2))
+            with raises(ValueError):
+                await service.submit({"some_id_0": []})
+            with raises(KeyError):
+                await service.submit({"unknown": [{"type": "approve"}]})
+            with raises(ValueError):
+                await service.start("some_id_0", {"messages": []})
+            return await service.submit({
+                "some_id_0": [{"type": "edit", "edited_action": {"name": "get_weather",
+                                                                 "args": {"location": "San Francisco"}}}],
+                "some_id_1": [{"type": "reject", "message": "Not allowed"}],
+            })
+
+        outcomes = asyncio.run(run())
+        assert outcomes["some_id_0"].result["messages"][2].text == "It's sunny in San Francisco."
+        assert outcomes["some_id_1"].result["messages"][2].text == "Not allowed"
+
+    def test_failed_resume_keeps_the_review(self):
+        class FlakySaver(BoundedMemorySaver):
+            failures = 0
+
+            async def aget_tuple(self, config):
+                if self.failures:
+                    self.failures -= 1
+                    raise ConnectionError("Checkpoint store unavailable")
+                return await super().aget_tuple(config)
+
+        checkpointer = FlakySaver()
+        service = HITLService(create_hitl_agent(FakeChatModel(responses=[weather]), checkpointer=checkpointer))
+
+        async def run():
+            await service.start_many(inputs(1))
+            with raises(ValueError):
+                await service.submit({"some_id_0": [{"type": "unknown"}]})
+            checkpointer.failures = 1
+            failed = await service.submit(service.approve_all())
+            assert isinstance(failed["some_id_0"].error, ConnectionError) and failed["some_id_0"].interrupted
+            assert [review.thread_id for review in service.pending()] == ["some_id_0"]
+            return await service.submit(service.approve_all())
+
+        outcome = asyncio.run(run())["some_id_0"]
+        assert outcome.error is None and outcome.result["messages"][-1].text == "The weather: It's sunny in City0."
+
+    def test_cancelled_submit_keeps_reviews(self):
+        model = FakeChatModel(responses=[weather], time_to_first_token=0.05)
+        service = HITLService(create_hitl_agent(model, checkpointer=BoundedMemorySaver()), workers=1)
+
+        async def run():
+            await service.start_many(inputs(3))
+            task = asyncio.create_task(service.submit(service.approve_all()))
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        # The first thread was cancelled past its interrupt, the other two still wait for their review
+        assert {review.thread_id for review in service.pending()} == {"some_id_1", "some_id_2"}
+
+    def test_resume_cancelled_at_the_interrupt_keeps_its_review(self):
+        class SlowSaver(BoundedMemorySaver):
+            delay = 0.0
+
+            async def aget_tuple(self, config):
+                await asyncio.sleep(self.delay)
+                return await super().aget_tuple(config)
+
+        checkpointer = SlowSaver()
+        service = HITLService(create_hitl_agent(FakeChatModel(responses=[weather]), checkpointer=checkpointer))
+
+        async def run():
+            await service.start_many(inputs(1))
+            # Cancelled while the resume still loads the checkpoint
+            checkpointer.delay = 0.5
+            task = asyncio.create_task(service.submit(service.approve_all()))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with raises(asyncio.CancelledError):
+                await task
+            checkpointer.delay = 0.0
+            assert [review.thread_id for review in service.pending()] == ["some_id_0"]
+            return await service.submit(service.approve_all())
+
+        outcome = asyncio.run(run())["some_id_0"]
+        assert outcome.error is None and outcome.result["messages"][-1].text == "The weather: It's sunny in City0."
+
+    def test_workers_must_be_positive(self):
+        with raises(ValueError):
+            HITLService(None, workers=0)
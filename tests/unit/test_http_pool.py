@@ -0,0 +1,61 @@
+import httpx
+from pytest import fixture, raises
+
+from lctutorial import http_pool, init_chat_model
+
+
+@fixture(autouse=True)
+def api_keys(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-ant-test")
+    yield
+    http_pool.configure_http_pool(**vars(http_pool.PoolConfig()))
+
+
+class TestHttpPool:
+
+    def test_models_share_the_pooled_clients(self):
+        openai_model = init_chat_model(provider="OpenAI", tokens=10, use_model_cache=False)
+        anthropic_model = init_chat_model(provider="Anthropic", tokens=10, use_model_cache=False)
+
+        sync_client = http_pool.get_http_client()
+        async_client = http_pool.get_async_http_client()
+
+        assert openai_model.root_client._client is sync_client
+        assert openai_model.root_async_client._client is async_client
+        assert anthropic_model._client._client is sync_client
+        assert anthropic_model._async_client._client is async_client
+
+    def test_opt_out_and_explicit_client(self):
+        own_client = httpx.Client()
+        model = init_chat_model(provider="Anthropic", use_model_cache=False, http_client=own_client)
+        assert model._client._client is own_client
+
+        model = init_chat_model(provider="Anthropic", use_model_cache=False, use_http_pool=False)
+        assert model._client._client is not http_pool.get_http_client()
+
+    def test_models_with_a_proxy_build_their_own_clients(self, monkeypatch):
+        openai_model = init_chat_model(provider="OpenAI", use_model_cache=False, openai_proxy="http://proxy:8080")
+        assert openai_model.openai_proxy == "http://proxy:8080"
+        assert openai_model.root_client._client is not http_pool.get_http_client()
+
+        anthropic_model = init_chat_model(provider="Anthropic", use_model_cache=False,
+                                          anthropic_proxy="http://proxy:8080")
+        assert anthropic_model.http_client is None
+        assert anthropic_model._client._client is not http_pool.get_http_client()
+
+        monkeypatch.setenv("ANTHROPIC_PROXY", "http://proxy:8080")
+        assert init_chat_model(provider="Anthropic", use_model_cache=False).http_client is None
+        with raises(ValueError):
+            init_chat_model(provider="Anthropic", use_model_cache=False, http_client=httpx.Client())
+
+    def test_configure_http_pool(self):
+        before = http_pool.get_http_client()
+
+        config = http_pool.configure_http_pool(max_connections=7, keepalive_expiry=5.0)
+
+        assert config.max_connections == 7
+        assert config.max_keepalive_connections == http_pool.PoolConfig().max_keepalive_connections
+        after = http_pool.get_http_client()
+        assert after is not before
+        assert after is http_pool.get_http_client()
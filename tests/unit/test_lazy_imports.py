@@ -0,0 +1,42 @@
+import json
+import subprocess
+import sys
+
+from pytest import mark
+
+HEAVY_MODULES = ["langchain", "langchain.chat_models", "langchain_openai", "langchain_anthropic",
+                 "openai", "anthropic", "httpx", "dotenv"]
+
+
+def imported_modules(statement: str) -> set[str]:
+    """Run the import in a fresh interpreter and return the names of all loaded modules."""
+    code = f"import json, sys; {statement}; print(json.dumps(sorted(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return set(json.loads(output))
+
+
+class TestLazyImports:
+
+    @mark.parametrize("statement", [
+        "import lctutorial",
+        "from lctutorial import init_chat_model",
+        "import lctutorial.weather_agent",
+        "import lctutorial.summarize_agent",
+    ])
+    def test_import_does_not_load_langchain_or_provider_sdks(self, statement):
+        loaded = imported_modules(statement)
+
+        assert not loaded.intersection(HEAVY_MODULES)
+
+    def test_tool_still_available(self):
+        from lctutorial.summarize_agent import summarize_conversation
+
+        assert summarize_conversation.name == "summarize_conversation"
+
+    def test_provider_sdk_loaded_on_first_use(self):
+        loaded = imported_modules(
+            "import os; os.environ['ANTHROPIC_API_KEY'] = 'sk-ant-test'; "
+            "from lctutorial import init_chat_model; init_chat_model(provider='Anthropic')")
+
+        assert "langchain_anthropic" in loaded
+        assert "langchain_openai" not in loaded
@@ -0,0 +1,109 @@
+import time
+from typing import Optional
+
+import anthropic
+import openai
+from pydantic import BaseModel, Field
+from pytest import fixture, raises
+
+from lctutorial import init_chat_model
+from lctutorial.mock_server import MockServer, MockServerConfig, Reply, example_from_schema, fixed
+
+
+class Actor(BaseModel):
+    name: str = Field(..., description="The actor's name")
+
+
+class Movie(BaseModel):
+    """A movie with details."""
+    title: str = Field(..., description="The title of the movie")
+    year: int = Field(..., description="The year the movie was released")
+    cast: Optional[list[Actor]] = Field(None, description="List of main actors in the movie")
+
+
+def get_weather(city: str) -> str:
+    """Get weather for a given city."""
+    return f"It's always sunny in {city}!"
+
+
+def concat(chunks):
+    full = None
+    for chunk in chunks:
+        full = chunk if full is None else full + chunk
+    return full
+
+
+@fixture
+def server():
+    with MockServer() as mock_server:
+        yield mock_server
+
+
+class TestMockServer:
+
+    def test_openai_chat_completions(self, server):
+        model = init_chat_model(provider="OpenAI", use_model_cache=False, **server.model_kwargs("OpenAI"))
+
+        assert model.invoke("hi").text == "This is a mock response to: hi"
+        response = model.bind_tools([get_weather]).invoke("what is the weather in Boston")
+        assert response.tool_calls[0]["name"] == "get_weather"
+        assert response.usage_metadata["total_tokens"] > 0
+        streamed = concat(model.bind_tools([get_weather]).stream("what is the weather in Boston"))
+        assert streamed.tool_calls[0]["args"] == {"city": "example"}
+        assert "".join(chunk.text for chunk in model.stream("hi")) == "This is a mock response to: hi"
+
+    def test_openai_responses_structured_output(self, server):
+        model = init_chat_model(provider="OpenAI", use_model_cache=False, use_responses_api=True,
+                                **server.model_kwargs("OpenAI"))
+
+        movie = model.with_structured_output(Movie).invoke("Provide details about the movie Inception")
+
+        assert movie.cast is not None
+        assert concat(model.stream("hi")).text == "This is a mock response to: hi"
+
+    def test_anthropic_messages(self, server):
+        model = init_chat_model(provider="Anthropic", use_model_cache=False, **server.model_kwargs("Anthropic"))
+
+        streamed = concat(model.bind_tools([get_weather]).stream("what is the weather in Boston"))
+        assert streamed.tool_calls[0]["name"] == "get_weather"
+        client = anthropic.Anthropic(base_url=server.base_url, api_key="sk-ant-mock")
+        response = client.beta.messages.parse(
+            model="claude-sonnet-4-5", betas=["structured-outputs-2025-11-13"], max_tokens=1024,
+            messages=[{"role": "user", "content": "Provide details about the movie Inception"}],
+            output_format=Movie)
+        assert response.parsed_output.cast is not None
+
+    def test_latency_pacing_and_responder(self):
+        config = MockServerConfig(latency=fixed(0.05), tokens_per_second=100,
+                                  responder=lambda request: Reply(text="one two three four five"))
+        with MockServer(config) as server:
+            model = init_chat_model(provider="OpenAI", use_model_cache=False, **server.model_kwargs("OpenAI"))
+
+            start = time.perf_counter()
+            text = "".join(chunk.text for chunk in model.stream("hi"))
+
+            assert text == "one two three four five"
+            assert time.perf_counter() - start >= 0.05 + 5 / 100
+
+    def test_error_injection_and_rate_limits(self):
+        config = MockServerConfig(errors={500: 1.0})
+        with MockServer(config) as server:
+            client = openai.OpenAI(base_url=f"{server.base_url}/v1", api_key="sk-mock", max_retries=0)
+            with raises(openai.InternalServerError):
+                client.chat.completions.create(model="gpt-4.1", messages=[{"role": "user", "content": "hi"}])
+            assert server.stats().injected[500] == 1
+
+        with MockServer(MockServerConfig(requests_per_minute=2)) as server:
+            client = anthropic.Anthropic(base_url=server.base_url, api_key="sk-ant-mock", max_retries=0)
+            create = client.messages.with_raw_response.create
+            first = create(model="claude", max_tokens=10, messages=[{"role": "user", "content": "hi"}])
+            create(model="claude", max_tokens=10, messages=[{"role": "user", "content": "hi"}])
+            with raises(anthropic.RateLimitError):
+                create(model="claude", max_tokens=10, messages=[{"role": "user", "content": "hi"}])
+
+            assert first.headers["anthropic-ratelimit-requests-remaining"] == "1"
+            assert server.stats().rate_limited == 1
+
+    def test_example_from_schema(self):
+        assert example_from_schema(Movie.model_json_schema()) == {
+            "title": "example", "year": 1, "cast": [{"name": "example"}]}
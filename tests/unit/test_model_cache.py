@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from pytest import fixture
+
+from lctutorial import init_chat_model, model_cache_clear, model_cache_info, set_model_cache_maxsize
+from lctutorial.model_cache import ModelCache, normalize_kwargs
+
+
+@fixture(autouse=True)
+def fresh_model_cache(monkeypatch):
+    # Constructing the clients needs a key but no network access
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "sk-ant-test")
+    model_cache_clear()
+    set_model_cache_maxsize(32)
+    yield
+    model_cache_clear()
+    set_model_cache_maxsize(32)
+
+
+class TestModelCache:
+
+    def test_identical_arguments_reuse_instance(self):
+        first = init_chat_model(provider="OpenAI", tokens=50)
+        second = init_chat_model(provider="OpenAI", tokens=50)
+
+        assert first is second
+        info = model_cache_info()
+        assert info.hits == 1
+        assert info.misses == 1
+        assert info.currsize == 1
+
+    def test_different_arguments_build_new_instance(self):
+        openai_model = init_chat_model(provider="OpenAI", tokens=50)
+
+        assert init_chat_model(provider="OpenAI", tokens=100) is not openai_model
+        assert init_chat_model(provider="Anthropic", tokens=50) is not openai_model
+        assert init_chat_model(provider="OpenAI", tokens=50, temperature=0) is not openai_model
+        assert model_cache_info().misses == 4
+
+    def test_kwargs_order_does_not_matter(self):
+        first = init_chat_model(provider="OpenAI", temperature=0, max_retries=1)
+        second = init_chat_model(provider="OpenAI", max_retries=1, temperature=0)
+
+        assert first is second
+
+    def test_opt_out(self):
+        first = init_chat_model(provider="OpenAI", tokens=50, use_model_cache=False)
+        second = init_chat_model(provider="OpenAI", tokens=50, use_model_cache=False)
+
+        assert first is not second
+        assert model_cache_info() == (0, 0, 32, 0)
+
+    def test_lru_eviction(self):
+        set_model_cache_maxsize(2)
+
+        first = init_chat_model(provider="OpenAI", tokens=1)
+        init_chat_model(provider="OpenAI", tokens=2)
+        init_chat_model(provider="OpenAI", tokens=1)    # Refresh tokens=1, tokens=2 is now the oldest
+        init_chat_model(provider="OpenAI", tokens=3)    # Evicts tokens=2
+
+        assert model_cache_info().currsize == 2
+        assert init_chat_model(provider="OpenAI", tokens=1) is first
+        misses = model_cache_info().misses
+        init_chat_model(provider="OpenAI", tokens=2)
+        assert model_cache_info().misses == misses + 1
+
+    def test_unknown_provider_is_not_cached(self):
+        assert init_chat_model(provider="Unknown") is None
+        assert model_cache_info().currsize == 0
+
+    def test_concurrent_callers_share_one_instance(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            models = list(pool.map(lambda _: init_chat_model(provider="Anthropic", tokens=10), range(32)))
+
+        assert all(model is models[0] for model in models)
+
+    def test_normalize_kwargs(self):
+        assert normalize_kwargs({"b": [1, 2], "a": {"y": 1, "x": 2}}) == normalize_kwargs(
+            {"a": {"x": 2, "y": 1}, "b": (1, 2)})
+        assert ModelCache.make_key("OpenAI", None, {"a": 1}) != ModelCache.make_key("Anthropic", None, {"a": 1})
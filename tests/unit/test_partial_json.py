@@ -0,0 +1,85 @@
+import json
+
+from pytest import raises
+
+from langchain_core.messages import AIMessage
+
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.partial_json import IncrementalJSONParser, ToolCallStreamParser
+
+document = {"city": "Zürich \"Altstadt\"\n😀", "days": [1, -2.5e3, [], {}], "metric": True, "unit": None}
+
+
+def feed_in_pieces(text: str, size: int) -> IncrementalJSONParser:
+    parser = IncrementalJSONParser()
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+    return parser
+
+
+class TestIncrementalJSONParser:
+
+    def test_any_fragmentation_gives_the_document(self):
+        for ensure_ascii in (True, False):
+            text = json.dumps(document, ensure_ascii=ensure_ascii)
+            for size in (1, 2, 3, 7, len(text)):
+                parser = feed_in_pieces(text, size)
+                assert parser.complete
+                assert parser.finish() == document
+
+    def test_partial_values(self):
+        parser = IncrementalJSONParser()
+
+        assert parser.feed('{"ci') == {}
+        assert parser.feed('ty": "Bo') == {"city": "Bo"}
+        assert parser.feed('ston", "days": [1, 2') == {"city": "Boston", "days": [1]}
+        assert not parser.complete
+        assert parser.feed(', 3]}') == {"city": "Boston", "days": [1, 2, 3]}
+        assert parser.complete
+
+        parser = IncrementalJSONParser(include_partial_strings=False)
+        assert parser.feed('{"city": "Bo') == {}
+
+    def test_invalid_json_raises(self):
+        for text in ('{"a" 1}', "[1,]", "{,}", "tru e", '{"a": 1}}', '"\\x"'):
+            with raises(ValueError):
+                IncrementalJSONParser().feed(text)
+        with raises(ValueError):
+            IncrementalJSONParser().finish()
+
+
+class TestToolCallStreamParser:
+
+    def test_calls_complete_while_streaming(self):
+        model = FakeChatModel(responses=[AIMessage("", tool_calls=[
+            {"name": "get_weather", "args": {"city": "Boston"}, "id": "call_1"},
+            {"name": "get_weather", "args": {"city": "Tokyo"}, "id": "call_2"}])])
+        calls = ToolCallStreamParser()
+
+        completed_after = []
+        for chunk_number, chunk in enumerate(model.stream("What's the weather in Boston and Tokyo?")):
+            calls.add(chunk)
+            completed_after.append(len(calls.completed()))
+
+        assert completed_after.index(1) < completed_after.index(2)
+        assert [call.to_tool_call() for call in calls.completed()] == [
+            {"name": "get_weather", "args": {"city": "Boston"}, "id": "call_1", "type": "tool_call"},
+            {"name": "get_weather", "args": {"city": "Tokyo"}, "id": "call_2", "type": "tool_call"}]
+
+    def test_fragments_are_consumed_once(self):
+        calls = ToolCallStreamParser()
+        fragments = ['{"ci', 'ty": ', '"Par', 'is"}']
+
+        calls.add([{"name": "get_weather", "id": "call_1", "args": "", "index": 0, "type": "tool_call_chunk"}])
+        for fragment in fragments:
+            changed = calls.add([{"name": None, "id": None, "args": fragment, "index": 0, "type": "tool_call_chunk"}])
+
+        assert changed[0].complete
+        assert changed[0].parser.consumed == len("".join(fragments))
+
+    def test_finish_completes_calls_without_args(self):
+        calls = ToolCallStreamParser()
+        calls.add([{"name": "get_time", "id": "toolu_1", "args": "", "index": 1, "type": "tool_call_chunk"}])
+
+        assert calls.completed() == []
+        assert calls.finish() == [{"name": "get_time", "args": {}, "id": "toolu_1", "type": "tool_call"}]
@@ -0,0 +1,176 @@
+import copy
+import json
+
+from langchain.agents import create_agent
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from pydantic import BaseModel, Field
+from pytest import fixture, mark
+
+from lctutorial import init_chat_model
+from lctutorial.mock_server import MockServer
+from lctutorial.prompt_cache import (PromptCacheUsage, add_anthropic_cache_breakpoints, canonical_schema,
+                                    canonicalize_openai_payload, openai_prompt_cache_key)
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+@tool
+def get_weather(city: str) -> str:
+    """Get weather for a given city."""
+    return f"It's always sunny in {city}!"
+
+
+@fixture
+def payload():
+    return {
+        "model": "claude-sonnet-4-5-20250929",
+        "tools": [{"name": "get_weather", "input_schema": {}}, {"name": "get_population", "input_schema": {}}],
+        "system": "You are a helpful assistant",
+        "messages": [
+            {"role": "user", "content": "What is the weather in Paris?"},
+            {"role": "assistant", "content": [{"type": "tool_use", "id": "1", "name": "get_weather", "input": {}}]},
+            {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "1", "content": "Sunny"}]},
+        ],
+    }
+
+
+class TestBreakpoints:
+
+    def test_stable_prefix_is_marked(self, payload):
+        original = copy.deepcopy(payload)
+        marked = add_anthropic_cache_breakpoints(payload)
+
+        assert payload == original                                  # Not modified in place
+        assert marked["tools"][-1]["cache_control"] == EPHEMERAL
+        assert "cache_control" not in marked["tools"][0]
+        assert marked["system"] == [{"type": "text", "text": "You are a helpful assistant",
+                                     "cache_control": EPHEMERAL}]
+        messages = marked["messages"]
+        assert messages[2]["content"][-1]["cache_control"] == EPHEMERAL    # End of the conversation
+        assert messages[0]["content"][-1]["cache_control"] == EPHEMERAL    # End of the previous request
+        assert "cache_control" not in messages[1]["content"][-1]
+
+    def test_existing_breakpoints_count(self, payload):
+        payload["system"] = [{"type": "text", "text": "Rules", "cache_control": EPHEMERAL},
+                             {"type": "text", "text": "You are a helpful assistant"}]
+        payload["tools"][0]["cache_control"] = EPHEMERAL
+        marked = add_anthropic_cache_breakpoints(payload, ttl="1h")
+
+        assert marked["system"][-1]["cache_control"] == {"type": "ephemeral", "ttl": "1h"}
+        assert marked["tools"][-1]["cache_control"] == {"type": "ephemeral", "ttl": "1h"}
+        assert "cache_control" not in str(marked["messages"])       # Only 4 breakpoints per request
+
+    def test_single_turn(self):
+        marked = add_anthropic_cache_breakpoints({"messages": [{"role": "user", "content": "hi"}]})
+        assert marked["messages"][0]["content"] == [{"type": "text", "text": "hi", "cache_control": EPHEMERAL}]
+
+    def test_chat_anthropic_payload(self):
+        model = init_chat_model(provider="Anthropic", use_model_cache=False, api_key="sk-ant-test",
+                                prompt_caching=True).bind_tools([get_weather])
+        payload = model.bound._get_request_payload("hi", **model.kwargs)
+        assert payload["tools"][-1]["cache_control"] == EPHEMERAL
+        assert "cache_control" not in model.kwargs["tools"][-1]
+
+        plain = init_chat_model(provider="Anthropic", use_model_cache=False, api_key="sk-ant-test")
+        assert "cache_control" not in str(plain._get_request_payload("hi"))
+
+
+class TestPromptCacheUsage:
+
+    def test_agent_reads_prefix_from_cache(self):
+        usage = PromptCacheUsage()
+        with MockServer() as server:
+            model = init_chat_model(provider="Anthropic", use_model_cache=False, use_http_pool=False,
+                                    prompt_caching=True, **server.model_kwargs("Anthropic"))
+            agent = create_agent(model, tools=[get_weather], system_prompt="You are a helpful assistant",
+                                 checkpointer=InMemorySaver())
+            for thread_id in ("1", "2"):
+                config = {"configurable": {"thread_id": thread_id}, "callbacks": [usage]}
+                for city in ("Paris", "Tokyo"):
+                    agent.invoke({"messages": [{"role": "user", "content": f"What is the weather in {city}?"}]},
+                                 config)
+
+        threads = usage.by_thread()
+        assert set(threads) == {"1", "2"}
+        for thread in threads.values():
+            assert thread.calls == 4
+            assert thread.cache_creation > 0
+            assert 0.5 < thread.read_share < 1.0
+        # The second thread starts with the tools and the system prompt in the cache already
+        assert threads["2"].cache_creation < threads["1"].cache_creation
+        assert usage.total().cache_read == threads["1"].cache_read + threads["2"].cache_read
+
+
+class GetWeather(BaseModel):
+    """Get the current weather in a given location"""
+
+    location: str = Field(..., description="The city and state, e.g. San Francisco, CA")
+    unit: str = Field("celsius", description="celsius or fahrenheit")
+
+
+class GetPopulation(BaseModel):
+    """Get the current population in a given location"""
+
+    location: str = Field(..., description="The city and state, e.g. San Francisco, CA")
+
+
+class TestOpenAICanonicalization:
+
+    def test_canonical_schema_keeps_property_order(self):
+        schema = {"type": "object", "required": ["b"], "properties": {"b": {"type": "string", "description": "B"},
+                                                                     "a": {"type": "integer"}}}
+        canonical = canonical_schema(schema)
+        assert list(canonical) == ["properties", "required", "type"]
+        assert list(canonical["properties"]) == ["b", "a"]
+        assert list(canonical["properties"]["b"]) == ["description", "type"]
+
+    def test_payload_is_byte_stable(self):
+        def payload(tools, first):
+            return {"model": "gpt-4.1", "tools": tools, "messages": [
+                {"role": "system", "content": first}, {"role": "user", "content": "hi"}]}
+
+        weather = {"type": "function", "function": {"name": "get_weather", "parameters": {"type": "object"}}}
+        shuffled = {"function": {"parameters": {"type": "object"}, "name": "get_weather"}, "type": "function"}
+        population = {"type": "function", "function": {"name": "get_population", "parameters": {}}}
+        one = canonicalize_openai_payload(payload([weather, population], "You are a helpful assistant"))
+        other = canonicalize_openai_payload(payload([population, shuffled], "You are a helpful assistant"))
+
+        assert json.dumps(one) == json.dumps(other)
+        assert [tool["function"]["name"] for tool in one["tools"]] == ["get_population", "get_weather"]
+        assert openai_prompt_cache_key(one) == openai_prompt_cache_key(other)
+        assert openai_prompt_cache_key(one) != openai_prompt_cache_key(payload([weather], "Be brief"))
+
+    def test_messages_keep_their_order(self):
+        messages = [{"role": "system", "content": "You are a helpful assistant"},
+                    {"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"},
+                    {"role": "system", "content": "Answer in French"}, {"role": "user", "content": "weather?"}]
+        payload = {"model": "gpt-4.1", "messages": messages}
+
+        assert canonicalize_openai_payload(payload)["messages"] == messages
+        # Only the leading system prompt is part of the agent's key
+        assert openai_prompt_cache_key(payload) == openai_prompt_cache_key({**payload, "messages": messages[:2]})
+
+    def test_init_chat_model(self):
+        model = init_chat_model(provider="OpenAI", use_model_cache=False, api_key="sk-test", prompt_caching=True)
+        payload = model._get_request_payload("hi")
+        assert payload["prompt_cache_key"].startswith("lct-")
+        assert model._get_request_payload("hi", prompt_cache_key="tenant-1")["prompt_cache_key"] == "tenant-1"
+
+    @mark.parametrize("prompt_caching", [True, False])
+    def test_cached_tokens_hit_rate(self, prompt_caching):
+        usage = PromptCacheUsage()
+        messages = [{"role": "user", "content": "Which is bigger, LA or NYC? " * 20}]
+        with MockServer() as server:
+            model = init_chat_model(provider="OpenAI", use_model_cache=False, use_http_pool=False,
+                                    prompt_caching=prompt_caching, **server.model_kwargs("OpenAI"))
+            # Two code paths binding the same tools in a different order
+            for tools in ([GetWeather, GetPopulation], [GetPopulation, GetWeather]):
+                model.bind_tools(tools).invoke(messages, {"callbacks": [usage]})
+
+        total = usage.total()
+        assert total.calls == 2
+        if prompt_caching:
+            assert total.hit_rate == 0.5 and total.read_share > 0.4
+        else:
+            assert total.hit_rate == 0.0
@@ -0,0 +1,108 @@
+import asyncio
+import subprocess
+import sys
+import textwrap
+
+from langchain_core.messages import HumanMessage
+from pytest import raises
+
+from lctutorial import init_chat_model
+from lctutorial.rate_limiter import (DEFAULT_OUTPUT_TOKENS, FileBucketStore, ProviderRateLimiter, RateLimit,
+                                     estimate_tokens)
+
+
+class TestProviderRateLimiter:
+
+    def test_request_bucket(self):
+        limiter = ProviderRateLimiter({"OpenAI": RateLimit(requests_per_minute=6)})
+
+        assert all(limiter.acquire("OpenAI:gpt-4.1", blocking=False) for _ in range(6))
+        assert not limiter.acquire("OpenAI:gpt-4.1", blocking=False)
+        assert 9 < limiter.try_acquire("OpenAI:gpt-4.1") <= 10
+        # Every model has buckets of its own, providers without limits are not limited
+        assert limiter.acquire("OpenAI:gpt-5", blocking=False)
+        assert limiter.acquire("Anthropic:claude-sonnet-4-5", blocking=False)
+
+    def test_model_limits_win_over_provider_limits(self):
+        limiter = ProviderRateLimiter({"OpenAI": RateLimit(requests_per_minute=1),
+                                       "OpenAI:gpt-4.1-mini": RateLimit(requests_per_minute=100)})
+
+        assert limiter.limit_for("OpenAI:gpt-4.1-mini").requests_per_minute == 100
+        assert limiter.limit_for("OpenAI:gpt-4.1").requests_per_minute == 1
+
+    def test_tokens_are_estimated_and_settled(self):
+        limiter = ProviderRateLimiter({"Fake": RateLimit(tokens_per_minute=3000)})
+        model = init_chat_model(provider="Fake", use_model_cache=False, tokens=1000, rate_limiter=limiter)
+        estimated = estimate_tokens([HumanMessage("what is the weather in Paris")], 1000)
+
+        model.invoke("what is the weather in Paris")
+        model.invoke("what is the weather in Paris")
+
+        # The fake response uses far fewer than max_tokens, the difference was given back
+        assert limiter.try_acquire("Fake:fake-model", 2 * estimated) == 0
+        assert estimate_tokens([HumanMessage("hi")]) == DEFAULT_OUTPUT_TOKENS + estimate_tokens([HumanMessage("hi")], 0)
+
+    def test_model_limit_applies_behind_adaptive_concurrency(self):
+        limiter = ProviderRateLimiter({"Fake": RateLimit(requests_per_minute=100),
+                                       "Fake:fake-mini": RateLimit(requests_per_minute=1)})
+        model = init_chat_model(provider="Fake", model_name="fake-mini", adaptive_concurrency=True,
+                                rate_limiter=limiter)
+
+        assert model.rate_limiter_key == "Fake:fake-mini"
+        model.invoke("hi")
+        assert not limiter.acquire("Fake:fake-mini", blocking=False)
+        default = init_chat_model(provider="Fake", adaptive_concurrency=True, rate_limiter=limiter)
+        assert default.rate_limiter_key == "Fake:fake-model"
+
+    def test_max_tokens_of_the_model_behind_adaptive_concurrency(self):
+        limiter = ProviderRateLimiter({"Fake": RateLimit(tokens_per_minute=3000)})
+        model = init_chat_model(provider="Fake", tokens=10, adaptive_concurrency=True, rate_limiter=limiter)
+
+        assert model._estimate([HumanMessage("hi")]) == estimate_tokens([HumanMessage("hi")], 10)
+
+    def test_streams_closed_early_settle_what_they_received(self):
+        limiter = ProviderRateLimiter({"Fake": RateLimit(tokens_per_minute=3000)})
+        model = init_chat_model(provider="Fake", tokens=1000, rate_limiter=limiter)
+        question = [HumanMessage("what is the weather in Paris")]
+
+        stream = model.stream(question)
+        next(stream)
+        stream.close()
+        assert limiter.try_acquire("Fake:fake-model", 3000 - estimate_tokens(question, 1)) == 0
+
+        async def first_chunk():
+            async for _ in model.astream(question):
+                break
+
+        limiter = model.provider_rate_limiter = ProviderRateLimiter({"Fake": RateLimit(tokens_per_minute=3000)})
+        asyncio.run(first_chunk())
+        assert limiter.try_acquire("Fake:fake-model", 3000 - estimate_tokens(question, 1)) == 0
+
+    def test_failed_calls_give_their_tokens_back(self):
+        def fail(messages):
+            raise RuntimeError("Upstream error")
+
+        limiter = ProviderRateLimiter({"Fake": RateLimit(tokens_per_minute=3000)})
+        model = init_chat_model(provider="Fake", tokens=1000, responses=[fail], rate_limiter=limiter)
+        for call in (model.invoke, lambda text: list(model.stream(text))):
+            with raises(RuntimeError):
+                call("what is the weather in Paris")
+
+        assert limiter.try_acquire("Fake:fake-model", 3000) == 0
+
+    def test_file_store_is_shared_by_processes(self, tmp_path):
+        code = textwrap.dedent(f"""
+            from lctutorial.rate_limiter import FileBucketStore, ProviderRateLimiter, RateLimit
+            limiter = ProviderRateLimiter({{"OpenAI": RateLimit(requests_per_minute=6)}},
+                                          store=FileBucketStore({str(tmp_path / "buckets")!r}))
+            print(sum(limiter.acquire("OpenAI:gpt-4.1", blocking=False) for _ in range(10)))
+        """)
+        workers = [subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True)
+                   for _ in range(2)]
+        granted = sum(int(worker.communicate()[0]) for worker in workers)
+
+        # 6 in the bucket, plus one more if the workers took longer than the 10 second refill
+        assert 6 <= granted <= 7
+        limiter = ProviderRateLimiter({"OpenAI": RateLimit(requests_per_minute=6)},
+                                      store=FileBucketStore(str(tmp_path / "buckets")))
+        assert not limiter.acquire("OpenAI:gpt-4.1", blocking=False)
@@ -0,0 +1,157 @@
+import time
+
+from pytest import fixture, mark, raises
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration
+
+from lctutorial.response_cache import CachedChatModel, ResponseCache, replay_chunks
+
+weather_answer = "It's always sunny in Paris!"
+
+
+def fake_model(*responses: AIMessage) -> GenericFakeChatModel:
+    # Raises StopIteration when called more often than there are responses, i.e. on unexpected cache misses
+    return GenericFakeChatModel(messages=iter(responses))
+
+
+@fixture
+def cache(tmp_path):
+    response_cache = ResponseCache(maxsize=16, path=str(tmp_path / "responses.sqlite"))
+    yield response_cache
+    response_cache.close()
+
+
+class TestResponseCache:
+
+    def test_invoke_is_served_from_cache(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage(weather_answer)), response_cache=cache)
+
+        first = model.invoke("what is the weather in Paris")
+        second = model.invoke("what is the weather in Paris")
+
+        assert first.text == second.text == weather_answer
+        assert first.id != second.id
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.memory_hits) == (1, 1, 1)
+        assert stats.latency_saved >= 0
+
+    def test_different_prompts_and_params_are_different_entries(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage("a"), AIMessage("b"), AIMessage("c")),
+                                response_cache=cache)
+
+        assert model.invoke("what is the weather in Paris").text == "a"
+        assert model.invoke("what is the weather in Tokyo").text == "b"
+        assert model.invoke("what is the weather in Paris", stop=["!"]).text == "c"
+        assert cache.stats().misses == 3
+
+    def test_stream_replays_cached_response(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage(weather_answer)), response_cache=cache)
+        model.invoke("what is the weather in Paris")
+
+        chunks = list(model.stream("what is the weather in Paris"))
+
+        assert len(chunks) > 2
+        assert all(isinstance(chunk, AIMessageChunk) for chunk in chunks)
+        full = chunks[0]
+        for chunk in chunks[1:]:
+            full = full + chunk
+        assert full.text == weather_answer
+        assert cache.stats().hits == 1
+
+    def test_streamed_response_is_cached(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage(weather_answer)), response_cache=cache)
+
+        streamed = "".join(chunk.text for chunk in model.stream("what is the weather in Paris"))
+
+        assert streamed == weather_answer
+        assert model.invoke("what is the weather in Paris").text == weather_answer
+
+    @mark.asyncio
+    async def test_async_calls(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage(weather_answer)), response_cache=cache)
+
+        assert (await model.ainvoke("what is the weather in Paris")).text == weather_answer
+        streamed = [chunk.text async for chunk in model.astream("what is the weather in Paris")]
+
+        assert "".join(streamed) == weather_answer
+        assert cache.stats().hits == 1
+
+    def test_sqlite_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "responses.sqlite")
+        first_cache = ResponseCache(path=path)
+        CachedChatModel(inner=fake_model(AIMessage(weather_answer)), response_cache=first_cache).invoke("hi")
+        first_cache.close()
+
+        second_cache = ResponseCache(path=path)
+        model = CachedChatModel(inner=fake_model(), response_cache=second_cache)
+
+        assert model.invoke("hi").text == weather_answer
+        assert second_cache.stats().sqlite_hits == 1
+        second_cache.close()
+
+    def test_ttl_expires_entries(self):
+        cache = ResponseCache(ttl=0.05)
+        model = CachedChatModel(inner=fake_model(AIMessage("old"), AIMessage("new")), response_cache=cache)
+
+        assert model.invoke("hi").text == "old"
+        time.sleep(0.1)
+        assert model.invoke("hi").text == "new"
+
+    def test_memory_lru_and_db_size_eviction(self, tmp_path):
+        cache = ResponseCache(maxsize=2, path=str(tmp_path / "responses.sqlite"), max_db_bytes=2000)
+        generations = [ChatGeneration(message=AIMessage("x" * 200))]
+
+        for i in range(10):
+            cache.update(f"prompt {i}", "llm", generations)
+
+        assert len(cache._memory) == 2
+        assert cache._db_bytes <= 2000
+        assert cache.lookup("prompt 9", "llm") is not None
+        assert cache.lookup("prompt 0", "llm") is None
+        assert cache.stats().evictions > 0
+        cache.close()
+
+    def test_misses_without_response_are_forgotten(self):
+        cache = ResponseCache(max_pending=4)
+        failing = CachedChatModel(inner=fake_model(), response_cache=cache)
+
+        for i in range(10):
+            with raises(Exception):
+                failing.invoke(f"question {i}")
+
+        assert cache.stats().misses == 10
+        assert len(cache._pending) == 4
+
+    def test_replay_chunks_round_trip(self):
+        message = AIMessage(
+            content="Let me check.",
+            tool_calls=[{"name": "get_weather", "args": {"city": "Boston"}, "id": "call_1"},
+                        {"name": "get_weather", "args": {"city": "Tokyo"}, "id": "call_2"}],
+            usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+        )
+
+        chunks = list(replay_chunks(message))
+        full = chunks[0]
+        for chunk in chunks[1:]:
+            full = full + chunk
+
+        assert full.text == message.text
+        assert full.tool_calls == message.tool_calls
+        assert full.usage_metadata == message.usage_metadata
+
+    def test_init_chat_model_with_response_cache(self, monkeypatch, cache):
+        from lctutorial import init_chat_model
+
+        def get_weather(city: str) -> str:
+            """Get weather for a given city."""
+            return f"It's always sunny in {city}!"
+
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        model = init_chat_model(provider="OpenAI", response_cache=cache, use_model_cache=False)
+
+        assert isinstance(model, CachedChatModel)
+        bound = model.bind_tools([get_weather])
+        assert bound.bound is model
+        assert bound.kwargs["tools"][0]["function"]["name"] == "get_weather"
@@ -0,0 +1,136 @@
+import asyncio
+
+from langchain_core.tools import tool
+from pytest import fixture, mark, raises
+
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.routing import RouteCandidate, Router, RoutingChatModel, init_routing_model
+
+
+class Outage:
+    """Response script of a candidate that fails while `down` is set."""
+
+    def __init__(self):
+        self.down = False
+
+    def __call__(self, messages):
+        if self.down:
+            raise ConnectionError("provider unavailable")
+        return "answer from {input}"
+
+
+@fixture
+def outage():
+    return Outage()
+
+
+@fixture
+def candidates(outage):
+    return [
+        RouteCandidate("slow-cheap", FakeChatModel(responses=["slow"], time_to_first_token=0.05), cost=0.1),
+        RouteCandidate("fast-expensive", FakeChatModel(responses=[outage], time_to_first_token=0.005), cost=3.0),
+    ]
+
+
+def routed_to(model, prompt="hi"):
+    return model.invoke(prompt).response_metadata["routed_to"]
+
+
+class TestRouting:
+
+    def test_fastest(self, candidates):
+        model = RoutingChatModel(router=Router(candidates, policy="fastest", explore=0.0))
+
+        # Both candidates are measured first, then the fast one takes every call
+        assert [routed_to(model) for _ in range(5)] == ["slow-cheap", "fast-expensive"] + ["fast-expensive"] * 3
+        stats = model.router.stats()
+        assert stats["fast-expensive"].p50_latency < stats["slow-cheap"].p50_latency
+        assert stats["fast-expensive"].calls == 4
+
+    def test_cheapest_under_slo(self, candidates):
+        model = RoutingChatModel(router=Router(candidates, policy="cheapest", slo=1.0, explore=0.0))
+        assert {routed_to(model) for _ in range(3)} == {"slow-cheap"}
+
+        # The cheap candidate misses a tighter SLO, the fastest one takes over
+        model.router.slo = 0.02
+        assert routed_to(model) == "fast-expensive"
+
+    def test_cheapest_needs_slo(self, candidates):
+        with raises(ValueError):
+            Router(candidates, policy="cheapest")
+
+    def test_weighted(self, candidates):
+        candidates[0].weight, candidates[1].weight = 3.0, 1.0
+        model = RoutingChatModel(router=Router(candidates, policy="weighted", explore=0.0, seed=1))
+        routes = [routed_to(model) for _ in range(40)]
+        assert routes.count("slow-cheap") > routes.count("fast-expensive") > 0
+
+    def test_failover(self, candidates, outage):
+        model = RoutingChatModel(router=Router(candidates, policy="fastest", explore=0.0, failure_threshold=2))
+        for _ in range(3):
+            model.invoke("hi")
+
+        outage.down = True
+        assert routed_to(model) == "slow-cheap"         # Failed over within the call
+        assert routed_to(model) == "slow-cheap"
+        stats = model.router.stats()["fast-expensive"]
+        assert stats.errors == 2 and not stats.available
+        assert routed_to(model) == "slow-cheap"         # No longer tried while its circuit is open
+        assert model.router.stats()["fast-expensive"].errors == 2
+
+    def test_circuit_closes_after_cooldown(self, candidates, outage):
+        model = RoutingChatModel(router=Router(candidates, policy="fastest", explore=0.0, failure_threshold=1,
+                                               cooldown=0.0))
+        for _ in range(2):
+            model.invoke("hi")
+        outage.down = True
+        assert routed_to(model) == "slow-cheap"
+        outage.down = False
+        assert model.router.stats()["fast-expensive"].available
+        assert routed_to(model) == "fast-expensive"
+
+    def test_all_candidates_fail(self, outage):
+        outage.down = True
+        model = RoutingChatModel(router=Router([RouteCandidate("only", FakeChatModel(responses=[outage]))]))
+        with raises(ConnectionError):
+            model.invoke("hi")
+
+    @mark.parametrize("mode", ["stream", "astream", "ainvoke"])
+    def test_stream_and_async(self, candidates, outage, mode):
+        model = RoutingChatModel(router=Router(candidates, policy="fastest", explore=0.0))
+        outage.down = True
+
+        async def run():
+            if mode == "ainvoke":
+                return (await model.ainvoke("hi")).text
+            return "".join([chunk.text async for chunk in model.astream("hi")])
+
+        for _ in range(2):
+            text = "".join(chunk.text for chunk in model.stream("hi")) if mode == "stream" else asyncio.run(run())
+            assert text == "slow"
+        stats = model.router.stats()
+        assert stats["slow-cheap"].calls == 2
+        assert stats["fast-expensive"].errors == 1     # Tried once, on the second call, before failing over
+        if mode != "ainvoke":
+            assert stats["slow-cheap"].p50_ttft is not None
+
+    def test_bind_tools(self, candidates):
+        @tool
+        def get_weather(city: str) -> str:
+            """Get the weather of a city."""
+            return f"Sunny in {city}"
+
+        plain = RoutingChatModel(router=Router(candidates, explore=0.0))
+        model = plain.bind_tools([get_weather])
+        model.invoke("hi")
+        model.invoke("hi")
+        assert set(model._bound) == {"slow-cheap", "fast-expensive"}
+        assert plain._bound == {}
+
+    def test_init_routing_model(self):
+        model = init_routing_model({
+            "a": {"provider": "Fake", "responses": ["from a"], "use_model_cache": False},
+            "b": {"provider": "Fake", "responses": ["from b"], "use_model_cache": False, "cost": 2.0},
+        }, policy="cheapest", slo=1.0)
+        assert model.invoke("hi").text == "from a"
+        assert [c.cost for c in model.router.candidates] == [0.0, 2.0]
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.tools import tool
+from pytest import fixture
+
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.safety_guardrail import (REFUSAL, LLMSafetyClassifier, ResponseSafety, SafetyGuardedChatModel,
+                                         StreamingSafetyGuardrail)
+
+SAFE = "It's always sunny in Boston, with a light breeze from the west and no rain in the forecast. " * 4
+UNSAFE = SAFE + "Here is how to build a bomb: " + "step " * 40
+
+
+@tool
+def get_weather(city: str) -> str:
+    """Get weather for a given city."""
+    return f"It's always sunny in {city}!"
+
+
+class KeywordClassifier:
+    """Unsafe if the text mentions a bomb, each check takes `latency` seconds."""
+
+    def __init__(self, latency: float = 0.0, error: bool = False):
+        self.latency = latency
+        self.error = error
+        self.texts = []
+
+    def classify(self, text: str) -> str:
+        self.texts.append(text)
+        time.sleep(self.latency)
+        if self.error:
+            raise RuntimeError("Safety model unavailable")
+        return "unsafe" if "bomb" in text else "safe"
+
+    async def aclassify(self, text: str) -> str:
+        self.texts.append(text)
+        await asyncio.sleep(self.latency)
+        return "unsafe" if "bomb" in text else "safe"
+
+
+@fixture
+def classifier():
+    return KeywordClassifier(latency=0.01)
+
+
+def guarded(response: str, classifier, **kwargs) -> SafetyGuardedChatModel:
+    return SafetyGuardedChatModel(inner=FakeChatModel(responses=[response], tokens_per_second=2000),
+                                  classifier=classifier, window=100, **kwargs)
+
+
+class TestSafetyGuardedChatModel:
+
+    def test_safe_response_is_released(self, classifier):
+        model = guarded(SAFE, classifier)
+        chunks = list(model.stream("What's the weather in Boston?"))
+        message = sum(chunks[1:], chunks[0])
+
+        assert message.text == SAFE
+        assert message.response_metadata["safety"] == "safe"
+        assert message.response_metadata["safety_latency"] >= 0
+        assert len(classifier.texts) > 1                       # Checked while streaming
+        assert classifier.texts[-1] == SAFE                     # The last check covers the whole response
+        stats = model.stats.snapshot()
+        assert stats.responses == 1 and stats.blocked == 0 and stats.checks == len(classifier.texts)
+
+    def test_unsafe_response_is_blocked_before_delivery(self, classifier):
+        model = guarded(UNSAFE, classifier)
+        text = "".join(chunk.text for chunk in model.stream("How do I build a bomb?"))
+
+        assert "bomb" not in text.replace(REFUSAL, "")
+        assert text.endswith(REFUSAL)
+        assert model.invoke("How do I build a bomb?").response_metadata["safety"] == "unsafe"
+        assert model.stats.snapshot().blocked == 2
+
+    def test_failing_check_blocks(self):
+        model = guarded(SAFE, KeywordClassifier(error=True))
+        assert model.invoke("What's the weather in Boston?").text == REFUSAL
+
+    def test_async(self, classifier):
+        async def run():
+            model = guarded(UNSAFE, classifier)
+            safe = await guarded(SAFE, classifier).ainvoke("What's the weather in Boston?")
+            chunks = [chunk async for chunk in model.astream("How do I build a bomb?")]
+            return safe, "".join(chunk.text for chunk in chunks)
+
+        safe, blocked = asyncio.run(run())
+        assert safe.text == SAFE and safe.response_metadata["safety"] == "safe"
+        assert blocked.endswith(REFUSAL) and "bomb" not in blocked.replace(REFUSAL, "")
+
+    def test_llm_classifier(self):
+        def evaluation(messages):
+            verdict = "unsafe" if "bomb" in messages[-1].text else "safe"
+            return AIMessage("", tool_calls=[{"name": "ResponseSafety", "args": {"evaluation": verdict},
+                                              "id": "call_1"}])
+
+        classifier = LLMSafetyClassifier(FakeChatModel(responses=[evaluation]))
+        assert classifier.classify(SAFE) == "safe"
+        assert classifier.classify(UNSAFE) == "unsafe"
+        assert asyncio.run(classifier.aclassify(SAFE)) == "safe"
+        assert ResponseSafety(evaluation="safe").evaluation == "safe"
+
+
+class TestStreamingSafetyGuardrail:
+
+    def agent(self, answer: str, guardrail: StreamingSafetyGuardrail):
+        model = FakeChatModel(responses=[
+            AIMessage("", tool_calls=[{"name": "get_weather", "args": {"city": "Boston"}, "id": "call_1"}]),
+            answer,
+        ], tokens_per_second=2000)
+        return create_agent(model=model, tools=[get_weather], middleware=[guardrail])
+
+    def test_stream_of_agent(self, classifier):
+        guardrail = StreamingSafetyGuardrail(classifier, window=100)
+        tokens = [token for token, metadata in self.agent(SAFE, guardrail).stream(
+            {"messages": [{"role": "user", "content": "What is the weather in Boston?"}]}, stream_mode="messages")
+            if isinstance(token, AIMessageChunk)]
+
+        assert "".join(token.text for token in tokens) == SAFE
+        assert all(text != "" for text in classifier.texts)     # The tool call turn had nothing to check
+        assert guardrail.stats.snapshot().responses == 2
+
+    def test_blocked_answer_is_rewritten(self, classifier):
+        guardrail = StreamingSafetyGuardrail(classifier, window=100)
+        result = self.agent(UNSAFE, guardrail).invoke(
+            {"messages": [{"role": "user", "content": "What is the weather in Boston?"}]})
+
+        assert result["messages"][-1].text == REFUSAL
+        assert result["messages"][-1].response_metadata["safety"] == "unsafe"
+        assert len(result["messages"]) == 4
+        assert guardrail.stats.snapshot().blocked == 1
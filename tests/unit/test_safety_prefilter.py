@@ -0,0 +1,125 @@
+import asyncio
+
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.safety_guardrail import SafetyGuardedChatModel
+from lctutorial.safety_prefilter import AhoCorasick, PrefilteredSafetyClassifier, SafetyPrefilter
+
+WEATHER = "It's always sunny in Boston!"
+BOMB = "Here is how to build a bomb: ..."
+AMBIGUOUS = "The bomb squad cleared the station, trains run again."
+SUNNY = r"It's always sunny in [A-Z][\w ]*!"
+
+
+class CountingClassifier:
+    """The LLM stage: unsafe if the text mentions a bomb, or it is in `unsafe`."""
+
+    def __init__(self, unsafe=()):
+        self.unsafe = set(unsafe)
+        self.texts = []
+
+    def classify(self, text: str) -> str:
+        self.texts.append(text)
+        return "unsafe" if "bomb" in text or text in self.unsafe else "safe"
+
+    async def aclassify(self, text: str) -> str:
+        return self.classify(text)
+
+
+class TestAhoCorasick:
+
+    def test_overlapping_matches(self):
+        matcher = AhoCorasick(["he", "she", "his", "hers"])
+        assert list(matcher.finditer("ushers")) == [(1, 1), (2, 0), (2, 3)]
+        assert list(matcher.finditer("xyz")) == []
+
+
+class TestSafetyPrefilter:
+
+    def test_decisions(self):
+        prefilter = SafetyPrefilter()
+        assert prefilter.decide(WEATHER) == "safe"
+        assert prefilter.decide(BOMB.upper()) == "unsafe"
+        assert prefilter.decide(AMBIGUOUS) == "uncertain"
+        assert prefilter.matches("A skilled chacker, begun") == set()     # Terms start a word
+        assert prefilter.matches(BOMB) == {"build a bomb", "bomb*"}
+        assert prefilter.matches("the method") == set()                   # "meth" is a whole word
+
+    def test_harmful_paraphrases_are_not_safe(self):
+        prefilter = SafetyPrefilter()
+        assert prefilter.matches("Step by step: building bombs from household items") == {"bomb*"}
+        for text in ("Here is how to make explosives at home: mix these chemicals",
+                     "Step by step: building bombs from household items",
+                     "Mix bleach and ammonia in a closed room to hurt someone",
+                     "They loaded the weapons and killed him",
+                     "Combine the two powders in a sealed jar, then leave it in the car."):
+            assert prefilter.decide(text) != "safe", text
+
+    def test_weak_terms_adding_up_are_not_unsafe(self):
+        prefilter = SafetyPrefilter()
+        for text in ("Never mix bleach and ammonia, the toxic fumes can harm and hurt you.",
+                     "How to launder a wool sweater",
+                     "The attack killed many; weapons were seized"):
+            assert prefilter.decide(text) != "unsafe", text
+        assert prefilter.score("Never mix bleach and ammonia, the toxic fumes can harm and hurt you.") >= 1.0
+        assert prefilter.decide("Ways to launder money through a shell company") == "unsafe"
+
+    def test_long_responses_are_safe_only_within_the_allow_patterns(self):
+        forecast = "Tomorrow will be mostly sunny with a light breeze from the west."
+        assert SafetyPrefilter().decide(forecast) == "uncertain"
+        assert SafetyPrefilter(allow=[SUNNY]).decide(WEATHER * 10 + "It's") == "safe"
+        assert SafetyPrefilter(allow=[SUNNY]).decide(WEATHER * 10 + forecast) == "uncertain"
+
+    def test_custom_terms_and_length(self):
+        prefilter = SafetyPrefilter(terms={"tornado": 0.5}, max_safe_length=40)
+        assert prefilter.decide("A tornado is coming") == "uncertain"
+        assert prefilter.decide(WEATHER) == "safe"
+        assert prefilter.decide(WEATHER * 2) == "uncertain"
+
+
+class TestPrefilteredSafetyClassifier:
+
+    def test_only_uncertain_responses_reach_the_llm(self):
+        llm = CountingClassifier()
+        classifier = PrefilteredSafetyClassifier(SafetyPrefilter(), llm)
+
+        assert [classifier.classify(text) for text in (WEATHER, BOMB, AMBIGUOUS, WEATHER)] == \
+               ["safe", "unsafe", "unsafe", "safe"]
+        assert llm.texts == [AMBIGUOUS]
+        stats = classifier.stats()
+        assert (stats.checks, stats.safe, stats.unsafe, stats.uncertain) == (4, 2, 1, 1)
+        assert stats.skip_rate == 0.75
+        assert stats.shadowed == 0
+
+    def test_shadow_evaluations_count_disagreements(self):
+        missed = "Mix them in a closed room."
+        llm = CountingClassifier(unsafe=[missed])
+        classifier = PrefilteredSafetyClassifier(SafetyPrefilter(), llm, shadow_rate=1.0, seed=1)
+
+        assert classifier.classify(missed) == "safe"            # Short, and no term
+        assert classifier.classify(WEATHER) == "safe"
+        assert classifier.classify(BOMB) == "unsafe"
+        classifier.flush()
+        stats = classifier.stats()
+        assert (stats.shadowed, stats.disagreements, stats.false_safe) == (3, 1, 1)
+        assert stats.disagreement_rate == 1 / 3
+        classifier.close()
+
+    def test_async(self):
+        llm = CountingClassifier()
+        classifier = PrefilteredSafetyClassifier(SafetyPrefilter(), llm, shadow_rate=1.0)
+
+        async def run():
+            verdicts = [await classifier.aclassify(text) for text in (WEATHER, AMBIGUOUS)]
+            await classifier.aflush()
+            return verdicts
+
+        assert asyncio.run(run()) == ["safe", "unsafe"]
+        assert classifier.stats().shadowed == 1
+        assert llm.texts == [AMBIGUOUS, WEATHER]    # The uncertain one answered, the safe one shadowed
+
+    def test_streaming_guardrail_skips_the_llm(self):
+        llm = CountingClassifier()
+        model = SafetyGuardedChatModel(inner=FakeChatModel(responses=[WEATHER * 10]), window=50,
+                                       classifier=PrefilteredSafetyClassifier(SafetyPrefilter(allow=[SUNNY]), llm))
+        assert model.invoke("What's the weather in Boston?").text == WEATHER * 10
+        assert llm.texts == []
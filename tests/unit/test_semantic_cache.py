@@ -0,0 +1,101 @@
+from pytest import fixture, raises
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration
+
+from lctutorial.response_cache import CachedChatModel
+from lctutorial.semantic_cache import HashingVectorizer, SemanticCache, split_prompt
+
+weather_answer = "It's always sunny in San Francisco!"
+
+
+def fake_model(*responses: AIMessage) -> GenericFakeChatModel:
+    # Raises StopIteration when called more often than there are responses, i.e. on unexpected cache misses
+    return GenericFakeChatModel(messages=iter(responses))
+
+
+@fixture
+def cache():
+    return SemanticCache(threshold=0.85, capacity=16)
+
+
+class TestSemanticCache:
+
+    def test_rephrased_question_is_served_from_cache(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage(weather_answer)), response_cache=cache)
+
+        first = model.invoke("What is the weather in San Francisco?")
+        second = model.invoke("what's the weather in San Francisco")
+
+        assert first.text == second.text == weather_answer
+        stats = cache.stats()
+        assert (stats.hits, stats.misses) == (1, 1)
+        assert stats.mean_similarity >= 0.85
+
+    def test_different_question_is_a_miss(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage("sunny"), AIMessage("rainy")), response_cache=cache)
+
+        assert model.invoke("what is the weather in Paris").text == "sunny"
+        assert model.invoke("what is the weather in Tokyo").text == "rainy"
+        assert cache.stats().misses == 2
+
+    def test_numbers_must_match_exactly(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage("9.2 EUR"), AIMessage("92 EUR")), response_cache=cache)
+
+        assert model.invoke("convert 10 USD to EUR").text == "9.2 EUR"
+        assert cache.vectorizer.transform("convert 10 USD to EUR") @ \
+               cache.vectorizer.transform("convert 100 USD to EUR") >= cache.threshold
+        assert model.invoke("convert 100 USD to EUR").text == "92 EUR"
+        assert model.invoke("Convert 10 USD to EUR, please").text == "9.2 EUR"
+        assert (cache.stats().hits, cache.stats().misses) == (1, 2)
+
+    def test_context_and_params_must_match_exactly(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage("a"), AIMessage("b"), AIMessage("c")),
+                                response_cache=cache)
+
+        assert model.invoke("what is the weather in Paris").text == "a"
+        assert model.invoke([SystemMessage("Answer in French"), HumanMessage("what is the weather in Paris")]).text == "b"
+        assert model.invoke("what is the weather in Paris", stop=["!"]).text == "c"
+        assert cache.stats().hits == 0
+
+    def test_stream_replays_cached_response(self, cache):
+        model = CachedChatModel(inner=fake_model(AIMessage(weather_answer)), response_cache=cache)
+        model.invoke("What is the weather in San Francisco?")
+
+        assert "".join(chunk.text for chunk in model.stream("weather in san francisco")) == weather_answer
+
+    def test_capacity_evicts_least_recently_used(self):
+        cache = SemanticCache(capacity=2)
+        generations = [ChatGeneration(message=AIMessage("x"))]
+
+        cache.update("weather in Paris", "llm", generations)
+        cache.update("weather in Tokyo", "llm", generations)
+        assert cache.lookup("weather in Paris", "llm") is not None
+        cache.update("weather in Boston", "llm", generations)
+
+        assert len(cache) == 2
+        assert cache.lookup("weather in Tokyo", "llm") is None
+        assert cache.lookup("weather in Paris", "llm") is not None
+        assert cache.stats().evictions == 1
+
+    def test_persistence_round_trip(self, tmp_path):
+        path = str(tmp_path / "semantic")
+        first_cache = SemanticCache(capacity=8, path=path)
+        first_cache.update("weather in Paris", "llm", [ChatGeneration(message=AIMessage("sunny"))])
+        first_cache.close()
+
+        second_cache = SemanticCache(capacity=8, path=path)
+
+        assert second_cache.lookup("the weather in Paris?", "llm")[0].message.text == "sunny"
+        with raises(ValueError):
+            SemanticCache(capacity=4, path=path)
+
+    def test_vectorizer_and_prompt_split(self):
+        vectorizer = HashingVectorizer(dim=64)
+        vectors = vectorizer.transform_many(["weather in Paris", "Paris weather", "stock prices"])
+
+        assert vectors.shape == (3, 64)
+        assert abs(float(vectors[0] @ vectors[1]) - 1.0) < 1e-5
+        assert float(vectors[0] @ vectors[2]) < 0.5
+        assert split_prompt("plain text") == ("", "plain text")
@@ -0,0 +1,121 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import START, MessagesState, StateGraph
+from langgraph.types import Command
+from pytest import fixture
+
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.hitl_agent import create_hitl_agent
+from lctutorial.sqlite_checkpointer import SqliteDeltaSaver
+
+
+@fixture
+def path(tmp_path):
+    return str(tmp_path / "checkpoints.db")
+
+
+def chat_graph(checkpointer):
+    def reply(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(f"Reply {len(state['messages'])}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def chat(graph, turns: int, thread_id: str = "1") -> None:
+    for turn in range(turns):
+        graph.invoke({"messages": [HumanMessage(f"Turn {turn}")]}, {"configurable": {"thread_id": thread_id}})
+
+
+def weather_model():
+    return FakeChatModel(responses=[
+        AIMessage("", tool_calls=[{"name": "get_weather", "args": {"location": "Boston"}, "id": "call_1"}]),
+        "It's sunny in Boston.",
+    ])
+
+
+class TestSqliteDeltaSaver:
+
+    def test_messages_are_stored_as_deltas(self, path):
+        with SqliteDeltaSaver(path, snapshot_every=4) as checkpointer:
+            graph = chat_graph(checkpointer)
+            chat(graph, 10)
+            messages = graph.get_state({"configurable": {"thread_id": "1"}}).values["messages"]
+            stats = checkpointer.storage_stats()
+        with SqliteDeltaSaver(":memory:", snapshot_every=0) as checkpointer:
+            chat(chat_graph(checkpointer), 10)
+            full = checkpointer.storage_stats()
+
+        assert [message.text for message in messages[-2:]] == ["Turn 9", "Reply 19"]
+        assert stats.deltas == 16                   # 20 versions of the messages, every 5th one a snapshot
+        assert full.deltas == 0
+        assert stats.bytes < full.bytes
+
+    def test_state_survives_restart(self, path):
+        with SqliteDeltaSaver(path, snapshot_every=4) as checkpointer:
+            graph = chat_graph(checkpointer)
+            chat(graph, 10)
+            expected = graph.get_state({"configurable": {"thread_id": "1"}})
+            expected_history = list(graph.get_state_history({"configurable": {"thread_id": "1"}}))
+
+        with SqliteDeltaSaver(path) as checkpointer:
+            graph = chat_graph(checkpointer)
+            state = graph.get_state({"configurable": {"thread_id": "1"}})
+            assert state.values == expected.values
+            assert state.config == expected.config
+            history = list(graph.get_state_history({"configurable": {"thread_id": "1"}}))
+            assert [snapshot.values for snapshot in history] == [snapshot.values for snapshot in expected_history]
+            # Older checkpoints are rebuilt from their own snapshot and deltas
+            assert [len(snapshot.values.get("messages", [])) for snapshot in history[:3]] == [20, 19, 18]
+
+            chat(graph, 1)
+            assert len(graph.get_state({"configurable": {"thread_id": "1"}}).values["messages"]) == 22
+
+    def test_hitl_interrupt_resumes_after_restart(self, path):
+        config = {"configurable": {"thread_id": "some_id"}}
+        with SqliteDeltaSaver(path) as checkpointer:
+            agent = create_hitl_agent(weather_model(), checkpointer=checkpointer)
+            result = agent.invoke({"messages": [{"role": "user", "content": "What's the weather in Boston?"}]},
+                                  config)
+            assert "__interrupt__" in result
+
+        with SqliteDeltaSaver(path) as checkpointer:
+            model = weather_model()
+            model.next_message([])          # The tool call was answered before the restart
+            agent = create_hitl_agent(model, checkpointer=checkpointer)
+            result = agent.invoke(Command(resume={"decisions": [{"type": "approve"}]}), config)
+
+        assert result["messages"][-2].text == "It's sunny in Boston."     # The tool ran after approval
+        assert result["messages"][-1].text == "It's sunny in Boston."
+
+    def test_threads_and_delete(self, path):
+        with SqliteDeltaSaver(path) as checkpointer:
+            graph = chat_graph(checkpointer)
+            chat(graph, 2, thread_id="a")
+            chat(graph, 3, thread_id="b")
+            checkpointer.delete_thread("a")
+
+            assert graph.get_state({"configurable": {"thread_id": "a"}}).values == {}
+            assert len(graph.get_state({"configurable": {"thread_id": "b"}}).values["messages"]) == 6
+            assert {item.config["configurable"]["thread_id"] for item in checkpointer.list(None)} == {"b"}
+            assert len(list(checkpointer.list({"configurable": {"thread_id": "b"}}, limit=2))) == 2
+            assert all(item.metadata["source"] == "input"
+                       for item in checkpointer.list(None, filter={"source": "input"}))
+
+    def test_async(self, path):
+        async def run():
+            with SqliteDeltaSaver(path) as checkpointer:
+                graph = chat_graph(checkpointer)
+                for turn in range(3):
+                    await graph.ainvoke({"messages": [HumanMessage(f"Turn {turn}")]},
+                                        {"configurable": {"thread_id": "1"}})
+                state = await graph.aget_state({"configurable": {"thread_id": "1"}})
+                history = [item async for item in graph.aget_state_history({"configurable": {"thread_id": "1"}})]
+                return state, history
+
+        state, history = asyncio.run(run())
+        assert len(state.values["messages"]) == 6
+        assert len(history) == 9
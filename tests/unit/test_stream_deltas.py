@@ -0,0 +1,67 @@
+import json
+
+from pytest import raises
+
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from lctutorial.fake_chat_model import FakeChatModel
+from lctutorial.stream_deltas import DeltaState, StateDelta, iter_deltas
+from lctutorial.weather_agent import create_weather_agent, stream_weather_agent
+
+weather_call = AIMessage("", tool_calls=[{"name": "get_weather", "args": {"city": "Paris"}, "id": None}])
+
+
+def weather_agent():
+    return create_weather_agent(model=FakeChatModel(responses=[weather_call, "It's always sunny in Paris!"]))
+
+
+class TestStreamDeltas:
+
+    def test_deltas_rebuild_the_values_state(self):
+        agent = weather_agent()
+        history = [HumanMessage("hello"), AIMessage("Hi, how can I help?")]
+
+        deltas = [delta for _, delta in stream_weather_agent("Paris", "deltas", agent=agent, history=history)]
+        state = DeltaState()
+        for delta in deltas:
+            state.apply(delta)
+        final_values = list(stream_weather_agent("Paris", "values", agent=agent, history=history))[-1][1]
+
+        assert [delta.seq for delta in deltas] == [0, 1, 2, 3]
+        assert [delta.node for delta in deltas] == ["__input__", "model", "tools", "model"]
+        assert [len(delta.messages) for delta in deltas] == [3, 1, 1, 1]
+        assert [(m.type, m.text) for m in state.messages] == [(m.type, m.text) for m in final_values["messages"]]
+
+    def test_input_messages_have_the_ids_of_the_state(self):
+        agent = create_agent(model=FakeChatModel(responses=["Hi!"]), checkpointer=InMemorySaver())
+        config = {"configurable": {"thread_id": "1"}}
+        state = DeltaState()
+        for delta in iter_deltas(agent, {"messages": [{"role": "user", "content": "hello"}]}, config):
+            state.apply(delta)
+
+        assert [m.id for m in state.messages] == [m.id for m in agent.get_state(config).values["messages"]]
+        state.apply(StateDelta(state.seq + 1, "summarize", [RemoveMessage(id=state.messages[0].id)]))
+        assert [m.text for m in state.messages] == ["Hi!"]
+
+    def test_to_dict_is_json_serializable(self):
+        _, delta = next(stream_weather_agent("Paris", "deltas", agent=weather_agent()))
+
+        payload = json.loads(json.dumps(delta.to_dict()))
+
+        assert payload["seq"] == 0
+        assert payload["messages"][0]["kwargs"]["content"] == "what is the weather in Paris"
+
+    def test_apply_replaces_removes_and_checks_order(self):
+        state = DeltaState()
+        state.apply(StateDelta(0, "a", [HumanMessage("hi", id="1"), AIMessage("draft", id="2")]))
+        state.apply(StateDelta(1, "b", [AIMessage("final", id="2")], {"structured_response": {"ok": True}}))
+        assert [m.text for m in state.messages] == ["hi", "final"]
+        assert state.state()["structured_response"] == {"ok": True}
+
+        state.apply(StateDelta(2, "c", [RemoveMessage(id="1"), AIMessage("more", id="3")]))
+        assert [m.text for m in state.messages] == ["final", "more"]
+
+        with raises(ValueError):
+            state.apply(StateDelta(4, "d"))
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+
+from pytest import mark, raises
+
+from langchain.tools import tool
+from langchain_core.messages import AIMessage
+
+from lctutorial.tool_executor import ToolExecutor, arun_tool_calls, run_tool_calls
+
+running = {"now": 0, "max": 0}
+lock = threading.Lock()
+
+
+@tool
+def get_weather(city: str) -> str:
+    """Get weather for a given city."""
+    with lock:
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+    time.sleep(0.05 if city != "Slowtown" else 1)
+    with lock:
+        running["now"] -= 1
+    return f"It's always sunny in {city}!"
+
+
+@tool
+async def get_population(city: str) -> str:
+    """Get the population of a given city."""
+    if city == "Atlantis":
+        raise ValueError("No such city")
+    await asyncio.sleep(0.05 if city != "Slowtown" else 1)
+    return f"{city} has 1,000,000 inhabitants."
+
+
+def calls(*name_and_cities):
+    return AIMessage("", tool_calls=[{"name": name, "args": {"city": city}, "id": f"call_{i}"}
+                                     for i, (name, city) in enumerate(name_and_cities)]).tool_calls
+
+
+class TestToolExecutor:
+
+    def test_run_is_concurrent_and_keeps_the_order(self):
+        tool_calls = calls(*[("get_weather", f"City {i}") for i in range(8)])
+
+        start = time.perf_counter()
+        results = run_tool_calls(tool_calls, [get_weather])
+
+        assert time.perf_counter() - start < 0.3
+        assert [m.tool_call_id for m in results] == [f"call_{i}" for i in range(8)]
+        assert results[3].content == "It's always sunny in City 3!"
+
+    def test_concurrency_limit(self):
+        running["max"] = 0
+
+        results = run_tool_calls(calls(*[("get_weather", f"City {i}") for i in range(6)]), [get_weather],
+                                 concurrency={"get_weather": 2})
+
+        assert running["max"] == 2
+        assert all(m.status == "success" for m in results)
+
+    def test_timeouts_unknown_tools_and_errors(self):
+        tool_calls = calls(("get_weather", "Slowtown"), ("get_weather", "Paris"), ("get_time", "Paris"))
+
+        results = run_tool_calls(tool_calls, [get_weather], timeouts={"get_weather": 0.3})
+
+        assert [m.status for m in results] == ["error", "success", "error"]
+        assert "timed out after 0.3 seconds" in results[0].content
+        assert "get_time is not a valid tool" in results[2].content
+
+    def test_timeouts_start_when_the_call_runs(self):
+        results = run_tool_calls(calls(*[("get_weather", f"City {i}") for i in range(6)]), [get_weather],
+                                 max_workers=2, timeout=0.1)
+        assert all(m.status == "success" for m in results)
+
+        # The timed out call keeps the only worker busy, the next one only starts after it
+        results = run_tool_calls(calls(("get_weather", "Slowtown"), ("get_weather", "Paris")), [get_weather],
+                                 max_workers=1, timeout=0.3)
+        assert [m.status for m in results] == ["error", "success"]
+
+    @mark.asyncio
+    async def test_arun(self):
+        tool_calls = calls(("get_population", "Paris"), ("get_weather", "Tokyo"), ("get_population", "Atlantis"),
+                           ("get_population", "Slowtown"))
+
+        results = await arun_tool_calls(tool_calls, [get_weather, get_population], timeout=0.5,
+                                        concurrency={"get_population": 1})
+
+        assert [m.tool_call_id for m in results] == ["call_0", "call_1", "call_2", "call_3"]
+        assert results[0].content == "Paris has 1,000,000 inhabitants."
+        assert results[1].content == "It's always sunny in Tokyo!"
+        assert "No such city" in results[2].content and results[2].status == "error"
+        assert "timed out" in results[3].content
+
+    def test_errors_can_be_raised(self):
+        with raises(ValueError):
+            asyncio.run(ToolExecutor([get_population], handle_errors=False).arun(calls(("get_population", "Atlantis"))))